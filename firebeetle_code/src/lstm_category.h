@@ -1,5 +1,44 @@
 #include "network_category_v3.h"
 
+// access to the weight matrices in the layout of the exported header
+// (0: [rows][cols], 1: transposed [cols][rows], 2: flat [rows * cols])
+#ifndef weight_layout
+#define weight_layout 0
+#endif
+#if weight_layout == 1
+#define WEIGHT(m, row, col, cols) m[col][row]
+#elif weight_layout == 2
+#define WEIGHT(m, row, col, cols) m[(row) * (cols) + (col)]
+#else
+#define WEIGHT(m, row, col, cols) m[row][col]
+#endif
+
+// storage of the recurrent kernels (0: dense like the other weights,
+// 1: compressed sparse rows, 2: compressed rows of blocks)
+#ifndef recurrent_layout
+#define recurrent_layout 0
+#endif
+
+// quantized kernels of ZombieQuantLSTM.export_model (lstm_quant_bits set):
+// integer weights with one scale per tensor or per unit, the hidden state is
+// quantized with lstm_h_scale for the integer multiply accumulate
+#ifdef lstm_quant_bits
+#include <math.h>
+#define lstm_quant_max ((1 << (lstm_quant_bits - 1)) - 1)
+// accumulator of the recurrent products (int16 products summed over the
+// units exceed int32, the same widths are used by ZombieQuantLSTM)
+#if lstm_quant_bits > 8
+typedef int64_t lstm_acc_t;
+#else
+typedef int32_t lstm_acc_t;
+#endif
+#if lstm_quant_per_channel
+#define QSCALE(s, i) s[i]
+#else
+#define QSCALE(s, i) s[0]
+#endif
+#endif
+
 
 // initialize lstm cell state and hidden state
 RTC_DATA_ATTR float lstm_ct[lstm_units] = {0};
@@ -58,6 +97,48 @@ float lstm_sigmoid_interp(float x) {
 }
 
 
+#if recurrent_layout != 0
+/**
+ * Product of row i of a compressed recurrent kernel with the hidden state,
+ * only the stored blocks of the row are multiplied
+ */
+float lstm_sparse_row(const uint16_t* ptr, const uint16_t* idx,
+                      const float* val, int i) {
+    const int bs  = recurrent_block_size;
+    int block_row = i / bs;
+    int row       = i % bs;
+    float sum     = 0;
+
+    for (int k = ptr[block_row]; k < ptr[block_row + 1]; ++k) {
+        const float* block = val + (k * bs + row) * bs;
+        int col            = idx[k] * bs;
+        for (int c = 0; c < bs; ++c) {
+            sum += lstm_ht[col + c] * block[c];
+        }
+    }
+
+    return sum;
+}
+#endif
+
+
+#ifdef lstm_quant_bits
+/**
+ * Quantize a value of the hidden state (round to nearest even and clip)
+ */
+int32_t lstm_quantize_state(float h) {
+    int32_t q = (int32_t)lrintf(h / lstm_h_scale);
+    if (q > lstm_quant_max) {
+        return lstm_quant_max;
+    }
+    if (q < -lstm_quant_max) {
+        return -lstm_quant_max;
+    }
+    return q;
+}
+#endif
+
+
 /**
  * Compute one step of the LSTM cells
  */
@@ -67,17 +148,52 @@ void lstm_step(float input) {
     float ot[lstm_units] = {0};
     float ct[lstm_units] = {0};
 
+#ifdef lstm_quant_bits
+    int32_t hq[lstm_units];
+    for (int j = 0; j < lstm_units; ++j) {
+        hq[j] = lstm_quantize_state(lstm_ht[j]);
+    }
+#endif
+
     for (int i = 0; i < lstm_units; ++i) {
-        ft[i] = input * lstm_wf[0][i] + lstm_bf[i];
-        it[i] = input * lstm_wi[0][i] + lstm_bi[i];
-        ot[i] = input * lstm_wo[0][i] + lstm_bo[i];
-        ct[i] = input * lstm_wc[0][i] + lstm_bc[i];
+#ifdef lstm_quant_bits
+        lstm_acc_t acc_f = 0;
+        lstm_acc_t acc_i = 0;
+        lstm_acc_t acc_o = 0;
+        lstm_acc_t acc_c = 0;
         for (int j = 0; j < lstm_units; ++j) {
-            ft[i] += lstm_ht[j] * lstm_uf[j][i];
-            it[i] += lstm_ht[j] * lstm_ui[j][i];
-            ot[i] += lstm_ht[j] * lstm_uo[j][i];
-            ct[i] += lstm_ht[j] * lstm_uc[j][i];
+            acc_f += (lstm_acc_t)hq[j] * lstm_uf[j][i];
+            acc_i += (lstm_acc_t)hq[j] * lstm_ui[j][i];
+            acc_o += (lstm_acc_t)hq[j] * lstm_uo[j][i];
+            acc_c += (lstm_acc_t)hq[j] * lstm_uc[j][i];
         }
+        ft[i] = input * lstm_wf[0][i] * QSCALE(lstm_wf_scale, i) +
+                acc_f * (lstm_h_scale * QSCALE(lstm_uf_scale, i)) + lstm_bf[i];
+        it[i] = input * lstm_wi[0][i] * QSCALE(lstm_wi_scale, i) +
+                acc_i * (lstm_h_scale * QSCALE(lstm_ui_scale, i)) + lstm_bi[i];
+        ot[i] = input * lstm_wo[0][i] * QSCALE(lstm_wo_scale, i) +
+                acc_o * (lstm_h_scale * QSCALE(lstm_uo_scale, i)) + lstm_bo[i];
+        ct[i] = input * lstm_wc[0][i] * QSCALE(lstm_wc_scale, i) +
+                acc_c * (lstm_h_scale * QSCALE(lstm_uc_scale, i)) + lstm_bc[i];
+#else
+        ft[i] = input * WEIGHT(lstm_wf, 0, i, lstm_units) + lstm_bf[i];
+        it[i] = input * WEIGHT(lstm_wi, 0, i, lstm_units) + lstm_bi[i];
+        ot[i] = input * WEIGHT(lstm_wo, 0, i, lstm_units) + lstm_bo[i];
+        ct[i] = input * WEIGHT(lstm_wc, 0, i, lstm_units) + lstm_bc[i];
+#if recurrent_layout == 0
+        for (int j = 0; j < lstm_units; ++j) {
+            ft[i] += lstm_ht[j] * WEIGHT(lstm_uf, j, i, lstm_units);
+            it[i] += lstm_ht[j] * WEIGHT(lstm_ui, j, i, lstm_units);
+            ot[i] += lstm_ht[j] * WEIGHT(lstm_uo, j, i, lstm_units);
+            ct[i] += lstm_ht[j] * WEIGHT(lstm_uc, j, i, lstm_units);
+        }
+#else
+        ft[i] += lstm_sparse_row(lstm_uf_ptr, lstm_uf_idx, lstm_uf_val, i);
+        it[i] += lstm_sparse_row(lstm_ui_ptr, lstm_ui_idx, lstm_ui_val, i);
+        ot[i] += lstm_sparse_row(lstm_uo_ptr, lstm_uo_idx, lstm_uo_val, i);
+        ct[i] += lstm_sparse_row(lstm_uc_ptr, lstm_uc_idx, lstm_uc_val, i);
+#endif
+#endif
         ft[i] = lstm_sigmoid_interp(ft[i]);
         it[i] = lstm_sigmoid_interp(it[i]);
         ot[i] = lstm_sigmoid_interp(ot[i]);
@@ -99,7 +215,7 @@ void lstm_dense_layer() {
     for (int j = 0; j < output_size; ++j) {
         dense_res[j] = dense_bias[j];
         for (int i = 0; i < lstm_units; ++i) {
-            dense_res[j] += dense_kernel[i][j] * lstm_ht[i];
+            dense_res[j] += WEIGHT(dense_kernel, i, j, output_size) * lstm_ht[i];
         }
     }
 
@@ -1,3 +1,5 @@
+import os
+import json
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
@@ -5,30 +7,41 @@ import h5py
 import influxdb
 
 
-# crate InfluxDB client and connect to database
+# define InfluxDB connection
 INFLUX_HOST = "localhost"
 INFLUX_PORT = 8086
 INFLUX_DATABASE = "Zombielab"
-influx = influxdb.InfluxDBClient(host=INFLUX_HOST, port=INFLUX_PORT, database=INFLUX_DATABASE)
 
 
 # define measurement to query data from
 INFLUX_MEASUREMENT = "test123"
 
 # define query command
-# SELECT <fields, tags> FROM <measurement> WHERE <filters>
+# SELECT <fields, tags> FROM <measurement> WHERE <filters> AND <time window>
 # <fields, tags>: comma separated list of fields and/or tags to query
 #                 (a * means all available fields and keys)
 # <measurement>:  name of the measurement to query data from
-# <filters>:      filter results based on tags (or fields or timestamps)
+# <filters>:      filter results based on tags (or fields)
 #                 single quotes around strings are important!
+# <time window>:  added by the export, which queries one window at a time
 #
-# example queries
-# "SELECT * FROM {}".format(INFLUX_MEASUREMENT)
-# "SELECT voltage,cell_current,lux FROM {} WHERE sensor='Z1'".format(INFLUX_MEASUREMENT)
-# "SELECT * FROM {} WHERE sensor='Z1' AND voltage > 3.0 AND time > '2019-09-23T16:00:00Z'".format(INFLUX_MEASUREMENT)
+# example fields and filters
+# INFLUX_FIELDS = "*"
+# INFLUX_FIELDS = "voltage,cell_current,lux,sensor"
+# INFLUX_FILTER = "sensor='Z1'"
+# INFLUX_FILTER = "sensor='Z1' AND voltage > 3.0"
+INFLUX_FIELDS = "*"
+INFLUX_FILTER = ""
 
-INFLUX_QUERY = "SELECT * FROM {}".format(INFLUX_MEASUREMENT)
+# define time range of the export (e.g. "2019-09-23T16:00:00Z")
+# None means from the first or until the last point of the measurement
+EXPORT_START = None
+EXPORT_END = None
+# define time span of the windows which are queried one at a time, only one
+# window is held in memory
+CHUNK_DURATION = "1D"
+# continue an interrupted export after the last written window
+RESUME = True
 
 
 # define output filenames (or paths)
@@ -36,61 +49,420 @@ INFLUX_QUERY = "SELECT * FROM {}".format(INFLUX_MEASUREMENT)
 # multiple measurements in single hdf5 file are possible!
 CSV_FILENAME = "test.csv"
 H5_FILENAME = "test.h5"
+# chunk size (rows) and compression ("gzip", "lzf" or None) of the hdf5
+# datasets
+H5_CHUNK_SIZE = 65536
+H5_COMPRESSION = "gzip"
+H5_COMPRESSION_LEVEL = 4
+
+# plot the exported data (read from the hdf5 file with at most PLOT_POINTS
+# points per curve)
+PLOT = True
+PLOT_POINTS = 100000
 
 
 ################################################################################
-# main loop to query InfluxDB data and save csv and hdf5 files
-if __name__ == "__main__":
-    # Query data from InfluxDB
-    result = influx.query(INFLUX_QUERY, database=INFLUX_DATABASE)
-    # convert results into pandas table
-    table = pd.DataFrame(result.get_points())
-
-    # save table to csv file
-    if CSV_FILENAME != "":
-        table.to_csv(CSV_FILENAME, index=False)
-
-    # save table to hdf5 file
-    if H5_FILENAME != "":
-        start = table["time"][0]
-        # translate time to timestamp for more efficient storage
-        table["timestamp"] = pd.to_datetime(table["time"]).astype(int)
-        table.drop("time", axis=1, inplace=True)
-
-        with h5py.File(H5_FILENAME, "a") as file:
-            # create group to store data (named like measurement)
-            grp = file.require_group(INFLUX_MEASUREMENT)
-
-            # loop through table columns and store data
-            for key, values in table.iteritems():
-                if (key == "timestamp"):
-                    # save timestamp as int64
-                    thistype = "int64"
-                elif (type(values[0]) == np.int64):
-                    # save other integer types as int32
-                    thistype = "int32"
-                elif (type(values[0]) == np.float64):
-                    # save float values as float32
-                    thistype = "float32"
-                elif (type(values[0]) == str):
-                    # save string values (tags) as enumerated type
-                    tagvals = set(values)
-                    tagdict = dict(zip(tagvals, range(len(tagvals))))
-                    thistype = h5py.special_dtype(enum=("uint8", tagdict))
-                    # transform valuees into enumerated type
-                    values = np.vectorize(tagdict.get)(values)
-
-                # create dataset and store values
-                dset = grp.require_dataset(key, shape=values.shape, dtype=thistype)
-                dset[()] = values
-
-            # add additional notes to file
-            strtype = h5py.special_dtype(vlen=bytes)
-            grp["timestamp"].attrs.create("start", start, dtype=strtype)
+# query data of one measurement from InfluxDB
+class InfluxSource:
+    def __init__(self, client, measurement, fields="*", filter=""):
+        self.client = client
+        self.measurement = measurement
+        self.fields = fields
+        self.filter = filter
+
+    def _query(self, query):
+        return pd.DataFrame(self.client.query(query).get_points())
+
+    def _where(self, *conditions):
+        conditions = [c for c in (self.filter,) + conditions if c]
+        return " WHERE " + " AND ".join(conditions) if conditions else ""
+
+    # timestamps (nanoseconds) of the first and the last point
+    def time_range(self):
+        limits = []
+        for order in ("ASC", "DESC"):
+            result = self.client.query(
+                'SELECT * FROM "{}"{} ORDER BY time {} LIMIT 1'.format(
+                    self.measurement, self._where(), order), epoch="ns")
+            points = list(result.get_points())
+            if not points:
+                return None
+            limits.append(int(points[0]["time"]))
+        return tuple(limits)
+
+    # all values of a tag in the measurement
+    def tag_values(self, key):
+        result = self.client.query(
+            'SHOW TAG VALUES FROM "{}" WITH KEY = "{}"'.format(
+                self.measurement, key))
+        return sorted(point["value"] for point in result.get_points())
+
+    # hdf5 types of the fields and tags of the measurement
+    def schema(self):
+        schema = {"timestamp": np.dtype("int64")}
+        result = self.client.query('SHOW FIELD KEYS FROM "{}"'.format(
+            self.measurement))
+        for point in result.get_points():
+            schema[point["fieldKey"]] = np.dtype(
+                FIELD_DTYPES[point["fieldType"]])
+        result = self.client.query('SHOW TAG KEYS FROM "{}"'.format(
+            self.measurement))
+        for point in result.get_points():
+            key = point["tagKey"]
+            schema[key] = tag_dtype(self.tag_values(key))
+        return schema
+
+    # points with start <= time < end (timestamps in nanoseconds)
+    def query_window(self, start, end):
+        return self._query('SELECT {} FROM "{}"{}'.format(
+            self.fields, self.measurement,
+            self._where("time >= {}".format(start),
+                        "time < {}".format(end))))
+
+
+# stand-in for InfluxSource which serves a table of points
+# (same columns as the query result, "time" as RFC3339 string)
+class LocalSource:
+    def __init__(self, table, tags=("sensor",)):
+        self.table = table.reset_index(drop=True)
+        self.timestamps = to_nanoseconds(self.table["time"])
+        self.tags = tags
+        self.queries = 0
+
+    def time_range(self):
+        if len(self.table) == 0:
+            return None
+        return int(self.timestamps.min()), int(self.timestamps.max())
+
+    def tag_values(self, key):
+        if key not in self.tags:
+            return []
+        return sorted(self.table[key].dropna().unique())
+
+    def schema(self):
+        return table_schema(self.table, self.tag_values)
+
+    def query_window(self, start, end):
+        self.queries += 1
+        selection = (self.timestamps >= start) & (self.timestamps < end)
+        return self.table[selection.values].reset_index(drop=True)
+
+
+################################################################################
+# helper function to translate a time into a timestamp in nanoseconds
+def to_timestamp(time):
+    return int(pd.Timestamp(time).value)
+
+
+# helper function to translate a column of times into nanosecond timestamps
+# (independent of the resolution pandas chooses for the parsed times)
+def to_nanoseconds(times):
+    try:
+        # fast parser for the RFC3339 times of InfluxDB (pandas >= 2.0)
+        times = pd.to_datetime(times, utc=True, format="ISO8601")
+    except ValueError:
+        times = pd.to_datetime(times, utc=True)
+    return (times - pd.Timestamp(0, tz="UTC")) // pd.Timedelta(1, "ns")
+
+
+# helper function to get the file which stores the progress of an export
+def state_path(csv_path, h5_path, measurement):
+    return "{}.{}.export.json".format(h5_path or csv_path, measurement)
+
+
+def load_state(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as infile:
+        return json.load(infile)
+
+
+# store the progress atomically, so an interruption leaves the last state
+def save_state(path, state):
+    with open(path + ".tmp", "w") as outfile:
+        json.dump(state, outfile)
+        outfile.flush()
+        os.fsync(outfile.fileno())
+    os.replace(path + ".tmp", path)
+
+
+# hdf5 types of the InfluxDB field types
+FIELD_DTYPES = {"float": "float32",
+                "integer": "int32",
+                "boolean": "bool",
+                "string": h5py.string_dtype()}
+
+
+# category of points without a tag (hdf5 enumerations have no empty names)
+MISSING_TAG = "-"
+
+
+# helper function to create the enumerated hdf5 type of a tag
+# (MISSING_TAG is always the first category, enumeration value 0)
+def tag_dtype(values):
+    values = [MISSING_TAG] + sorted({value for value in values
+                                     if pd.notna(value)} - {MISSING_TAG})
+    base = "uint8" if len(values) <= 256 else "uint16"
+    return h5py.enum_dtype(dict(zip(values, range(len(values)))), basetype=base)
+
+
+# helper function to derive the hdf5 types from the columns of a table
+# (for columns not described by the measurement schema)
+def table_schema(table, tag_values):
+    schema = {}
+    for key, values in table.items():
+        if key == "time":
+            # translate time to timestamp for more efficient storage
+            schema["timestamp"] = np.dtype("int64")
+        elif pd.api.types.is_bool_dtype(values):
+            schema[key] = np.dtype("bool")
+        elif pd.api.types.is_integer_dtype(values):
+            # save integer types as int32
+            schema[key] = np.dtype("int32")
+        elif pd.api.types.is_float_dtype(values):
+            # save float values as float32
+            schema[key] = np.dtype("float32")
+        else:
+            # save string values (tags) as enumerated type
+            schema[key] = tag_dtype(tag_values(key) or values.unique())
+    return schema
+
+
+# writer of the columns of a measurement into resizable, chunked and
+# compressed hdf5 datasets (one dataset per column)
+class ColumnWriter:
+    def __init__(self, grp, schema, chunk_size=H5_CHUNK_SIZE,
+                 compression=H5_COMPRESSION,
+                 compression_level=H5_COMPRESSION_LEVEL):
+        self.grp = grp
+        self.schema = dict(schema)
+        for key, dtype in self.schema.items():
+            if key not in grp:
+                grp.create_dataset(
+                    key, shape=(0,), maxshape=(None,), chunks=(chunk_size,),
+                    dtype=dtype, compression=compression, shuffle=True,
+                    compression_opts=compression_level
+                    if compression == "gzip" else None)
+        # translation from tag values to enumeration values
+        self.categories = {}
+        for key in self.schema:
+            tagdict = h5py.check_enum_dtype(grp[key].dtype)
+            if tagdict is not None:
+                names = sorted(tagdict, key=tagdict.get)
+                if [tagdict[name] for name in names] != \
+                        list(range(len(names))):
+                    raise ValueError("Enumeration of {} is not "
+                                     "consecutive".format(key))
+                self.categories[key] = names
+
+    @property
+    def rows(self):
+        return self.grp["timestamp"].shape[0]
+
+    # remove rows after the given number of rows
+    def truncate(self, rows):
+        for key in self.schema:
+            self.grp[key].resize((rows,))
+
+    # convert the values of a column into the hdf5 type
+    def convert(self, key, values):
+        dtype = self.grp[key].dtype
+        if key in self.categories:
+            # the category codes are the enumeration values, points without
+            # the tag get MISSING_TAG
+            values = values.fillna(MISSING_TAG).replace("", MISSING_TAG)
+            codes = pd.Categorical(values,
+                                   categories=self.categories[key]).codes
+            if (codes < 0).any():
+                unknown = set(values[codes < 0])
+                raise ValueError("Tag values {} of {} are not in the "
+                                 "enumeration {}".format(
+                                     sorted(unknown), key,
+                                     self.categories[key]))
+            return codes.astype(dtype)
+        if dtype.kind == "i":
+            # integer fields missing in some points are stored as -1
+            return values.fillna(-1).to_numpy(dtype=dtype)
+        if dtype.kind == "O":
+            return values.fillna("").astype(str).to_numpy(dtype=object)
+        return values.to_numpy(dtype=dtype)
+
+    # append a table of points (columns of the schema missing in the table
+    # are filled with -1, 0, an empty string or MISSING_TAG)
+    def append(self, table):
+        # all columns are converted before writing, so an error leaves the
+        # datasets unchanged
+        columns = {}
+        for key, dtype in self.schema.items():
+            if key == "timestamp":
+                columns[key] = to_nanoseconds(table["time"]).to_numpy()
+            elif key in table:
+                columns[key] = self.convert(key, table[key])
+            else:
+                # column missing in this chunk
+                fill = {"i": -1, "O": ""}.get(dtype.kind, 0)
+                columns[key] = np.full(len(table), fill, dtype=dtype)
+
+        rows = self.rows
+        new_rows = rows + len(table)
+        for key, values in columns.items():
+            dset = self.grp[key]
+            dset.resize((new_rows,))
+            dset[rows:new_rows] = values
+        return new_rows
+
+
+# helper function to get the columns of an export: the columns of the first
+# chunk and the fields and tags of the measurement schema, which are missing
+# in it (with "*" all, otherwise the selected ones), so fields which appear
+# in later chunks are not dropped
+def export_columns(table, schema, fields="*"):
+    columns = list(table.columns)
+    selected = None
+    if fields.strip() != "*":
+        selected = {name.strip().strip('"') for name in fields.split(",")}
+    for key in schema:
+        if key != "timestamp" and key not in columns and \
+                (selected is None or key in selected):
+            columns.append(key)
+    return columns
+
+
+# function to export a measurement window by window into csv and hdf5 files
+# returns the number of exported points
+def export_measurement(source, measurement, csv_path="", h5_path="",
+                       start=None, end=None, chunk_duration=CHUNK_DURATION,
+                       resume=RESUME):
+    state_file = state_path(csv_path, h5_path, measurement)
+    state = load_state(state_file) if resume else None
+
+    if state is None:
+        limits = source.time_range()
+        if limits is None:
+            print("Measurement {} is empty".format(measurement))
+            return 0
+        start = to_timestamp(start) if start is not None else limits[0]
+        # the end of the time range is exclusive
+        end = to_timestamp(end) if end is not None else limits[1] + 1
+        state = {"measurement": measurement, "start": start, "end": end,
+                 "position": start, "rows": 0, "csv_size": 0,
+                 "columns": None}
+
+        # a new export replaces existing data of the measurement
+        if csv_path:
+            open(csv_path, "w").close()
+        if h5_path:
+            with h5py.File(h5_path, "a") as file:
+                if measurement in file:
+                    del file[measurement]
+    else:
+        print("Resuming export of {} at {}".format(
+            measurement, pd.Timestamp(state["position"])))
+
+    step = pd.Timedelta(chunk_duration).value
+    csv_file = open(csv_path, "r+b") if csv_path else None
+    h5_file = h5py.File(h5_path, "a") if h5_path else None
+    try:
+        # remove data written after the last saved state (interrupted export)
+        if csv_file is not None:
+            csv_file.truncate(state["csv_size"])
+            csv_file.seek(state["csv_size"])
+        writer = None
+        if h5_file is not None:
+            grp = h5_file.require_group(measurement)
+            if "timestamp" in grp:
+                # datasets of the interrupted export define the schema
+                writer = ColumnWriter(grp, {key: dset.dtype
+                                            for key, dset in grp.items()})
+                writer.truncate(state["rows"])
+
+        while state["position"] < state["end"]:
+            window_end = min(state["position"] + step, state["end"])
+            table = source.query_window(state["position"], window_end)
+
+            if len(table):
+                # the columns are fixed by the first chunk and the schema
+                if state["columns"] is None:
+                    known = source.schema()
+                    state["columns"] = export_columns(
+                        table, known, getattr(source, "fields", "*"))
+                new = [key for key in table.columns
+                       if key not in state["columns"]]
+                if new:
+                    print("ERROR: Columns {} are not in the schema of the "
+                          "export and are dropped".format(new))
+                table = table.reindex(columns=state["columns"])
+
+                if csv_file is not None:
+                    table.to_csv(csv_file, index=False,
+                                 header=state["csv_size"] == 0)
+                    csv_file.flush()
+                    state["csv_size"] = csv_file.tell()
+
+                if h5_file is not None:
+                    if writer is None:
+                        # schema of the measurement, restricted to the
+                        # queried columns
+                        schema = table_schema(table.dropna(axis=1, how="all"),
+                                              source.tag_values)
+                        known = source.schema()
+                        schema = {key: known.get(key, schema.get(
+                            key, np.dtype("float32")))
+                                  for key in ["timestamp"] +
+                                  state["columns"] if key != "time"}
+                        writer = ColumnWriter(grp, schema)
+                    state["rows"] = writer.append(table)
+                    # add additional notes to file
+                    if "start" not in grp["timestamp"].attrs:
+                        strtype = h5py.special_dtype(vlen=bytes)
+                        grp["timestamp"].attrs.create("start",
+                                                      table["time"][0],
+                                                      dtype=strtype)
+                    h5_file.flush()
+                else:
+                    state["rows"] += len(table)
+
+            state["position"] = window_end
+            save_state(state_file, state)
+            print("Exported {} points until {}".format(
+                state["rows"], pd.Timestamp(window_end)))
+    finally:
+        if csv_file is not None:
+            csv_file.close()
+        if h5_file is not None:
+            h5_file.close()
+
+    return state["rows"]
+
+
+# plot the exported measurement from the hdf5 file
+def plot_h5(h5_path, measurement, max_points=PLOT_POINTS):
+    with h5py.File(h5_path, "r") as file:
+        grp = file[measurement]
+        # read every n-th point only
+        stride = max(1, int(np.ceil(grp["timestamp"].shape[0] / max_points)))
+        table = pd.DataFrame({key: dset[::stride]
+                              for key, dset in grp.items()})
 
-    # plot data
     table["time"] = pd.to_datetime(table["timestamp"])
     table.drop("timestamp", axis=1, inplace=True)
     table.set_index("time", inplace=True)
     table.plot(subplots=True)
     plt.show()
+
+
+################################################################################
+# main loop to query InfluxDB data and save csv and hdf5 files
+if __name__ == "__main__":
+    # crate InfluxDB client and connect to database
+    influx = influxdb.InfluxDBClient(host=INFLUX_HOST, port=INFLUX_PORT,
+                                     database=INFLUX_DATABASE)
+    source = InfluxSource(influx, INFLUX_MEASUREMENT, INFLUX_FIELDS,
+                          INFLUX_FILTER)
+
+    export_measurement(source, INFLUX_MEASUREMENT, CSV_FILENAME, H5_FILENAME,
+                       EXPORT_START, EXPORT_END)
+
+    # plot data
+    if PLOT and H5_FILENAME != "":
+        plot_h5(H5_FILENAME, INFLUX_MEASUREMENT)
@@ -0,0 +1,122 @@
+import os
+import time
+import tempfile
+import numpy as np
+import pandas as pd
+import h5py
+
+import InfluxQuery as iq
+
+
+# number of rows of the synthetic measurement
+NUM_ROWS = 5000000
+# number of sensors (values of the sensor tag)
+NUM_SENSORS = 20
+# rows per append of the chunked export
+APPEND_ROWS = 500000
+
+
+# helper function to create a synthetic measurement like the query result
+def create_table(num_rows, num_sensors, seed=0):
+    rng = np.random.default_rng(seed)
+    times = np.datetime64("2021-01-01T00:00:00", "s") + \
+        np.arange(num_rows) * np.timedelta64(1, "s")
+    return pd.DataFrame({
+        "cell_current": rng.uniform(0, 1000, num_rows),
+        "count": np.arange(num_rows, dtype="int64"),
+        "lux": rng.uniform(0, 2000, num_rows),
+        "old_voltage": rng.uniform(3, 5, num_rows),
+        "sensor": rng.choice(["Z{}".format(i + 1)
+                              for i in range(num_sensors)], num_rows),
+        "time": np.char.add(np.datetime_as_string(times), "Z"),
+        "voltage": rng.uniform(3, 5, num_rows),
+        "wifi_count": rng.integers(0, 100, num_rows)})
+
+
+# previous export of the complete table (types from the first value, tags
+# encoded by np.vectorize, one unchunked dataset per column)
+def write_previous(table, grp):
+    table = table.copy()
+    table["timestamp"] = iq.to_nanoseconds(table["time"])
+    table.drop("time", axis=1, inplace=True)
+
+    for key, values in table.items():
+        if (key == "timestamp"):
+            thistype = "int64"
+        elif (type(values[0]) == np.int64):
+            thistype = "int32"
+        elif (type(values[0]) == np.float64):
+            thistype = "float32"
+        elif (type(values[0]) == str):
+            tagvals = set(values)
+            tagdict = dict(zip(tagvals, range(len(tagvals))))
+            thistype = h5py.special_dtype(enum=("uint8", tagdict))
+            values = np.vectorize(tagdict.get)(values)
+
+        dset = grp.require_dataset(key, shape=values.shape, dtype=thistype)
+        dset[()] = values
+
+
+# new export with the column writer (optionally in several appends)
+def write_columns(table, grp, append_rows=None, compression=None):
+    schema = iq.table_schema(table, lambda key: table[key].unique())
+    writer = iq.ColumnWriter(grp, schema, compression=compression)
+    append_rows = append_rows or len(table)
+    for start in range(0, len(table), append_rows):
+        writer.append(table.iloc[start:start + append_rows])
+
+
+# tag encodings with the tag values known from the schema
+def encode_previous(values, tagvals):
+    tagdict = dict(zip(tagvals, range(len(tagvals))))
+    return np.vectorize(tagdict.get)(values)
+
+
+def encode_categorical(values, tagvals):
+    return pd.Categorical(values, categories=tagvals).codes
+
+
+# helper function to measure the run time and the file size
+def measure(function, table, **kwargs):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "bench.h5")
+        start = time.perf_counter()
+        with h5py.File(path, "w") as file:
+            function(table, file.create_group("m"), **kwargs)
+        duration = time.perf_counter() - start
+        return duration, os.path.getsize(path)
+
+
+if __name__ == "__main__":
+    table = create_table(NUM_ROWS, NUM_SENSORS)
+    print("Synthetic table: {} rows, {} sensors\n".format(NUM_ROWS,
+                                                          NUM_SENSORS))
+
+    # tag encoding only (fastest of three runs)
+    tagvals = sorted(table["sensor"].unique())
+    for name, encode in (("np.vectorize", encode_previous),
+                         ("pd.Categorical", encode_categorical)):
+        durations = []
+        for _ in range(3):
+            start = time.perf_counter()
+            encode(table["sensor"], tagvals)
+            durations.append(time.perf_counter() - start)
+        duration = min(durations)
+        print("Tag encoding {:16s} {:8.3f} s {:12.0f} rows/s".format(
+            name, duration, NUM_ROWS / duration))
+    print()
+
+    runs = [("previous (whole table)", write_previous, {}),
+            ("column writer (whole table)", write_columns, {}),
+            ("column writer ({} row appends)".format(APPEND_ROWS),
+             write_columns, {"append_rows": APPEND_ROWS}),
+            ("column writer, gzip", write_columns,
+             {"append_rows": APPEND_ROWS, "compression": "gzip"}),
+            ("column writer, lzf", write_columns,
+             {"append_rows": APPEND_ROWS, "compression": "lzf"})]
+    print("{:40s} {:>8s} {:>14s} {:>10s}".format(
+        "export", "time [s]", "rows/s", "size [MB]"))
+    for name, function, kwargs in runs:
+        duration, size = measure(function, table, **kwargs)
+        print("{:40s} {:8.3f} {:14.0f} {:10.1f}".format(
+            name, duration, NUM_ROWS / duration, size / 1e6))
@@ -0,0 +1,119 @@
+import itertools
+import numpy as np
+
+
+# numpy mirror of measurement_t (firebeetle_code/src/config.h)
+# <: little endian | f4: float | u4: unsigned int | i4: (long) int
+MEASUREMENT_DTYPE = np.dtype([("voltage", "<f4"),
+                              ("old_voltage", "<f4"),
+                              ("cell_current", "<f4"),
+                              ("light", "<f4"),
+                              ("measurement_count", "<u4"),
+                              ("dhry_count", "<u4"),
+                              ("timestamp", "<i4"),
+                              ("prediction", "<i4")])
+MEASUREMENT_SIZE = MEASUREMENT_DTYPE.itemsize
+
+# InfluxDB field names and formats of the measurement_t members
+# floats: 9 significant digits are enough to restore every float32 exactly
+# integers: "i" suffix of the line protocol
+INFLUX_FIELDS = [("voltage", "voltage", "%.9g"),
+                 ("old_voltage", "old_voltage", "%.9g"),
+                 ("cell_current", "cell_current", "%.9g"),
+                 ("lux", "light", "%.9g"),
+                 ("count", "measurement_count", "%di"),
+                 ("wifi_count", "dhry_count", "%di"),
+                 ("prediction", "prediction", "%di")]
+
+
+# helper function to interpret one or many concatenated packages as array of
+# measurements (no copy, incomplete measurements at the end are ignored)
+def decode_packages(data):
+    return np.frombuffer(data, dtype=MEASUREMENT_DTYPE,
+                         count=len(data) // MEASUREMENT_SIZE)
+
+
+# helper function to escape measurement names (commas and spaces) and tags
+# (commas, spaces and equal signs) for the line protocol
+def escape_key(key, chars=(",", " ", "=")):
+    for char in chars:
+        key = key.replace(char, "\\" + char)
+    return key
+
+
+# helper function to create the line protocol template of one measurement
+def line_template(measurement, sensor, fields=INFLUX_FIELDS):
+    # "%" in the names must not be taken as format specifier
+    measurement = escape_key(measurement, (",", " ")).replace("%", "%%")
+    sensor = escape_key(sensor).replace("%", "%%")
+
+    fields = ",".join("{}={}".format(name, fmt)
+                      for name, _, fmt in fields)
+    return "{},sensor={} {} %d\n".format(measurement, sensor, fields)
+
+
+# function to convert measurements into InfluxDB line protocol
+# (timestamps in seconds, the whole batch is formatted by one operation)
+# nan and inf are not allowed in the line protocol, these fields are left
+# out of their measurement and measurements without any field are dropped
+def to_line_protocol(records, measurement, sensor):
+    if len(records) == 0:
+        return b""
+
+    finite = np.ones(len(records), dtype=bool)
+    for _, key, _ in INFLUX_FIELDS:
+        if records.dtype[key].kind == "f":
+            finite &= np.isfinite(records[key])
+    if not finite.all():
+        lines = [to_line_protocol(records[finite], measurement, sensor)]
+        for record in records[~finite]:
+            fields = [field for field in INFLUX_FIELDS
+                      if np.isfinite(record[field[1]])]
+            if fields:
+                values = tuple(record[key].item() for _, key, _ in fields)
+                lines.append((line_template(measurement, sensor, fields) % (
+                    values + (record["timestamp"].item(),))).encode())
+        return b"".join(lines)
+
+    # one tuple per measurement with the values in the order of the template
+    keys = [key for _, key, _ in INFLUX_FIELDS] + ["timestamp"]
+    rows = records[keys].tolist()
+
+    values = tuple(itertools.chain.from_iterable(rows))
+    template = line_template(measurement, sensor)
+    return ((template * len(records)) % values).encode()
+
+
+# reassembly of measurements from a byte stream (e.g. a TCP connection)
+# received in pieces of arbitrary size
+class RecordFramer:
+    def __init__(self):
+        self.buffer = bytearray()
+        self.num_bytes = 0
+        self.num_records = 0
+
+    # add received bytes, returns all measurements completed by them
+    def feed(self, data):
+        self.num_bytes += len(data)
+        self.buffer += data
+
+        size = len(self.buffer) - len(self.buffer) % MEASUREMENT_SIZE
+        if size == 0:
+            return decode_packages(b"")
+        # the complete measurements are copied out of the reused buffer
+        records = decode_packages(bytes(self.buffer[:size]))
+        del self.buffer[:size]
+        self.num_records += len(records)
+        return records
+
+    # number of bytes of an incomplete measurement left in the buffer
+    @property
+    def remainder(self):
+        return len(self.buffer)
+
+
+# function to convert the measurements of many packages into line protocol
+# batch: list of (sensor, records)
+def encode_batch(batch, measurement):
+    return b"".join(to_line_protocol(records, measurement, sensor)
+                    for sensor, records in batch)
@@ -0,0 +1,114 @@
+import io
+import time
+import struct
+import numpy as np
+
+import ZombieDecoder as zd
+
+try:
+    from influxdb.line_protocol import make_lines
+except ImportError:
+    make_lines = None
+
+
+# number of packages (1024 bytes, 32 measurements) decoded per run
+NUM_PACKAGES = 2000
+# number of runs, the fastest run is reported
+REPEAT = 5
+
+INFLUX_MEASUREMENT = "test123"
+SENSOR = "Z1"
+
+
+# previous decoder of ZombieReceiver (struct.unpack and one dict per point)
+def parse_data_struct(data, sensor):
+    influx_points = []
+
+    datastream = io.BytesIO(data)
+    for i in range(len(data) // zd.MEASUREMENT_SIZE):
+        single_measurement = datastream.read(zd.MEASUREMENT_SIZE)
+        chunks = struct.unpack("<4f2Ili", single_measurement)
+
+        influx_message = {
+            "measurement": INFLUX_MEASUREMENT,
+            "tags": {"sensor": sensor},
+            "fields": {"voltage": chunks[0],
+                       "old_voltage": chunks[1],
+                       "cell_current": chunks[2],
+                       "lux": chunks[3],
+                       "count": chunks[4],
+                       "wifi_count": chunks[5],
+                       "prediction": chunks[7]},
+            "time": chunks[6]}
+        influx_points.append(influx_message)
+
+    return influx_points
+
+
+# helper function to create random packages
+def create_packages(num_packages, seed=0):
+    rng = np.random.default_rng(seed)
+    records = np.zeros(num_packages * 32, dtype=zd.MEASUREMENT_DTYPE)
+    for key in ("voltage", "old_voltage", "cell_current", "light"):
+        records[key] = rng.uniform(0, 1000, len(records))
+    records["measurement_count"] = np.arange(len(records))
+    records["dhry_count"] = rng.integers(0, 1000, len(records))
+    records["timestamp"] = 1600000000 + np.arange(len(records)) * 300
+    records["prediction"] = rng.integers(0, 3, len(records))
+    data = records.tobytes()
+    return [data[i:i + 1024] for i in range(0, len(data), 1024)]
+
+
+# helper function to measure the fastest run of a function
+def measure(function, repeat=REPEAT):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+if __name__ == "__main__":
+    packages = create_packages(NUM_PACKAGES)
+    data = b"".join(packages)
+    num_points = NUM_PACKAGES * 32
+
+    # both decoders have to read the same values
+    points = parse_data_struct(data, SENSOR)
+    records = zd.decode_packages(data)
+    for key, field, _ in zd.INFLUX_FIELDS:
+        assert np.array_equal([p["fields"][key] for p in points],
+                              records[field])
+    assert np.array_equal([p["time"] for p in points], records["timestamp"])
+
+    runs = [("struct, dict per point",
+             lambda: [parse_data_struct(p, SENSOR) for p in packages]),
+            ("numpy, per package",
+             lambda: [zd.decode_packages(p) for p in packages]),
+            ("numpy, concatenated packages",
+             lambda: zd.decode_packages(data)),
+            ("numpy + line protocol, per package",
+             lambda: [zd.to_line_protocol(zd.decode_packages(p),
+                                          INFLUX_MEASUREMENT, SENSOR)
+                      for p in packages]),
+            ("numpy + line protocol, concatenated",
+             lambda: zd.to_line_protocol(zd.decode_packages(data),
+                                         INFLUX_MEASUREMENT, SENSOR))]
+
+    # previous path including the conversion of the InfluxDB client
+    if make_lines is not None:
+        runs.insert(1, ("struct + InfluxDB client make_lines",
+                        lambda: make_lines(
+                            {"points": parse_data_struct(data, SENSOR)},
+                            precision="s")))
+
+    reference = None
+    print("{:40s} {:>10s} {:>14s} {:>8s}".format(
+        "decoder", "time [ms]", "points/s", "speedup"))
+    for name, function in runs:
+        duration = measure(function)
+        reference = reference or duration
+        print("{:40s} {:10.2f} {:14.0f} {:8.1f}".format(
+            name, 1000 * duration, num_points / duration,
+            reference / duration))
@@ -0,0 +1,185 @@
+import os
+import glob
+import time
+import asyncio
+import numpy as np
+import pandas as pd
+import multiprocessing as mp
+
+import ZombieDecoder as zd
+import ZombieReceiver as zr
+
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.abspath(os.path.join(THIS_DIR, "../data"))
+
+# recordings which are replayed (every simulated sensor replays one of them)
+CSV_FILES = sorted(glob.glob(os.path.join(DATA_DIR, "*.csv")))
+
+# define address of the receiver
+HOST_IP = "127.0.0.1"
+TCP_PORT = zr.TCP_PORT
+UDP_PORT = zr.UDP_PORT
+
+# "tcp": one connection per package (like the firmware) | "udp": datagrams
+PROTOCOL = "tcp"
+# packages sent over one TCP connection (1: live data, more: flash backlog)
+PACKAGES_PER_CONNECTION = 1
+# packages per second of every UDP sensor (0: as fast as possible)
+UDP_RATE = 100
+
+# number of simulated sensors and of processes generating their traffic
+NUM_SENSORS = 100
+NUM_PROCESSES = 2
+# duration of the load test in seconds
+DURATION = 10
+# every sensor sends from its own loopback address 127.0.x.y, so the
+# receiver sees different sensors (only works for a local receiver)
+DISTINCT_SOURCE_IPS = True
+
+# start a sharded receiver with the local sink in this script
+# (otherwise the receiver has to be started separately)
+START_RECEIVER = True
+RECEIVER_WORKERS = 2
+
+
+# helper function to convert a recording into packages of 32 measurements
+def load_packages(csv_path):
+    data = pd.read_csv(csv_path)
+
+    records = np.zeros(len(data), dtype=zd.MEASUREMENT_DTYPE)
+    records["voltage"] = data["voltage"]
+    records["old_voltage"] = data["old_voltage"]
+    records["cell_current"] = data["cell_current"]
+    records["light"] = data["lux"]
+    records["measurement_count"] = data["count"]
+    records["dhry_count"] = data["wifi_count"]
+    timestamps = pd.to_datetime(data["time"])
+    records["timestamp"] = timestamps.astype("int64") // 10**9
+    if "prediction" in data:
+        records["prediction"] = data["prediction"]
+
+    # only complete packages are sent
+    per_package = zr.PACKAGE_SIZE // zd.MEASUREMENT_SIZE
+    num_packages = len(records) // per_package
+    raw = records[:num_packages * per_package].tobytes()
+    return [raw[i:i + zr.PACKAGE_SIZE]
+            for i in range(0, len(raw), zr.PACKAGE_SIZE)]
+
+
+# helper function to get the source address of a simulated sensor
+def source_ip(sensor_id):
+    if not DISTINCT_SOURCE_IPS:
+        return None
+    return "127.0.{}.{}".format(sensor_id // 250, sensor_id % 250 + 2)
+
+
+# simulated sensor sending the packages of a recording over TCP
+async def tcp_sensor(sensor_id, packages, deadline):
+    local_addr = (source_ip(sensor_id), 0) if DISTINCT_SOURCE_IPS else None
+    sent = 0
+    position = 0
+    while time.monotonic() < deadline:
+        data = b"".join(packages[(position + i) % len(packages)]
+                        for i in range(PACKAGES_PER_CONNECTION))
+        position += PACKAGES_PER_CONNECTION
+
+        reader, writer = await asyncio.open_connection(HOST_IP, TCP_PORT,
+                                                       local_addr=local_addr)
+        writer.write(data)
+        await writer.drain()
+        writer.write_eof()
+        # wait until the receiver closes the connection
+        await reader.read()
+        writer.close()
+        await writer.wait_closed()
+        sent += PACKAGES_PER_CONNECTION
+    return sent
+
+
+# simulated sensor sending the packages of a recording as UDP datagrams
+async def udp_sensor(sensor_id, packages, deadline):
+    loop = asyncio.get_running_loop()
+    local_addr = (source_ip(sensor_id), 0) if DISTINCT_SOURCE_IPS else None
+    transport, _ = await loop.create_datagram_endpoint(
+        asyncio.DatagramProtocol, local_addr=local_addr,
+        remote_addr=(HOST_IP, UDP_PORT))
+
+    sent = 0
+    while time.monotonic() < deadline:
+        transport.sendto(packages[sent % len(packages)])
+        sent += 1
+        await asyncio.sleep(1 / UDP_RATE if UDP_RATE else 0)
+    transport.close()
+    return sent
+
+
+# traffic of the sensors of one generator process
+async def generate(sensor_ids, deadline):
+    # each recording is loaded once per process
+    recordings = {}
+    sensors = []
+    for sensor_id in sensor_ids:
+        csv_path = CSV_FILES[sensor_id % len(CSV_FILES)]
+        if csv_path not in recordings:
+            recordings[csv_path] = load_packages(csv_path)
+        sensor = tcp_sensor if PROTOCOL == "tcp" else udp_sensor
+        sensors.append(sensor(sensor_id, recordings[csv_path], deadline))
+    return sum(await asyncio.gather(*sensors))
+
+
+def run_generator(sensor_ids, deadline, result_queue):
+    result_queue.put(asyncio.run(generate(sensor_ids, deadline)))
+
+
+if __name__ == "__main__":
+    ctx = mp.get_context("fork")
+    zr.PRINT_PACKAGES = False
+
+    workers = []
+    metrics_queue = ctx.Queue()
+    if START_RECEIVER:
+        zr.SINK = "local"
+        zr.SPOOL_DIR = ""
+        zr.METRICS_INTERVAL = 0
+        zr.TCP_PORT = TCP_PORT
+        zr.UDP_PORT = UDP_PORT
+        zr.UDP_ENABLED = PROTOCOL == "udp"
+        workers = zr.start_workers(HOST_IP, RECEIVER_WORKERS,
+                                   metrics_queue=metrics_queue)
+        time.sleep(1)
+
+    # the sensors are distributed evenly over the generator processes
+    result_queue = ctx.Queue()
+    start = time.monotonic()
+    deadline = start + DURATION
+    generators = [ctx.Process(target=run_generator,
+                              args=(list(range(i, NUM_SENSORS,
+                                               NUM_PROCESSES)),
+                                    deadline, result_queue))
+                  for i in range(NUM_PROCESSES)]
+    for process in generators:
+        process.start()
+    sent = sum(result_queue.get() for _ in generators)
+    for process in generators:
+        process.join()
+    duration = time.monotonic() - start
+
+    print("Sent {} packages ({} points) in {:.1f} s: {:.0f} packages/s".format(
+        sent, sent * 32, duration, sent / duration))
+
+    if START_RECEIVER:
+        for process in workers:
+            process.terminate()
+        metrics = [metrics_queue.get() for _ in workers]
+        for process in workers:
+            process.join()
+
+        received = sum(m["points_received"] for m in metrics) // 32
+        print("Receiver: {} workers received {} packages: {:.0f} packages/s, "
+              "{:.0f} packages/s per worker".format(
+                  len(workers), received, received / duration,
+                  received / duration / len(workers)))
+        for i, m in enumerate(metrics):
+            print("  worker {}: {} packages, {} connections".format(
+                i, m["points_received"] // 32, m["connections"]))
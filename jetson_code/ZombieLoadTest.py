@@ -0,0 +1,100 @@
+import asyncio
+import random
+import struct
+import tempfile
+import time
+
+import ZombieReceiver as zr
+
+
+# define address of the receiver under test (runs in this process)
+HOST_IP = "127.0.0.1"
+TCP_PORT = 6820
+
+# number of simulated sensors and packages sent by every sensor
+NUM_SENSORS = 20
+NUM_PACKAGES = 200
+# packages sent over one connection (1: live data, more: flash backlog)
+PACKAGES_PER_CONNECTION = 1
+# maximum size of the pieces the data is written in (0: all at once)
+MAX_WRITE_SIZE = 0
+
+# simulated write latency of the local sink in seconds
+SINK_LATENCY = 0.05
+
+# receiver settings under test
+QUEUE_SIZE = 100
+BATCH_SIZE = 5000
+BATCH_TIMEOUT = 0.5
+# write the measurements to a temporary spool before writing them to the sink
+USE_SPOOL = False
+
+
+# helper function to create one package of 32 measurements
+def create_package(sensor, package):
+    measurements = []
+    for i in range(zr.PACKAGE_SIZE // zr.MEASUREMENT_SIZE):
+        count = package * 32 + i
+        measurements.append(struct.pack("<4f2Ili", 3.3, 3.2, 0.1, 100.0,
+                                        count, sensor, 1600000000 + count,
+                                        0))
+    return b"".join(measurements)
+
+
+# simulated sensor which opens one TCP connection per package (like the
+# firmware) or per backlog of packages and sends them as fast as the receiver
+# accepts them
+async def sensor(sensor_id, num_packages):
+    rng = random.Random(sensor_id)
+    for first in range(0, num_packages, PACKAGES_PER_CONNECTION):
+        last = min(first + PACKAGES_PER_CONNECTION, num_packages)
+        data = b"".join(create_package(sensor_id, package)
+                        for package in range(first, last))
+
+        reader, writer = await asyncio.open_connection(HOST_IP, TCP_PORT)
+        position = 0
+        while position < len(data):
+            size = rng.randint(1, MAX_WRITE_SIZE) if MAX_WRITE_SIZE else \
+                len(data)
+            writer.write(data[position:position + size])
+            await writer.drain()
+            position += size
+        writer.write_eof()
+        # wait until the receiver closes the connection
+        await reader.read()
+        writer.close()
+        await writer.wait_closed()
+
+
+async def main():
+    sink = zr.LocalSink(SINK_LATENCY)
+    spool_dir = tempfile.TemporaryDirectory() if USE_SPOOL else None
+    spool = zr.ZombieSpool(spool_dir.name) if USE_SPOOL else None
+    receiver = zr.ZombieReceiver(sink, QUEUE_SIZE, BATCH_SIZE, BATCH_TIMEOUT,
+                                 spool)
+    server = await receiver.start(HOST_IP, TCP_PORT, metrics_interval=0)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[sensor(i, NUM_PACKAGES)
+                           for i in range(NUM_SENSORS)])
+
+    # all points are queued when the last connection is closed
+    expected = NUM_SENSORS * NUM_PACKAGES * 32
+    server.close()
+    await server.wait_closed()
+    await receiver.stop()
+    duration = time.perf_counter() - start
+    if spool_dir is not None:
+        spool_dir.cleanup()
+
+    print(receiver.metrics)
+    print("Sent {} points in {:.2f} s ({:.0f} points/s), sink received {} "
+          "points in {} writes".format(
+              expected, duration, sink.points / duration, sink.points,
+              sink.writes))
+
+
+if __name__ == "__main__":
+    # do not print every package
+    zr.PRINT_PACKAGES = False
+    asyncio.run(main())
@@ -1,9 +1,16 @@
 import netifaces as ni
-import selectors
+import multiprocessing as mp
+import asyncio
+import signal
 import socket
-import struct
-import io
+import json
+import time
+import os
 import influxdb
+from influxdb.exceptions import InfluxDBClientError, InfluxDBServerError
+
+import ZombieDecoder as zd
+from ZombieSpool import ZombieSpool
 
 
 # define ip and ports to listen
@@ -11,15 +18,19 @@ HOST_IP = "192.168.8.101"
 UDP_PORT = 6819
 TCP_PORT = 6819
 
-# or get host ip from network interface
-HOST_IP = ni.ifaddresses("eth0")[ni.AF_INET][0]["addr"]
+# listen to UDP packages in addition to TCP connections
+UDP_ENABLED = False
 
-# crate InfluxDB client and connect to database
+# define InfluxDB connection
 INFLUX_HOST = "localhost"
 INFLUX_PORT = 8086
 INFLUX_DATABASE = "Zombielab"
-influx = influxdb.InfluxDBClient(host=INFLUX_HOST, port=INFLUX_PORT,
-                                 database=INFLUX_DATABASE)
+
+# define where the points are written to
+# "influx": InfluxDB | "local": stand-in sink which only counts the points
+SINK = "influx"
+# simulated write latency of the local sink in seconds
+LOCAL_SINK_LATENCY = 0.0
 
 
 # define name of the current measurement
@@ -27,141 +38,601 @@ INFLUX_MEASUREMENT = "test123"
 
 # define size of UDP package and size of single measurements
 PACKAGE_SIZE = 1024
-MEASUREMENT_SIZE = 32
+MEASUREMENT_SIZE = zd.MEASUREMENT_SIZE
 
 # define lookup table for IP addresses to sensor names
+# (used if the sensor config file does not exist)
 SENSOR_NAMES = {"192.168.8.111": "Z1",
                 "192.168.8.112": "Z2",
                 "192.168.8.113": "Z3"}
+# sensor config file (JSON object of IP addresses and sensor names), changes
+# are applied while the receiver is running
+SENSOR_CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             "sensors.json")
+# interval to check the sensor config file for changes (seconds)
+SENSOR_CONFIG_INTERVAL = 10
+
+# number of receiver processes sharing the listening port (1: no sharding)
+NUM_WORKERS = 1
+# "reuseport": every worker binds its own socket with SO_REUSEPORT and the
+# kernel distributes the connections | "prefork": the socket is bound once and
+# inherited by the forked workers
+SHARD_MODE = "reuseport" if hasattr(socket, "SO_REUSEPORT") else "prefork"
+
+# maximum number of packages waiting to be written (backpressure limit)
+QUEUE_SIZE = 1000
+# write a batch when this many points are collected ...
+BATCH_SIZE = 5000
+# ... or when the first point of the batch waited this long (seconds)
+BATCH_TIMEOUT = 1.0
+# interval to print the receiver metrics (seconds, 0 disables the output)
+METRICS_INTERVAL = 10
+# print a line for every received package
+PRINT_PACKAGES = True
+
+# maximum number of bytes read from a TCP connection at once
+READ_SIZE = 65536
+# close TCP connections which do not send anything for this long (seconds)
+READ_TIMEOUT = 30
+
+# directory of the write-ahead spool (empty string: no spool, the points are
+# only kept in the ingest queue and are lost if writing fails)
+# every worker process uses its own subdirectory worker_<number>
+SPOOL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "spool")
+# interval to write the spooled measurements to disk (fsync, seconds)
+SYNC_INTERVAL = 0.5
+# interval to check the spool for new measurements (seconds)
+REPLAY_INTERVAL = 0.05
+# wait this long before writing again after a failed write (seconds)
+RETRY_DELAY = 5
+# client errors of the database which are retried (timeout, too many
+# requests), all other client errors (4xx) reject the data permanently
+RETRY_STATUS_CODES = (408, 429)
+# batches of the spool, which fail with an error that is neither a rejection
+# nor a known transient error, are moved to the quarantine after this many
+# attempts
+MAX_WRITE_ATTEMPTS = 5
 
 
 ################################################################################
-# helper function to parse the data package and insert them in InfluxDB
-def parse_data(data, address):
-    # empty list to store InfluxDB insert commands
-    influx_points = []
-
-    datastream = io.BytesIO(data)
-    for i in range(len(data) // MEASUREMENT_SIZE):
-        single_measurement = datastream.read(MEASUREMENT_SIZE)
-
-        # unpack the binary string into separate variables
-        # <: little endian
-        # f: float | i: int | I: unsigned int | l: long int | s: string
-        # number: how many values of the following type
-        chunks = struct.unpack("<4f2Ili", single_measurement)
-
-        # construct InfluxDB insert message
-        influx_message = {
-            "measurement": INFLUX_MEASUREMENT,
-            "tags": {"sensor": SENSOR_NAMES[address]},
-            "fields": {"voltage": chunks[0],
-                       "old_voltage": chunks[1],
-                       "cell_current": chunks[2],
-                       "lux": chunks[3],
-                       "count": chunks[4],
-                       "wifi_count": chunks[5],
-                       "prediction": chunks[7]},
-            # timestamp needs to be in nanosecond precision
-            "time": chunks[6]}
-
-        # add InfluxDB insert message to list
-        influx_points.append(influx_message)
-
-    # send insert messages to InfluxDB
-    print("Write influx points: {}".format(influx_points))
-    influx.write_points(influx_points, time_precision="s")  # protocol="json",
+# lookup of sensor names by IP address, the config file is read again when it
+# was changed and unknown sensors use their IP address as name
+class SensorRegistry:
+    def __init__(self, path=SENSOR_CONFIG, default=SENSOR_NAMES,
+                 interval=SENSOR_CONFIG_INTERVAL):
+        self.path = path
+        self.default = dict(default)
+        self.interval = interval
+        self.names = dict(default)
+        self.unknown = set()
+        self.mtime = None
+        self.checked = None
+        self.reload()
+
+    # read the config file if it was changed since the last check
+    def reload(self):
+        self.checked = time.monotonic()
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            mtime = None
+        if mtime == self.mtime:
+            return
+
+        if mtime is None:
+            self.names = dict(self.default)
+        else:
+            try:
+                with open(self.path, "r") as infile:
+                    names = json.load(infile)
+            except (OSError, ValueError) as error:
+                # keep the current names until the file is fixed
+                print("ERROR: Reading sensor config {} failed: {}".format(
+                    self.path, error))
+                return
+            self.names = {str(key): str(value)
+                          for key, value in names.items()}
+            print("Loaded {} sensors from {}".format(len(self.names),
+                                                     self.path))
+        self.mtime = mtime
+        self.unknown.clear()
+
+    def name(self, address):
+        if time.monotonic() - self.checked > self.interval:
+            self.reload()
+
+        name = self.names.get(address)
+        if name is None:
+            name = address
+            if address not in self.unknown:
+                self.unknown.add(address)
+                print("Unknown sensor {}, using the IP address as "
+                      "name".format(address))
+        return name
+
+
+# function to classify a failed write
+# returns "rejected" (client error, writing the same data fails again),
+# "transient" (database not reachable, overloaded or server error) or
+# "unknown"
+def write_failure(error):
+    if isinstance(error, InfluxDBClientError):
+        code = getattr(error, "code", None)
+        if (code is not None and 400 <= code < 500 and
+                code not in RETRY_STATUS_CODES):
+            return "rejected"
+        return "transient"
+    if isinstance(error, (InfluxDBServerError, OSError)):
+        # connection errors and timeouts of requests are OSErrors
+        return "transient"
+    return "unknown"
 
 
 ################################################################################
-# helper function to register udp socket
-def register_udp_socket(selector):
-    udp_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    udp_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-    udp_sock.bind((HOST_IP, UDP_PORT))
-    udp_sock.setblocking(False)
-    print("Listening to UDP packages on {} : {}".format(HOST_IP, UDP_PORT))
-    # register udp socket to selector
-    selector.register(udp_sock, selectors.EVENT_READ, data=read_udp_package)
-
-
-# helper function to read udp package
-def read_udp_package(selector, socket):
-    data, addr = socket.recvfrom(2048)
-
-    print("Got UDP package from {} (IP: {}) | size {}".format(
-        SENSOR_NAMES[addr[0]], addr[0], len(data)))
-
-    if len(data) == PACKAGE_SIZE:
-        parse_data(data, addr[0])
-    else:
-        print("ERROR: Received package had wrong size", len(data))
+# InfluxDB client which writes line protocol data
+class InfluxSink:
+    def __init__(self, host=INFLUX_HOST, port=INFLUX_PORT,
+                 database=INFLUX_DATABASE):
+        # crate InfluxDB client and connect to database
+        self.client = influxdb.InfluxDBClient(host=host, port=port,
+                                              database=database)
+        self.database = database
+
+    def write_lines(self, data):
+        # timestamps of the measurements are in seconds
+        self.client.request(url="write", method="POST",
+                            params={"db": self.database, "precision": "s"},
+                            data=data, expected_response_code=204,
+                            headers={"Content-Type":
+                                     "application/octet-stream"})
+        return True
+
+
+# stand-in for the InfluxDB sink to run the receiver without database
+class LocalSink:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.points = 0
+        self.writes = 0
+
+    def write_lines(self, data):
+        if self.latency:
+            time.sleep(self.latency)
+        self.points += data.count(b"\n")
+        self.writes += 1
+        return True
+
+
+# counters to observe throughput and backpressure of the receiver
+class ReceiverMetrics:
+    def __init__(self):
+        self.packages = 0
+        self.points_received = 0
+        self.points_written = 0
+        self.points_failed = 0
+        # points of the spool which the sink rejected, moved to the quarantine
+        self.points_quarantined = 0
+        self.packages_dropped = 0
+        self.write_errors = 0
+        # bytes in the spool which are not yet written to the sink
+        self.spool_pending = 0
+        self.connections = 0
+        self.timeouts = 0
+        # packages (UDP) or connections (TCP) which did not end at the end
+        # of a measurement, and the number of bytes discarded because of it
+        self.wrong_size = 0
+        self.discarded_bytes = 0
+        self.batches = 0
+        self.write_time = 0.0
+        # time the connections waited for space in the ingest queue
+        self.blocked_time = 0.0
+        self.queue_max = 0
+
+    def __str__(self):
+        return ("connections {} | packages {} | points received {} "
+                "written {} failed {} quarantined {} | dropped packages {} | "
+                "timeouts {} | "
+                "wrong size {} ({} bytes) | batches {} | write errors {} | "
+                "write time {:.2f} s | blocked {:.2f} s | queue max {} | "
+                "spool pending {} bytes".format(
+                    self.connections, self.packages, self.points_received,
+                    self.points_written, self.points_failed,
+                    self.points_quarantined, self.packages_dropped,
+                    self.timeouts, self.wrong_size, self.discarded_bytes,
+                    self.batches, self.write_errors,
+                    self.write_time, self.blocked_time, self.queue_max,
+                    self.spool_pending))
 
 
 ################################################################################
-# helper function to register tcp socket
-def register_tcp_socket(selector):
-    tcp_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    tcp_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-    tcp_sock.bind((HOST_IP, TCP_PORT))
-    tcp_sock.setblocking(False)
-    tcp_sock.listen(5)
-    print("Listening to TCP packages on {} : {}".format(HOST_IP, TCP_PORT))
-    # register tcp socket to selector
-    selector.register(tcp_sock, selectors.EVENT_READ,
-                      data=accept_tcp_connection)
-
-
-# helper function to accept a tcp connection
-def accept_tcp_connection(selector, socket):
-    conn, addr = socket.accept()
-    conn.setblocking(False)
-    # print("Accepted TCP connection from {} (IP: {})".format(
-    #     SENSOR_NAMES[addr[0]], addr[0]))
-    # register connection socket to selector
-    selector.register(conn, selectors.EVENT_READ, data=read_tcp_package)
-
-
-# helper function to read tcp package
-def read_tcp_package(selector, socket):
-    data = b""
-    addr = socket.getpeername()
-
-    while True:
+# asyncio receiver with batched background writer
+# without spool: the measurements are passed to the writer by a bounded ingest
+# queue
+# with spool: the measurements are appended to the spool and a replay task
+# writes them to the sink, so nothing is lost if the database is unavailable
+class ZombieReceiver:
+    def __init__(self, sink, queue_size=QUEUE_SIZE, batch_size=BATCH_SIZE,
+                 batch_timeout=BATCH_TIMEOUT, spool=None, sensors=None,
+                 name="Receiver"):
+        self.sink = sink
+        self.sensors = sensors if sensors is not None else SensorRegistry()
+        self.name = name
+        self.batch_size = batch_size
+        self.batch_timeout = batch_timeout
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.spool = spool
+        self.stopping = False
+        self.metrics = ReceiverMetrics()
+
+    # put the measurements of a package into the ingest queue
+    # (waits if the queue is full, which slows down the connections)
+    async def ingest(self, sensor, records):
+        if self.spool is not None:
+            self.ingest_nowait(sensor, records)
+            return
+
+        self.metrics.packages += 1
+        self.metrics.points_received += len(records)
+
+        start = time.perf_counter()
+        await self.queue.put((sensor, records))
+        self.metrics.blocked_time += time.perf_counter() - start
+        self.metrics.queue_max = max(self.metrics.queue_max,
+                                     self.queue.qsize())
+
+    # put the measurements of a package into the ingest queue without waiting
+    # (UDP packages cannot be slowed down, so they are dropped)
+    def ingest_nowait(self, sensor, records):
+        self.metrics.packages += 1
+        self.metrics.points_received += len(records)
+        if self.spool is not None:
+            # written to the operating system, synced by the syncer task
+            self.spool.append(sensor, records)
+            return
         try:
-            data_part = socket.recv(2048)
-            data += data_part
-        finally:
-            print("Closing TCP connection from {} (IP: {})".format(
-                SENSOR_NAMES[addr[0]], addr[0]))
-            selector.unregister(socket)
-            socket.close()
-            break
-
-    print("Got TCP package from {} (IP: {}) | size {}".format(
-        SENSOR_NAMES[addr[0]], addr[0], len(data)))
+            self.queue.put_nowait((sensor, records))
+        except asyncio.QueueFull:
+            self.metrics.packages_dropped += 1
+        self.metrics.queue_max = max(self.metrics.queue_max,
+                                     self.queue.qsize())
+
+    # collect packages until the batch is full or the timeout is reached
+    # (returns the packages, their number of points and whether the receiver
+    # was stopped)
+    async def _collect_batch(self):
+        package = await self.queue.get()
+        if package is None:
+            return [], 0, True
+        batch = [package]
+        num_points = len(package[1])
+        deadline = time.monotonic() + self.batch_timeout
+
+        while num_points < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                package = await asyncio.wait_for(self.queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            if package is None:
+                return batch, num_points, True
+            batch.append(package)
+            num_points += len(package[1])
+        return batch, num_points, False
+
+    # write the batch in a thread, so the event loop is never blocked
+    # (returns None if writing was successful, otherwise the error)
+    async def _write_batch(self, batch, num_points):
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        try:
+            data = await loop.run_in_executor(None, zd.encode_batch, batch,
+                                              INFLUX_MEASUREMENT)
+            await loop.run_in_executor(None, self.sink.write_lines, data)
+            self.metrics.points_written += num_points
+            failure = None
+        except Exception as error:
+            self.metrics.write_errors += 1
+            print("ERROR: Writing {} points failed: {}".format(
+                num_points, error))
+            failure = error
+        self.metrics.write_time += time.perf_counter() - start
+        self.metrics.batches += 1
+        return failure
+
+    # background task to write the points of the ingest queue
+    async def writer(self):
+        stopped = False
+        while not stopped:
+            batch, num_points, stopped = await self._collect_batch()
+            if batch and await self._write_batch(batch, num_points):
+                self.metrics.points_failed += num_points
+
+    # background task to write the spooled measurements to disk
+    async def syncer(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(SYNC_INTERVAL)
+            await loop.run_in_executor(None, self.spool.sync)
+
+    # background task to write the spooled measurements to the sink
+    # a batch is written when it is full or the batch timeout has passed, the
+    # position after the written batch is stored as checkpoint
+    # transient failures are retried until the sink is available again, a
+    # batch which the sink rejects (or which fails MAX_WRITE_ATTEMPTS times
+    # with an unknown error) is moved to the quarantine of the spool and
+    # the checkpoint advances past it
+    async def replayer(self):
+        loop = asyncio.get_running_loop()
+        position = self.spool.load_checkpoint()
+        last_write = time.monotonic()
+        attempts = 0
+
+        while True:
+            pending = self.spool.pending_bytes(position)
+            self.metrics.spool_pending = pending
+            if self.stopping and pending == 0:
+                break
+
+            waiting = time.monotonic() - last_write < self.batch_timeout
+            if (not self.stopping and waiting and
+                    pending < self.batch_size * MEASUREMENT_SIZE) or \
+                    pending == 0:
+                await asyncio.sleep(REPLAY_INTERVAL)
+                continue
+
+            entries, num_points, new_position = await loop.run_in_executor(
+                None, self.spool.read, position, self.batch_size)
+
+            error = None
+            if entries:
+                error = await self._write_batch(entries, num_points)
+            if error is not None:
+                attempts += 1
+                failure = write_failure(error)
+                if failure == "transient" or (
+                        failure == "unknown" and
+                        attempts < MAX_WRITE_ATTEMPTS):
+                    if self.stopping:
+                        # the remaining measurements stay in the spool
+                        break
+                    await asyncio.sleep(RETRY_DELAY)
+                    continue
+
+                await loop.run_in_executor(None, self.spool.quarantine,
+                                           entries)
+                self.metrics.points_quarantined += num_points
+                print("ERROR: Moved {} points to the quarantine of the spool "
+                      "after {} attempts".format(num_points, attempts))
+
+            attempts = 0
+            position = new_position
+            await loop.run_in_executor(None, self.spool.save_checkpoint,
+                                       position)
+            last_write = time.monotonic()
+
+    # callback for every TCP connection
+    # reads until the sensor closes the connection, so one connection can
+    # carry any number of packages (e.g. the flash backlog after an outage),
+    # complete measurements are queued after every read and the connection is
+    # closed after the last of them is queued, so a full queue slows down the
+    # sensors
+    async def handle_tcp(self, reader, writer):
+        addr = writer.get_extra_info("peername")
+        sensor = self.sensors.name(addr[0])
+        framer = zd.RecordFramer()
+        self.metrics.connections += 1
 
-    if (len(data) == PACKAGE_SIZE) or (len(data) == MEASUREMENT_SIZE):
-        parse_data(data, addr[0])
+        try:
+            while True:
+                try:
+                    data = await asyncio.wait_for(reader.read(READ_SIZE),
+                                                  READ_TIMEOUT)
+                except asyncio.TimeoutError:
+                    self.metrics.timeouts += 1
+                    print("ERROR: Connection of {} (IP: {}) timed out".format(
+                        sensor, addr[0]))
+                    break
+                if not data:
+                    break
+
+                records = framer.feed(data)
+                if len(records):
+                    await self.ingest(sensor, records)
+        except ConnectionError as error:
+            print("ERROR: Connection of {} (IP: {}) failed: {}".format(
+                sensor, addr[0], error))
+        finally:
+            writer.close()
+
+        if PRINT_PACKAGES:
+            print("Got TCP data from {} (IP: {}) | size {} | measurements "
+                  "{}".format(sensor, addr[0], framer.num_bytes,
+                              framer.num_records))
+
+        if framer.remainder:
+            self.metrics.wrong_size += 1
+            self.metrics.discarded_bytes += framer.remainder
+            print("ERROR: Received data of {} ended with an incomplete "
+                  "measurement ({} bytes)".format(sensor, framer.remainder))
+
+    # callback for every UDP package
+    def handle_udp(self, data, addr):
+        sensor = self.sensors.name(addr[0])
+        if PRINT_PACKAGES:
+            print("Got UDP package from {} (IP: {}) | size {}".format(
+                sensor, addr[0], len(data)))
+
+        if len(data) == PACKAGE_SIZE:
+            self.ingest_nowait(sensor, zd.decode_packages(data))
+        else:
+            self.metrics.wrong_size += 1
+            self.metrics.discarded_bytes += len(data)
+            print("ERROR: Received package had wrong size", len(data))
+
+    # background task to print the metrics
+    async def report_metrics(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            print("{}: {} | queue {}".format(self.name, self.metrics,
+                                             self.queue.qsize()))
+
+    # start listening and writing (returns the TCP server)
+    # tcp_sock/udp_sock: already bound sockets to use instead of host and
+    # ports | reuse_port: allow other processes to bind the same ports
+    async def start(self, host, tcp_port=TCP_PORT, udp_port=None,
+                    metrics_interval=METRICS_INTERVAL, tcp_sock=None,
+                    udp_sock=None, reuse_port=False):
+        if self.spool is None:
+            self.writer_task = asyncio.create_task(self.writer())
+        else:
+            self.writer_task = asyncio.create_task(self.replayer())
+            self.syncer_task = asyncio.create_task(self.syncer())
+        self.metrics_task = None
+        if metrics_interval:
+            self.metrics_task = asyncio.create_task(
+                self.report_metrics(metrics_interval))
+
+        if tcp_sock is not None:
+            server = await asyncio.start_server(self.handle_tcp,
+                                                sock=tcp_sock)
+        else:
+            server = await asyncio.start_server(self.handle_tcp, host,
+                                                tcp_port, reuse_address=True,
+                                                reuse_port=reuse_port)
+        print("{}: Listening to TCP packages on {} : {}".format(
+            self.name, host, tcp_port))
+
+        loop = asyncio.get_running_loop()
+        if udp_sock is not None:
+            await loop.create_datagram_endpoint(lambda: UDPProtocol(self),
+                                                sock=udp_sock)
+        elif udp_port is not None:
+            await loop.create_datagram_endpoint(
+                lambda: UDPProtocol(self), local_addr=(host, udp_port),
+                reuse_port=reuse_port)
+        if udp_sock is not None or udp_port is not None:
+            print("{}: Listening to UDP packages on {} : {}".format(
+                self.name, host, udp_port))
+        return server
+
+    # stop the background tasks after writing the remaining points
+    async def stop(self):
+        if self.spool is None:
+            # the writer stops when it reaches the end marker of the queue
+            await self.queue.put(None)
+            await self.writer_task
+        else:
+            # the replayer stops when the synced spool is written
+            self.syncer_task.cancel()
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self.spool.sync)
+            self.stopping = True
+            await self.writer_task
+            self.spool.close()
+        if self.metrics_task is not None:
+            self.metrics_task.cancel()
+
+
+# asyncio protocol to forward UDP packages to the receiver
+class UDPProtocol(asyncio.DatagramProtocol):
+    def __init__(self, receiver):
+        self.receiver = receiver
+
+    def datagram_received(self, data, addr):
+        self.receiver.handle_udp(data, addr)
+
+
+# helper function to create the sink defined by SINK
+def create_sink():
+    if SINK == "local":
+        return LocalSink(LOCAL_SINK_LATENCY)
+    return InfluxSink(INFLUX_HOST, INFLUX_PORT, INFLUX_DATABASE)
+
+
+# run a receiver until SIGINT or SIGTERM
+# worker_id: number of the worker process (None: single receiver)
+# metrics_queue: multiprocessing queue to report the final metrics
+async def serve(host, worker_id=None, tcp_sock=None, udp_sock=None,
+                metrics_queue=None):
+    if worker_id is None:
+        name = "Receiver"
+        spool_dir = SPOOL_DIR
     else:
-        print("ERROR: Received package had wrong size", len(data))
+        name = "Worker {}".format(worker_id)
+        spool_dir = SPOOL_DIR and os.path.join(
+            SPOOL_DIR, "worker_{}".format(worker_id))
+
+    spool = ZombieSpool(spool_dir) if spool_dir else None
+    receiver = ZombieReceiver(create_sink(), spool=spool, name=name)
+    server = await receiver.start(host, TCP_PORT,
+                                  UDP_PORT if UDP_ENABLED else None,
+                                  metrics_interval=METRICS_INTERVAL,
+                                  tcp_sock=tcp_sock, udp_sock=udp_sock,
+                                  reuse_port=worker_id is not None)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+    await stop.wait()
+
+    # write the received measurements before exiting
+    server.close()
+    await server.wait_closed()
+    await receiver.stop()
+    print("{}: {}".format(name, receiver.metrics))
+    if metrics_queue is not None:
+        metrics_queue.put(vars(receiver.metrics))
+
+
+def run_worker(host, worker_id, tcp_sock=None, udp_sock=None,
+               metrics_queue=None):
+    asyncio.run(serve(host, worker_id, tcp_sock, udp_sock, metrics_queue))
+
+
+# start the worker processes of a sharded receiver
+def start_workers(host, num_workers=NUM_WORKERS, shard_mode=SHARD_MODE,
+                  metrics_queue=None):
+    tcp_sock = None
+    udp_sock = None
+    if shard_mode == "prefork":
+        # bind once, the forked workers accept on the inherited sockets
+        tcp_sock = socket.create_server((host, TCP_PORT), backlog=1024)
+        if UDP_ENABLED:
+            udp_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            udp_sock.bind((host, UDP_PORT))
+
+    ctx = mp.get_context("fork")
+    processes = []
+    for worker_id in range(num_workers):
+        process = ctx.Process(target=run_worker,
+                              args=(host, worker_id, tcp_sock, udp_sock,
+                                    metrics_queue))
+        process.start()
+        processes.append(process)
+
+    # the sockets are only used by the workers
+    for sock in (tcp_sock, udp_sock):
+        if sock is not None:
+            sock.close()
+    return processes
 
 
 ################################################################################
-# main loop to receive data via UDP and insert them in InfluxDB
+# main loop to receive data via TCP and insert them in InfluxDB
 if __name__ == "__main__":
-    # initialize the selector
-    sel = selectors.DefaultSelector()
-
-    # register the desired socket
-    register_tcp_socket(sel)
-
-    while True:
-        # wait for sockets to be ready
-        events = sel.select()
-
-        # loop through ready events and call apropriate callback function
-        # callback functions are stored in the data property
-        for selkey, selmask in events:
-            callback = selkey.data
-            callback(sel, selkey.fileobj)
+    # get host ip from network interface
+    HOST_IP = ni.ifaddresses("eth0")[ni.AF_INET][0]["addr"]
+
+    if NUM_WORKERS > 1:
+        processes = start_workers(HOST_IP)
+        # SIGINT (Ctrl+C) also reaches the workers, which stop by themselves
+        for process in processes:
+            try:
+                process.join()
+            except KeyboardInterrupt:
+                process.join()
+    else:
+        asyncio.run(serve(HOST_IP))
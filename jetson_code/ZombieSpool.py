@@ -0,0 +1,289 @@
+import os
+import sys
+import time
+import zlib
+import struct
+import threading
+
+import ZombieDecoder as zd
+
+
+# start a new segment file when the current one exceeds this size (bytes)
+SEGMENT_SIZE = 64 * 1024 * 1024
+# maximum number of measurements returned by one read of the spool
+READ_RECORDS = 50000
+
+SEGMENT_FORMAT = "spool_{:08d}.bin"
+CHECKPOINT_FILENAME = "checkpoint"
+# entries rejected by the sink (same format as the segments, not replayed)
+QUARANTINE_FILENAME = "quarantine.bin"
+
+# header of every entry: magic number, length of the sensor name, number of
+# measurements and crc32 of sensor name and measurements
+# <: little endian | H: unsigned short | B: unsigned char | x: pad byte
+# I: unsigned int
+HEADER = struct.Struct("<HBxII")
+MAGIC = 0x5A4D
+
+
+# append-only spool of received measurements
+# entries are written to numbered segment files and made durable by sync(),
+# a reader returns the entries after a position (segment, offset) and
+# stores its progress in a checkpoint file
+class ZombieSpool:
+    def __init__(self, spool_dir, segment_size=SEGMENT_SIZE):
+        self.spool_dir = spool_dir
+        self.segment_size = segment_size
+        os.makedirs(spool_dir, exist_ok=True)
+
+        # the lock keeps segment changes and fsync apart, readers only use
+        # the synced position (replaced as a whole, so no lock is needed)
+        self.lock = threading.Lock()
+
+        segments = self.segments()
+        self.segment = segments[-1] if segments else 0
+        path = self._path(self.segment)
+        # remove an incomplete entry of a crash while writing
+        if os.path.exists(path):
+            end = self._valid_end(self.segment)
+            if end < os.path.getsize(path):
+                os.truncate(path, end)
+
+        self.file = open(path, "ab", buffering=0)
+        self.offset = self.file.tell()
+        # data up to this position is written to disk
+        self.synced = (self.segment, self.offset)
+
+    def _path(self, segment):
+        return os.path.join(self.spool_dir, SEGMENT_FORMAT.format(segment))
+
+    # list the numbers of the segment files
+    def segments(self):
+        prefix, suffix = SEGMENT_FORMAT.split("{:08d}")
+        return sorted(int(name[len(prefix):-len(suffix)])
+                      for name in os.listdir(self.spool_dir)
+                      if name.startswith(prefix) and name.endswith(suffix))
+
+    # encode the measurements of a sensor as entry of a segment file
+    @staticmethod
+    def _entry(sensor, records):
+        sensor = sensor.encode()
+        payload = sensor + records.tobytes()
+        header = HEADER.pack(MAGIC, len(sensor), len(records),
+                             zlib.crc32(payload))
+        return header + payload
+
+    # append measurements of a sensor (written to the file, but not synced)
+    def append(self, sensor, records):
+        entry = self._entry(sensor, records)
+        self.file.write(entry)
+        self.offset += len(entry)
+
+        if self.offset >= self.segment_size:
+            self._next_segment()
+        return len(entry)
+
+    def _next_segment(self):
+        with self.lock:
+            os.fsync(self.file.fileno())
+            self.file.close()
+            self.synced = (self.segment, self.offset)
+
+            self.segment += 1
+            self.file = open(self._path(self.segment), "ab", buffering=0)
+            self.offset = 0
+
+    # make all appended entries durable (can run in another thread)
+    def sync(self):
+        with self.lock:
+            position = (self.segment, self.offset)
+            if position != self.synced:
+                os.fsync(self.file.fileno())
+                self.synced = position
+        return position
+
+    # parse the entries of a chunk of a segment file
+    # returns the entries and the number of bytes used by complete entries
+    @staticmethod
+    def _parse(chunk, max_records=None):
+        entries = []
+        num_records = 0
+        position = 0
+        while position + HEADER.size <= len(chunk):
+            magic, name_length, count, crc = HEADER.unpack_from(chunk,
+                                                                position)
+            start = position + HEADER.size
+            end = start + name_length + count * zd.MEASUREMENT_SIZE
+            if magic != MAGIC or end > len(chunk):
+                break
+            if zlib.crc32(chunk[start:end]) != crc:
+                break
+            if max_records and entries and num_records + count > max_records:
+                break
+
+            sensor = bytes(chunk[start:start + name_length]).decode()
+            records = zd.decode_packages(chunk[start + name_length:end])
+            entries.append((sensor, records))
+            num_records += count
+            position = end
+        return entries, num_records, position
+
+    # end of the valid entries of a segment file
+    def _valid_end(self, segment):
+        with open(self._path(segment), "rb") as infile:
+            return self._parse(infile.read())[2]
+
+    # parse the entries of a part of a segment file
+    def _read_chunk(self, segment, offset, size, max_records):
+        with open(self._path(segment), "rb") as infile:
+            infile.seek(offset)
+            chunk = memoryview(infile.read(size))
+        return self._parse(chunk, max_records)
+
+    # read entries after the position, up to the last synced position
+    # returns the entries, their number of measurements and the position
+    # after the last returned entry
+    def read(self, position, max_records=READ_RECORDS):
+        segment, offset = position
+        entries = []
+        num_records = 0
+
+        while num_records < max_records:
+            synced = self.synced
+            if (segment, offset) >= synced:
+                break
+
+            if segment == synced[0]:
+                end = synced[1]
+            else:
+                end = os.path.getsize(self._path(segment))
+
+            if offset < end:
+                remaining = max_records - num_records
+                # the size of the entries is only known after reading them,
+                # so the chunk is large enough for the remaining measurements
+                size = min(end - offset, 256 + remaining *
+                           (zd.MEASUREMENT_SIZE + HEADER.size))
+                new, count, used = self._read_chunk(segment, offset, size,
+                                                    remaining)
+                if not used and not entries and size < end - offset:
+                    # single entry with more measurements than requested
+                    size = end - offset
+                    new, count, used = self._read_chunk(segment, offset, size,
+                                                        remaining)
+                if not used and size == end - offset:
+                    # damaged entry, skip the rest of the segment
+                    print("ERROR: Skipping {} bytes of damaged spool data "
+                          "in {}".format(end - offset, self._path(segment)),
+                          file=sys.stderr)
+                    used = end - offset
+
+                entries += new
+                num_records += count
+                offset += used
+                if offset < end:
+                    if used:
+                        continue
+                    break
+
+            # continue with the next segment
+            if segment < synced[0]:
+                segment += 1
+                offset = 0
+            else:
+                break
+
+        return entries, num_records, (segment, offset)
+
+    # number of bytes between the position and the end of the spool
+    def pending_bytes(self, position):
+        segment, offset = position
+        synced = self.synced
+        pending = 0
+        for seg in range(segment, synced[0] + 1):
+            if seg == synced[0]:
+                size = synced[1]
+            else:
+                path = self._path(seg)
+                size = os.path.getsize(path) if os.path.exists(path) else 0
+            pending += size - (offset if seg == segment else 0)
+        return max(pending, 0)
+
+    # move entries, which the sink rejected, to the quarantine file
+    # (synced before the checkpoint is moved past them, can be read with
+    # read_quarantine and written again after the cause is fixed)
+    def quarantine(self, entries):
+        path = os.path.join(self.spool_dir, QUARANTINE_FILENAME)
+        with open(path, "ab") as outfile:
+            for sensor, records in entries:
+                outfile.write(self._entry(sensor, records))
+            outfile.flush()
+            os.fsync(outfile.fileno())
+
+    # entries of the quarantine file
+    def read_quarantine(self):
+        path = os.path.join(self.spool_dir, QUARANTINE_FILENAME)
+        if not os.path.exists(path):
+            return []
+        with open(path, "rb") as infile:
+            return self._parse(memoryview(infile.read()))[0]
+
+    # load position of the reader (start of the spool without checkpoint)
+    def load_checkpoint(self):
+        path = os.path.join(self.spool_dir, CHECKPOINT_FILENAME)
+        if os.path.exists(path):
+            with open(path, "r") as infile:
+                segment, offset = infile.read().split()
+            return int(segment), int(offset)
+        segments = self.segments()
+        return (segments[0] if segments else 0), 0
+
+    # store position of the reader and delete the fully read segments
+    def save_checkpoint(self, position):
+        path = os.path.join(self.spool_dir, CHECKPOINT_FILENAME)
+        with open(path + ".tmp", "w") as outfile:
+            outfile.write("{} {}\n".format(*position))
+            outfile.flush()
+            os.fsync(outfile.fileno())
+        os.replace(path + ".tmp", path)
+
+        for segment in self.segments():
+            if segment < position[0]:
+                os.remove(self._path(segment))
+
+    def close(self):
+        self.sync()
+        self.file.close()
+
+
+# function to write all entries after the checkpoint to the sink
+# (re-ingest a spool directory without running the receiver)
+def replay_spool(spool, sink, measurement, batch_size=READ_RECORDS):
+    position = spool.load_checkpoint()
+    total = 0
+    while True:
+        entries, num_records, new_position = spool.read(position, batch_size)
+        if new_position == position:
+            break
+        if entries:
+            sink.write_lines(zd.encode_batch(entries, measurement))
+            total += num_records
+        position = new_position
+        spool.save_checkpoint(position)
+    return total
+
+
+if __name__ == "__main__":
+    import ZombieReceiver as zr
+
+    # replay the spool of the receiver (e.g. after the database was down
+    # while the receiver was stopped)
+    spool_dir = sys.argv[1] if len(sys.argv) > 1 else zr.SPOOL_DIR
+    spool = ZombieSpool(spool_dir)
+
+    start = time.perf_counter()
+    total = replay_spool(spool, zr.create_sink(), zr.INFLUX_MEASUREMENT)
+    duration = time.perf_counter() - start
+    print("Replayed {} points in {:.2f} s ({:.0f} points/s)".format(
+        total, duration, total / max(duration, 1e-9)))
+    spool.close()
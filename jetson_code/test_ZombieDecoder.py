@@ -0,0 +1,37 @@
+import numpy as np
+
+import ZombieDecoder as zd
+
+
+# helper function to create measurements with increasing timestamps
+def make_records(num):
+    records = np.zeros(num, dtype=zd.MEASUREMENT_DTYPE)
+    records["voltage"] = 3.9
+    records["light"] = 100.5
+    records["measurement_count"] = np.arange(num)
+    records["timestamp"] = 1600000000 + 300 * np.arange(num)
+    return records
+
+
+def test_line_protocol():
+    lines = zd.to_line_protocol(make_records(2), "test 1", "Z1").decode()
+    assert lines.splitlines() == [
+        "test\\ 1,sensor=Z1 voltage=3.9000001,old_voltage=0,cell_current=0,"
+        "lux=100.5,count=0i,wifi_count=0i,prediction=0i 1600000000",
+        "test\\ 1,sensor=Z1 voltage=3.9000001,old_voltage=0,cell_current=0,"
+        "lux=100.5,count=1i,wifi_count=0i,prediction=0i 1600000300"]
+
+
+def test_line_protocol_nan_lux():
+    records = make_records(3)
+    records["light"][1] = np.nan
+    lines = zd.to_line_protocol(records, "test", "Z1").decode().splitlines()
+
+    assert len(lines) == 3
+    assert not any("nan" in line or "inf" in line for line in lines)
+    # the measurement keeps its other fields
+    nan_line = [line for line in lines if line.endswith(" 1600000300")]
+    assert nan_line == ["test,sensor=Z1 voltage=3.9000001,old_voltage=0,"
+                        "cell_current=0,count=1i,wifi_count=0i,prediction=0i "
+                        "1600000300"]
+
@@ -4,6 +4,9 @@
 # Email:    michael.rinderle@tum.de
 # Created:  18.05.2021
 # Revision: 23.08.2021 - Add sanity check
+#           18.10.2026 - Parallel headless batch rendering
+#           18.10.2026 - Plot the clean segments of the shared sanity check
+#           18.10.2026 - Read the recordings from a memory-mapped store
 #
 # Description: Plot recorded timeseries data
 #
@@ -13,16 +16,24 @@
 import h5py
 import os
 import re
+import time
+import shutil
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 from matplotlib.ticker import MultipleLocator, MaxNLocator
 from matplotlib.dates import DateFormatter
+from concurrent.futures import ProcessPoolExecutor
+
+import zombie_store as zs
+
+# LaTeX is only used for the labels if it is installed
+USE_TEX = shutil.which("latex") is not None
 
 plt.rcParams.update({
-    "text.usetex": True,
+    "text.usetex": USE_TEX,
     "font.family": "serif",
-    "font.serif": ["Palatino"],
+    "font.serif": ["Palatino", "DejaVu Serif"],
 })
 
 # define variable length string type for hdf5 attributes
@@ -31,52 +42,119 @@ strtype = h5py.special_dtype(vlen=bytes)
 # define path of stored data
 THIS_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.abspath(os.path.join(THIS_DIR, "../data"))
+PICTURE_DIR = os.path.abspath(os.path.join(THIS_DIR, "../pictures"))
+PICTURE_FORMAT = "png"
+# memory-mapped store of the recording files (see zombie_store.py), it is
+# converted again when a recording changed
+STORE_DIR = os.path.join(DATA_DIR, "recordings_store")
+STORE_FEATURES = zs.FEATURES + ["count", "wifi_count"]
+
+# size and resolution of the figures
+FIGSIZE = (8, 5)
+DPI = 192
+
+# reduce every series to the minimum and maximum per pixel column before
+# plotting (the picture looks the same, but long series render much faster)
+DECIMATE = True
+
+# number of worker processes of the batch mode
+NUM_WORKERS = os.cpu_count()
+# render all pictures, even if they are newer than the data
+FORCE = False
+
+
+# helper function to reduce a series to the minimum and maximum of each bin
+# of consecutive samples (both in their original order)
+def decimate_minmax(x, y, num_bins):
+    if not num_bins or len(y) <= 2 * num_bins:
+        return x, y
+
+    # equally sized bins, the last one is padded with the final sample
+    size = -(-len(y) // num_bins)
+    num_bins = -(-len(y) // size)
+    padding = np.repeat(y[-1:], num_bins * size - len(y))
+    bins = np.concatenate([y, padding]).reshape(num_bins, size)
+
+    offsets = np.arange(num_bins) * size
+    index = np.stack([bins.argmin(axis=1) + offsets,
+                      bins.argmax(axis=1) + offsets], axis=1)
+    index = np.minimum(np.sort(index, axis=1).ravel(), len(y) - 1)
+    return x[index], y[index]
+
+
+# store opened by the process (the worker processes open it once each)
+_store = None
+
 
+# helper function to open the store of the recordings
+def get_store():
+    global _store
+    if _store is None:
+        _store = zs.ZombieStore(STORE_DIR)
+    return _store
 
-def plot_zombie_data(filename, xaxis_relative=False):
-    with h5py.File(os.path.join(DATA_DIR, filename), "r") as file:
-        # there is only one dataset in the hdf5 files
-        dataset = list(file.keys())[0]
-        grp = file.get(dataset)
-        # get data from hdf5 file
-        time = pd.to_datetime(grp.get("timestamp")[()])
-        start_time = grp["timestamp"].attrs["start"]
-        voltage = np.array(grp.get("voltage")[()])
-        cell_current = np.array(grp.get("cell_current")[()])
-        lux = np.array(grp.get("lux")[()])
-        count = np.array(grp.get("count")[()])
-        wifi_count = np.array(grp.get("wifi_count")[()])
-
-    # sanity check (counters increase monotonically)
-    check = np.logical_or(np.diff(count) < 0, np.diff(wifi_count) < 0)
-    if check.any():  # .
-        # filter data in case of any problem
-        problem_index = np.argwhere(check).flatten()[0] + 1
-        time = time[:problem_index]
-        voltage = voltage[:problem_index]
-        cell_current = cell_current[:problem_index]
-        lux = lux[:problem_index]
-        count = count[:problem_index]
-        wifi_count = wifi_count[:problem_index]
-        print(f"Counters not monotonically increasing in file {filename!r}")
-        print(f"The problem occured at index {problem_index} of {len(time)}")
+
+# helper function to convert the recording files into the store
+def update_store(hdf5_files):
+    paths = [os.path.join(DATA_DIR, f) for f in hdf5_files]
+    if paths and zs.update_store(paths, STORE_DIR, STORE_FEATURES):
+        print(f"Converted {len(paths)} files into {STORE_DIR}")
+
+
+def plot_zombie_data(filename, xaxis_relative=False, num_bins=None):
+    # get data of the recording from the store
+    store = get_store()
+    name = os.path.splitext(filename)[0]
+    t = pd.to_datetime(store.get(name, "timestamp"))
+    voltage = store.get(name, "voltage")
+    cell_current = store.get(name, "cell_current")
+    lux = store.get(name, "lux")
+    count = store.get(name, "count")
+    wifi_count = store.get(name, "wifi_count")
+
+    # sanity check, only the clean segments are plotted (counter resets,
+    # gaps and duplicated records are left out)
+    segments = store.get_segments(name)
+    if (segments[:, 1] - segments[:, 0]).sum() < len(t):
+        print(f"Problems in file {filename!r}, plotting {len(segments)} "
+              f"clean segments")
+    if len(segments) == 0:
+        # nothing to plot (e.g. a file without any valid sample)
+        print(f"No clean segment in file {filename!r}, skipping it")
+        return None
+    first = segments[0, 0]
+    last = segments[-1, 1] - 1
+    num_kept = (segments[:, 1] - segments[:, 0]).sum()
 
     if xaxis_relative:
         # create x axis relative to first timestep
-        timediff = time - time[0]
+        timediff = t - t[first]
         xvalues = timediff.astype("timedelta64[m]") / 60
     else:
-        xvalues = time
-        daymin = xvalues[0].floor("d")
-        daymax = xvalues[-1].ceil("d")
+        xvalues = t
+        daymin = xvalues[first].floor("D")
+        daymax = xvalues[last].ceil("D")
+    xvalues = np.asarray(xvalues)
+
+    # helper function to plot the (decimated) segments of a series as one
+    # line, which is interrupted between the segments
+    def plot(ax, values, color):
+        x_parts, y_parts = [], []
+        for start, stop in segments:
+            bins = num_bins and max(num_bins * (stop - start) // num_kept, 1)
+            x, y = decimate_minmax(xvalues[start:stop],
+                                   values[start:stop].astype("float64"), bins)
+            x_parts += [x, x[-1:]]
+            y_parts += [y, [np.nan]]
+        ax.plot(np.concatenate(x_parts), np.concatenate(y_parts), color=color)
 
     # print timeseries data
-    fig = plt.figure(figsize=(8, 5), dpi=160)
+    fig = plt.figure(figsize=FIGSIZE, dpi=160)
     fig.suptitle(os.path.splitext(filename)[0])
 
     col1 = "tab:blue"
     ax1 = plt.subplot(311)
-    ax1.plot(xvalues, voltage, color=col1)
+    plot(ax1, voltage, col1)
     ax1.tick_params(axis='x', labelbottom=False)
     ax1.set_ylim([2.8, 7])
     ax1.set_yticks([3, 4, 5, 6, 7])
@@ -90,7 +168,7 @@ def plot_zombie_data(filename, xaxis_relative=False):
         # major ticks every day, minor ticks every 6 hours
         ax1.xaxis.set_major_locator(MultipleLocator(24))
         ax1.xaxis.set_minor_locator(MultipleLocator(6))
-        ax1.set_xlim([0, xvalues[-1]])
+        ax1.set_xlim([0, xvalues[last]])
     else:
         # major ticks every day, minor ticks every 6 hours
         ax1.xaxis.set_major_locator(MultipleLocator(1))
@@ -102,7 +180,7 @@ def plot_zombie_data(filename, xaxis_relative=False):
     col21 = "tab:red"
     col22 = "tab:green"
     ax21 = plt.subplot(312, sharex=ax1)
-    ax21.plot(xvalues, cell_current, color=col21)
+    plot(ax21, cell_current, col21)
     ax21.tick_params(axis='x', labelbottom=False)
     ax21.set_ylim([0, 1000])
     ax21.yaxis.set_major_locator(MaxNLocator(4))
@@ -110,7 +188,7 @@ def plot_zombie_data(filename, xaxis_relative=False):
     ax21.tick_params(axis='y', labelcolor=col21)
     ax21.grid("on")
     ax22 = ax21.twinx()
-    ax22.plot(xvalues, lux, color=col22)
+    plot(ax22, lux, col22)
     ax22.set_ylim([0, max(1200, lux.max())])
     ax22.yaxis.set_major_locator(MaxNLocator(4))
     ax22.set_ylabel("Illum [lux]", color=col22)
@@ -119,14 +197,14 @@ def plot_zombie_data(filename, xaxis_relative=False):
     col31 = "tab:olive"
     col32 = "tab:purple"
     ax31 = plt.subplot(313, sharex=ax1)
-    ax31.plot(xvalues, count, color=col31)
+    plot(ax31, count, col31)
     ax31.set_ylim([0, 1.2 * np.ceil(count.max())])
     ax31.yaxis.set_major_locator(MaxNLocator(4))
     ax31.set_ylabel("message count", color=col31)
     ax31.tick_params(axis='y', labelcolor=col31)
     ax31.grid("on")
     ax32 = ax31.twinx()
-    ax32.plot(xvalues, wifi_count, color=col32)
+    plot(ax32, wifi_count, col32)
     ax32.set_ylim([0, 1.2 * np.ceil(wifi_count.max())])
     ax32.yaxis.set_major_locator(MaxNLocator(4))
     ax32.set_ylabel("wifi count", color=col32)
@@ -139,6 +217,27 @@ def plot_zombie_data(filename, xaxis_relative=False):
 
     fig.align_ylabels([ax1, ax21, ax31])
     fig.align_ylabels([ax22, ax32])
+    return fig
+
+
+# helper function to check if a picture is newer than its data file
+def is_up_to_date(filename, picture_path):
+    return os.path.exists(picture_path) and \
+        os.path.getmtime(picture_path) >= \
+        os.path.getmtime(os.path.join(DATA_DIR, filename))
+
+
+# render one data file into a picture (runs in the worker processes)
+# returns None if the file has nothing to plot
+def render_file(filename, picture_path, xaxis_relative=False):
+    num_bins = int(FIGSIZE[0] * DPI) if DECIMATE else None
+    fig = plot_zombie_data(filename, xaxis_relative, num_bins)
+    if fig is None:
+        return None
+    fig.savefig(picture_path, dpi=DPI, format=PICTURE_FORMAT)
+    # free the memory of the figure
+    plt.close(fig)
+    return picture_path
 
 
 if __name__ == "__main__":
@@ -147,15 +246,37 @@ if __name__ == "__main__":
     # plot_zombie_data("2020-01-14_window.h5", xaxis_relative=True)
     # plt.show()
 
+    # render without a display
+    plt.switch_backend("Agg")
+
     # list all hdf5 files in data directory
     pattern = re.compile(r"\d{4}-\d{2}-\d{2}_\w+.h5")
     hdf5_files = [f for f in os.listdir(DATA_DIR) if pattern.match(f)]
     hdf5_files.sort()
 
-    picture_directory = os.path.abspath(os.path.join(THIS_DIR, "../pictures"))
-    picture_format = "png"
+    update_store(hdf5_files)
+
+    # only render pictures which are older than their data
+    os.makedirs(PICTURE_DIR, exist_ok=True)
+    jobs = []
     for f in hdf5_files:
-        plot_zombie_data(f, xaxis_relative=False)
-        picture_filename = os.path.splitext(f)[0] + "." + picture_format
-        picture_path = os.path.join(picture_directory, picture_filename)
-        plt.savefig(picture_path, dpi=192, format=picture_format)
+        picture_filename = os.path.splitext(f)[0] + "." + PICTURE_FORMAT
+        picture_path = os.path.join(PICTURE_DIR, picture_filename)
+        if FORCE or not is_up_to_date(f, picture_path):
+            jobs.append((f, picture_path))
+    print(f"{len(hdf5_files) - len(jobs)} pictures up to date, "
+          f"rendering {len(jobs)} pictures")
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=NUM_WORKERS,
+                             initializer=plt.switch_backend,
+                             initargs=("Agg",)) as executor:
+        futures = [executor.submit(render_file, f, picture_path)
+                   for f, picture_path in jobs]
+        for (f, _), future in zip(jobs, futures):
+            if future.result() is None:
+                print(f"Skipped: {f}")
+            else:
+                print(f"Written: {future.result()}")
+    print(f"Rendered {len(jobs)} pictures in "
+          f"{time.perf_counter() - start:.1f} s")
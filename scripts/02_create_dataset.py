@@ -3,6 +3,9 @@
 # Author:   Michael Rinderle
 # Email:    michael.rinderle@tum.de
 # Created:  18.05.2021
+# Revision: 18.10.2026 - Single pass, incremental and parallel build
+#           18.10.2026 - Store the clean segments of the sanity check
+#           18.10.2026 - Remove recordings of deleted source files
 #
 # Description: This script converts time-series data stored in separate files
 #              and stores them in a single hdf5 file for later use.
@@ -13,7 +16,13 @@
 import h5py
 import os
 import re
+import hashlib
+import itertools
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+import zombie_quality as zq
+from zombie_store import find_category
 
 
 # define variable length string type for hdf5 attributes
@@ -22,47 +31,150 @@ strtype = h5py.special_dtype(vlen=bytes)
 # define path of stored data
 THIS_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.abspath(os.path.join(THIS_DIR, "../data"))
-
-# list all hdf5 files in data directory
-pattern = re.compile(r"\d{4}-\d{2}-\d{2}_\w+.h5")
-hdf5_files = [f for f in os.listdir(DATA_DIR) if pattern.match(f)]
-hdf5_files.sort()
-
-# filter files
-hdf5_files = hdf5_files
-
-# definition of categories
-category_dictionary = {"90mindark": 0, "const": 1, "window": 2}
-
-# find category from filenames
-category = np.zeros(len(hdf5_files), dtype=int) - 1
-for i, filename in enumerate(hdf5_files):
-    for cat_name, cat_id in category_dictionary.items():
-        if cat_name in filename:
-            category[i] = cat_id
-
-
-for i, filename in enumerate(hdf5_files):
-    # open files to read and write data
-    infile = h5py.File(f"{DATA_DIR}/{filename}", "r")
-    outfile = h5py.File(f"{DATA_DIR}/all_data.h5", "a")
-
-    # there is only one group in the files
-    ingrp = infile.get(list(infile.keys())[0])
-
-    # crete group in output file
-    outgrp = outfile.require_group(filename.strip(".h5"))
-
-    # copy the relevant datasets from input to output file
-    ingrp.copy("timestamp", outgrp)
-    ingrp.copy("voltage", outgrp)
-    ingrp.copy("cell_current", outgrp)
-    ingrp.copy("lux", outgrp)
+OUTPUT_PATH = os.path.join(DATA_DIR, "all_data.h5")
+
+# datasets which are copied from the input files
+DATASETS = ["timestamp", "voltage", "cell_current", "lux"]
+
+# compression ("gzip" or "lzf") and chunk size of the output datasets
+COMPRESSION = "gzip"
+COMPRESSION_LEVEL = 4
+CHUNK_SIZE = 4096
+
+# number of worker processes to read the input files
+NUM_WORKERS = os.cpu_count()
+
+# helper function to compute the hash of a source file
+def file_hash(path):
+    sha = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+# helper function to read the relevant datasets of a source file
+# (executed in the worker processes)
+def read_recording(path, cache_dir=zq.CACHE_DIR):
+    with h5py.File(path, "r") as infile:
+        # there is only one group in the files
+        ingrp = infile.get(list(infile.keys())[0])
+
+        data = {}
+        for key in DATASETS:
+            data[key] = (ingrp[key][()], dict(ingrp[key].attrs))
+
+    # clean segments of the recording (cached by the sanity check)
+    segments, problems = zq.load_segments(path, cache_dir=cache_dir)
+
+    return os.path.basename(path), file_hash(path), data, segments, problems
+
+
+# helper function to write a recording into the output file
+def write_recording(outfile, name, data, segments, category, source_mtime,
+                    source_hash):
+    # remove outdated data of a previous run
+    if name in outfile:
+        del outfile[name]
+    outgrp = outfile.create_group(name)
+
+    for key, (values, attrs) in data.items():
+        # chunking and compression is only possible for non empty datasets
+        if len(values):
+            dset = outgrp.create_dataset(
+                key, data=values, chunks=(min(CHUNK_SIZE, len(values)),),
+                compression=COMPRESSION, shuffle=True,
+                compression_opts=COMPRESSION_LEVEL
+                if COMPRESSION == "gzip" else None)
+        else:
+            dset = outgrp.create_dataset(key, data=values)
+        for attr_name, attr_value in attrs.items():
+            dset.attrs[attr_name] = attr_value
+
+    # store the [start, stop) indices of the clean segments
+    outgrp.create_dataset("segments", data=segments.astype("int64"),
+                          shape=(len(segments), 2))
 
     # store the category of the timeseries
-    outgrp.require_dataset("category", shape=(1,), dtype="uint8")
-    outgrp["category"][0] = category[i]
-
-    # close files
-    infile.close()
-    outfile.close()
+    outgrp.create_dataset("category", data=np.array([category]).astype("uint8"))
+
+    # store source information for incremental rebuilds
+    outgrp.attrs["source_mtime"] = source_mtime
+    outgrp.attrs["source_hash"] = source_hash
+
+
+# helper function to remove the recordings whose source file was deleted or
+# renamed (names: groups of the current source files)
+def remove_stale(outfile, names):
+    stale = sorted(set(outfile.keys()) - set(names))
+    for name in stale:
+        del outfile[name]
+    return stale
+
+
+# helper function to store the manifest of all groups as file attributes
+def write_manifest(outfile):
+    names = sorted(outfile.keys())
+    lengths = [len(outfile[name]["lux"]) for name in names]
+    categories = [outfile[name]["category"][0] for name in names]
+
+    outfile.attrs["manifest_names"] = names
+    outfile.attrs["manifest_lengths"] = np.array(lengths, dtype="int64")
+    outfile.attrs["manifest_categories"] = np.array(categories, dtype="uint8")
+
+
+# function to build or update the output file from the source files in
+# data_dir, only new or changed files are read again
+def build_dataset(data_dir=DATA_DIR, output_path=OUTPUT_PATH,
+                  cache_dir=zq.CACHE_DIR, num_workers=NUM_WORKERS):
+    # list all hdf5 files in data directory
+    pattern = re.compile(r"\d{4}-\d{2}-\d{2}_\w+.h5")
+    hdf5_files = [f for f in os.listdir(data_dir) if pattern.match(f)]
+    hdf5_files.sort()
+
+    with h5py.File(output_path, "a") as outfile:
+        # recordings of removed or renamed files would stay in the manifest
+        for name in remove_stale(outfile, [os.path.splitext(f)[0]
+                                           for f in hdf5_files]):
+            print(f"Removed:   {name}")
+
+        # find files which are new or changed since the last run
+        outdated = []
+        for filename in hdf5_files:
+            name = os.path.splitext(filename)[0]
+            mtime = os.path.getmtime(os.path.join(data_dir, filename))
+
+            if name not in outfile or "segments" not in outfile[name] or \
+                    outfile[name].attrs.get("source_mtime") != mtime:
+                outdated.append(filename)
+
+        print(f"{len(hdf5_files) - len(outdated)} files up to date, "
+              f"checking {len(outdated)} files")
+
+        # read input files in parallel and write them one after another
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            for filename, source_hash, data, segments, problems in \
+                    executor.map(read_recording,
+                                 [os.path.join(data_dir, f) for f in outdated],
+                                 itertools.repeat(cache_dir)):
+                name = os.path.splitext(filename)[0]
+                mtime = os.path.getmtime(os.path.join(data_dir, filename))
+
+                # only the modification time changed, the content is the same
+                if name in outfile and "segments" in outfile[name] and \
+                        outfile[name].attrs.get("source_hash") == source_hash:
+                    outfile[name].attrs["source_mtime"] = mtime
+                    print(f"Unchanged: {name}")
+                    continue
+
+                write_recording(outfile, name, data, segments,
+                                find_category(filename), mtime, source_hash)
+                print(f"Written:   {name} ({len(segments)} segments)")
+                if any(problems.values()):
+                    print(f"           problems: {problems}")
+
+        write_manifest(outfile)
+
+
+if __name__ == "__main__":
+    build_dataset()
@@ -3,6 +3,10 @@
 # Author:   Michael Rinderle
 # Email:    michael.rinderle@tum.de
 # Created:  26.05.2021
+# Revision: 18.10.2026 - Lazy windowing with tf.data
+#           18.10.2026 - Train on the clean segments of the recordings
+#           18.10.2026 - Time-aware windowing
+#           18.10.2026 - Shared model saving
 #
 # Description: Script to train LSTM models to predict the illumination category
 #
@@ -10,8 +14,6 @@
 
 
 import os
-import h5py
-import numpy as np
 import tensorflow as tf
 from tensorflow.keras.layers import LSTM, Dense
 
@@ -23,6 +25,7 @@ DATA_DIR = os.path.abspath(os.path.join(THIS_DIR, "../data"))
 MODEL_DIR = os.path.abspath(os.path.join(THIS_DIR, "../models"))
 
 # define path of stored data
+# (or the directory of the memory-mapped store from zombie_store.py)
 DATA_PATH = os.path.join(DATA_DIR, "all_data.h5")
 
 # limits for scaling
@@ -32,6 +35,9 @@ LUX_MIN = 0
 WINDOW_WIDTH_IN_HOURS = 12
 STEP_SIZE = 6
 FEATURE_WIDTH = int(WINDOW_WIDTH_IN_HOURS * 60 / 5 / STEP_SIZE)
+# "reject": leave out windows crossing sensor outages | "resample": resample
+# the recordings onto a regular 5 minute grid | "none": ignore timestamps
+WINDOWING = "reject"
 # train test split ratio
 RATIO = 0.9
 # number of different categories for one-hot-encoding
@@ -41,45 +47,40 @@ NUM_CELLS = 32
 # batch size and epochs for model training
 BATCH_SIZE = 64
 EPOCHS = 100
+# shuffle buffer (windows) and optional file to cache the training windows
+SHUFFLE_BUFFER = 10000
+CACHE_FILE = ""
 
 
-# initialize lists for train and test data
-X_train_combined = []
-y_train_combined = []
-X_test_combined = []
-y_test_combined = []
-
 # list available datasets
-with h5py.File(DATA_PATH, "r") as infile:
-    grps = list(infile.keys())
-    print("Available datasets:")
-    print(grps, "\n")
-
-# load datasets from hdf5 file
+grps, lengths, categories = zf.get_manifest(DATA_PATH)
+print("Available datasets:")
+print(grps, "\n")
+
+# load and scale the raw series, the windows are created lazily
+# (only the valid windows, which cover the nominal time span inside a clean
+# segment of the recording)
+lux_scaled = []
+window_index = []
 for dataset in grps:
-    lux, cat = zf.get_dataset(DATA_PATH, dataset, "lux", "category")
-    lux_scaled = zf.scale(lux, LUX_MIN, LUX_MAX)
-
-    X = zf.timeseries_windowing(lux_scaled,
-                                feature_width=FEATURE_WIDTH,
-                                label_width=0,
-                                step_size=STEP_SIZE)
-
-    y = np.full((len(X)), cat, dtype=int)
-    y = tf.one_hot(y, NUM_CATEGORY)
-
-    (X_train, y_train), (X_test, y_test) = zf.train_test_split(X, y, RATIO)
-
-    X_train_combined.append(X_train)
-    y_train_combined.append(y_train)
-    X_test_combined.append(X_test)
-    y_test_combined.append(y_test)
+    lux, index = zf.get_windowed_series(DATA_PATH, dataset, "lux",
+                                        FEATURE_WIDTH, STEP_SIZE,
+                                        mode=WINDOWING)
+    lux_scaled.append(zf.scale(lux, LUX_MIN, LUX_MAX))
+    window_index.append(index)
 
 # create tensorflow datasets, shuffle and batch data
-train = zf.create_tf_dataset(X_train_combined, y_train_combined)
-test = zf.create_tf_dataset(X_test_combined, y_test_combined)
-train = train.shuffle(10000).batch(BATCH_SIZE, drop_remainder=True)
-test = test.batch(BATCH_SIZE, drop_remainder=True)
+train = zf.create_windowed_tf_dataset(lux_scaled, categories, NUM_CATEGORY,
+                                      FEATURE_WIDTH, STEP_SIZE, "train", RATIO,
+                                      window_index)
+test = zf.create_windowed_tf_dataset(lux_scaled, categories, NUM_CATEGORY,
+                                     FEATURE_WIDTH, STEP_SIZE, "test", RATIO,
+                                     window_index)
+if CACHE_FILE:
+    train = train.cache(CACHE_FILE)
+train = train.shuffle(SHUFFLE_BUFFER).batch(BATCH_SIZE, drop_remainder=True)
+train = train.prefetch(tf.data.AUTOTUNE)
+test = test.batch(BATCH_SIZE, drop_remainder=True).prefetch(tf.data.AUTOTUNE)
 
 
 # model definition
@@ -103,18 +104,5 @@ model.evaluate(test)
 MODEL_NAME = f"lstm{NUM_CELLS}_{WINDOW_WIDTH_IN_HOURS}h_step{STEP_SIZE}.h5"
 MODEL_PATH = os.path.join(MODEL_DIR, MODEL_NAME)
 
-# save tensorflow model weights
-model.save(MODEL_PATH)
-# add parameters for scaling and windowing
-with h5py.File(MODEL_PATH, "a") as file:
-    scaling = file.require_group("scaling_params")
-    scaling.require_dataset("val_max", shape=(1,), dtype="uint16")
-    scaling.require_dataset("val_min", shape=(1,), dtype="uint16")
-    windowing = file.require_group("window_params")
-    windowing.require_dataset("step_size", shape=(1,), dtype="uint16")
-    windowing.require_dataset("feature_width", shape=(1,), dtype="uint16")
-
-    scaling["val_max"][0] = LUX_MAX
-    scaling["val_min"][0] = LUX_MIN
-    windowing["step_size"][0] = STEP_SIZE
-    windowing["feature_width"][0] = FEATURE_WIDTH
+# save tensorflow model weights with the parameters for scaling and windowing
+zf.save_model(model, MODEL_PATH, LUX_MIN, LUX_MAX, FEATURE_WIDTH, STEP_SIZE)
@@ -3,6 +3,8 @@
 # Author:   Michael Rinderle
 # Email:    michael.rinderle@tum.de
 # Created:  31.05.2021
+# Revision: 18.10.2026 - Load the model with the model registry
+#           18.10.2026 - Exact export and round trip check
 #
 # Description: Scrit to load LSTM model and export weights to c++ header file
 #
@@ -10,46 +12,70 @@
 
 
 import os
-import h5py
 import numpy as np
-import tensorflow as tf
 
 import zombie_functions as zf
-from zombie_lstm import ZombieLSTM
+import zombie_registry as zr
+from zombie_lstm import ZombieQuantLSTM, verify_header
 
 
 THIS_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.abspath(os.path.join(THIS_DIR, "../data"))
 MODEL_DIR = os.path.abspath(os.path.join(THIS_DIR, "../models"))
 
-# define model to load
+# define path of stored data (windows for the round trip check)
+DATA_PATH = os.path.join(DATA_DIR, "all_data.h5")
+
+# define model to load and header file to write
 MODEL_PATH = os.path.join(MODEL_DIR, "lstm32_10h_step6_v1.h5")
+HEADER_PATH = "network.h"
 
-# load parameters for scaling and windowing
-with h5py.File(MODEL_PATH, "r") as file:
-    scaling = file.get("scaling_params")
-    windowing = file.get("window_params")
+# float literals ("decimal" or "hex") and layout of the weight matrices
+# ("rows", "transposed" or "flat", see zombie_lstm.WEIGHT_LAYOUTS)
+FLOAT_FORMAT = "decimal"
+WEIGHT_LAYOUT = "rows"
+# parse the header again and compare the predictions of all recorded windows
+VERIFY = True
 
-    LUX_MAX = scaling.get("val_max")[0]
-    LUX_MIN = scaling.get("val_min")[0]
-    FEATURE_WIDTH = windowing.get("feature_width")[0]
-    STEP_SIZE = windowing.get("step_size")[0]
+# export quantized weights (0: float, 8 or 16: integer bits), the header
+# selects the fixed-point path of lstm_category.h
+QUANT_BITS = 0
+QUANT_PER_CHANNEL = False
 
 # load and initialize custom lstm implementation
-with h5py.File(MODEL_PATH, "r") as infile:
-    grp = infile.get("model_weights")
-    lstm_weights = grp.get("lstm/lstm/lstm_cell")
-    dense_weights = grp.get("dense/dense")
-
-    lstm_kernel = lstm_weights.get("kernel:0")[()]
-    lstm_bias = lstm_weights.get("bias:0")[()]
-    lstm_recurrent_kernel = lstm_weights.get("recurrent_kernel:0")[()]
-    dense_kernel = dense_weights.get("kernel:0")[()]
-    dense_bias = dense_weights.get("bias:0")[()]
+# (weights and parameters for scaling and windowing from the model registry)
+custom_model = zr.load_model(MODEL_PATH).to_zombie_lstm()
 
-custom_model = ZombieLSTM(lstm_kernel, lstm_recurrent_kernel, lstm_bias,
-                          dense_kernel, dense_bias,
-                          LUX_MIN, LUX_MAX, FEATURE_WIDTH, STEP_SIZE)
+if QUANT_BITS:
+    custom_model = ZombieQuantLSTM(custom_model, QUANT_BITS, QUANT_PER_CHANNEL)
 
 # export custom model into header file
-custom_model.export_model("network.h")
+if QUANT_BITS:
+    custom_model.export_model(HEADER_PATH)
+else:
+    custom_model.export_model(HEADER_PATH, FLOAT_FORMAT, WEIGHT_LAYOUT)
+
+if VERIFY and QUANT_BITS:
+    print("The round trip check is only available for float models")
+elif VERIFY:
+    # windows of all recorded datasets
+    X = []
+    if os.path.exists(DATA_PATH):
+        grps, _, _ = zf.get_manifest(DATA_PATH)
+        for dataset in grps:
+            lux, index = zf.get_windowed_series(
+                DATA_PATH, dataset, "lux", custom_model.feature_width,
+                custom_model.step_size)
+            lux_scaled = zf.scale(lux, custom_model.val_min,
+                                  custom_model.val_max)
+            X.append(zf.select_windows(lux_scaled, index,
+                                       custom_model.feature_width, 0,
+                                       custom_model.step_size))
+    X = np.concatenate(X) if X else np.zeros((0, custom_model.feature_width))
+
+    problems = verify_header(custom_model, HEADER_PATH, X)
+    if problems:
+        raise SystemExit(f"{HEADER_PATH} does not reproduce the model: "
+                         + ", ".join(problems))
+    print(f"{HEADER_PATH} reproduces the model, {len(X)} windows with "
+          "bit-identical predictions")
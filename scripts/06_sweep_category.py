@@ -0,0 +1,212 @@
+################################################################################
+# File:     06_sweep_category.py
+# Created:  18.10.2026
+#
+# Description: Script to run hyperparameter sweeps of the LSTM category model
+#              in parallel worker processes
+#
+################################################################################
+
+
+import os
+import time
+import itertools
+import tempfile
+import numpy as np
+import pandas as pd
+import multiprocessing as mp
+import tensorflow as tf
+from tensorflow.keras.layers import LSTM, Dense
+from concurrent.futures import ProcessPoolExecutor
+
+import zombie_functions as zf
+from zombie_lstm import ZombieLSTM
+
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.abspath(os.path.join(THIS_DIR, "../data"))
+MODEL_DIR = os.path.abspath(os.path.join(THIS_DIR, "../models"))
+
+# define path of stored data
+DATA_PATH = os.path.join(DATA_DIR, "all_data.h5")
+# directory for the cached windows of each (window width, step size)
+CACHE_DIR = os.path.join(DATA_DIR, "sweep_cache")
+# table with the results of all configurations
+RESULTS_PATH = os.path.join(MODEL_DIR, "sweep_results.csv")
+
+# limits for scaling
+LUX_MAX = 2000
+LUX_MIN = 0
+# train test split ratio
+RATIO = 0.9
+# windowing mode of zombie_functions.get_windowed_series
+WINDOWING = "reject"
+# number of different categories for one-hot-encoding
+NUM_CATEGORY = 3
+# batch size for model training
+BATCH_SIZE = 64
+
+# values of the swept parameters
+SWEEP = {"NUM_CELLS": [8, 16, 32],
+         "WINDOW_WIDTH_IN_HOURS": [10, 12],
+         "STEP_SIZE": [3, 6],
+         "EPOCHS": [100]}
+# "grid" runs all combinations, "random" runs NUM_SAMPLES of them
+SEARCH = "grid"
+NUM_SAMPLES = 8
+SEED = 0
+
+# number of worker processes (each worker uses a single cpu thread)
+NUM_WORKERS = os.cpu_count()
+
+
+# helper function to list the configurations of the sweep
+def sweep_configurations(sweep, search="grid", num_samples=None, seed=0):
+    keys = list(sweep.keys())
+    configs = [dict(zip(keys, values))
+               for values in itertools.product(*sweep.values())]
+
+    if search == "random":
+        rng = np.random.default_rng(seed)
+        num_samples = min(num_samples, len(configs))
+        configs = [configs[i] for i in
+                   rng.choice(len(configs), num_samples, replace=False)]
+
+    return configs
+
+
+# helper function to compute the feature width from the window parameters
+def feature_width(window_width_in_hours, step_size):
+    return int(window_width_in_hours * 60 / 5 / step_size)
+
+
+# helper function to store the scaled and windowed data of all datasets
+# (computed only once per window width and step size, computed again if the
+# data file, the scaling limits or the split ratio changed)
+def cache_windows(window_width_in_hours, step_size):
+    cache_path = os.path.join(
+        CACHE_DIR,
+        f"{window_width_in_hours}h_step{step_size}_{WINDOWING}.npz")
+    source_mtime = os.path.getmtime(DATA_PATH)
+    parameters = np.array([LUX_MIN, LUX_MAX, RATIO], dtype="float64")
+
+    if os.path.exists(cache_path):
+        with np.load(cache_path) as cache:
+            if cache["source_mtime"] == source_mtime and \
+                    "parameters" in cache and \
+                    np.array_equal(cache["parameters"], parameters):
+                return cache_path
+
+    width = feature_width(window_width_in_hours, step_size)
+    X_train, y_train, X_test, y_test = [], [], [], []
+
+    grps, lengths, categories = zf.get_manifest(DATA_PATH)
+    for dataset, cat in zip(grps, categories):
+        # only the valid windows of the recording (see get_windowed_series)
+        lux, index = zf.get_windowed_series(DATA_PATH, dataset, "lux", width,
+                                            step_size, mode=WINDOWING)
+        lux_scaled = zf.scale(lux, LUX_MIN, LUX_MAX)
+
+        X = zf.select_windows(lux_scaled, index,
+                              feature_width=width,
+                              label_width=0,
+                              step_size=step_size)
+        y = np.full((len(X)), cat, dtype=int)
+
+        (X_tr, y_tr), (X_te, y_te) = zf.train_test_split(X, y, RATIO)
+        X_train.append(X_tr)
+        y_train.append(y_tr)
+        X_test.append(X_te)
+        y_test.append(y_te)
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    np.savez(cache_path,
+             X_train=np.concatenate(X_train), y_train=np.concatenate(y_train),
+             X_test=np.concatenate(X_test), y_test=np.concatenate(y_test),
+             source_mtime=source_mtime, parameters=parameters)
+    return cache_path
+
+
+# helper function to initialize the worker processes
+def init_worker():
+    # the workers run in parallel, so each of them uses one thread
+    tf.config.threading.set_intra_op_parallelism_threads(1)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+
+
+# function to train and evaluate a single configuration
+# (executed in the worker processes)
+def run_configuration(config, cache_path):
+    num_cells = config["NUM_CELLS"]
+    step_size = config["STEP_SIZE"]
+    width = feature_width(config["WINDOW_WIDTH_IN_HOURS"], step_size)
+
+    with np.load(cache_path) as cache:
+        y_train = tf.one_hot(cache["y_train"], NUM_CATEGORY)
+        y_test = tf.one_hot(cache["y_test"], NUM_CATEGORY)
+        train = zf.create_tf_dataset(cache["X_train"], y_train)
+        test = zf.create_tf_dataset(cache["X_test"], y_test)
+    train = train.shuffle(10000).batch(BATCH_SIZE, drop_remainder=True)
+    test = test.batch(BATCH_SIZE, drop_remainder=True)
+
+    # model definition
+    model = tf.keras.models.Sequential()
+    model.add(LSTM(num_cells, batch_input_shape=(BATCH_SIZE, width, 1)))
+    model.add(Dense(NUM_CATEGORY, activation="softmax"))
+
+    model.compile(optimizer="adam",
+                  loss="categorical_crossentropy",
+                  metrics=["accuracy"])
+
+    # model training
+    start = time.perf_counter()
+    model.fit(train, epochs=config["EPOCHS"], batch_size=BATCH_SIZE,
+              verbose=0)
+    train_time = time.perf_counter() - start
+
+    # model evaluation
+    loss, accuracy = model.evaluate(test, verbose=0)
+
+    # size of the exported header file for the microcontroller
+    custom_model = ZombieLSTM(*model.get_weights(),
+                              LUX_MIN, LUX_MAX, width, step_size)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        header_path = os.path.join(tmp_dir, "network.h")
+        custom_model.export_model(header_path)
+        header_size = os.path.getsize(header_path)
+
+    return dict(config, FEATURE_WIDTH=width, loss=loss, accuracy=accuracy,
+                train_time=train_time, num_params=model.count_params(),
+                header_size=header_size)
+
+
+if __name__ == "__main__":
+    configs = sweep_configurations(SWEEP, SEARCH, NUM_SAMPLES, SEED)
+    print(f"Running {len(configs)} configurations")
+
+    # compute the windows once for every window width and step size
+    cache_paths = {}
+    for config in configs:
+        key = (config["WINDOW_WIDTH_IN_HOURS"], config["STEP_SIZE"])
+        if key not in cache_paths:
+            cache_paths[key] = cache_windows(*key)
+
+    # tensorflow does not support forking, so the workers are spawned
+    ctx = mp.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=NUM_WORKERS, mp_context=ctx,
+                             initializer=init_worker) as executor:
+        futures = []
+        for config in configs:
+            key = (config["WINDOW_WIDTH_IN_HOURS"], config["STEP_SIZE"])
+            futures.append(executor.submit(run_configuration, config,
+                                           cache_paths[key]))
+
+        results = []
+        for future in futures:
+            result = future.result()
+            results.append(result)
+            print(result)
+
+    table = pd.DataFrame(results).sort_values("accuracy", ascending=False)
+    table.to_csv(RESULTS_PATH, index=False)
+    print(table.to_string(index=False))
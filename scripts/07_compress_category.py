@@ -0,0 +1,219 @@
+################################################################################
+# File:     07_compress_category.py
+# Created:  18.10.2026
+#
+# Description: Script to compress a trained LSTM category model by magnitude
+#              pruning of the recurrent kernel and by distillation into
+#              models with fewer LSTM cells, and to compare the accuracy of
+#              all variants with their MACs per wakeup
+#
+################################################################################
+
+
+import os
+import numpy as np
+import pandas as pd
+import tensorflow as tf
+from tensorflow.keras.layers import LSTM, Dense
+
+import zombie_functions as zf
+import zombie_registry as zr
+from zombie_lstm import ZombieLSTM, prune_matrix
+from zombie_firmware import operation_counts
+
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.abspath(os.path.join(THIS_DIR, "../data"))
+MODEL_DIR = os.path.abspath(os.path.join(THIS_DIR, "../models"))
+
+# define path of stored data
+DATA_PATH = os.path.join(DATA_DIR, "all_data.h5")
+# model trained by 03_train_category.py (teacher of the students)
+TEACHER_PATH = os.path.join(MODEL_DIR, "lstm32_12h_step6_v3.h5")
+# table with the results of all variants
+RESULTS_PATH = os.path.join(MODEL_DIR, "compress_results.csv")
+
+# train test split ratio and windowing mode (as in 03_train_category.py)
+RATIO = 0.9
+WINDOWING = "reject"
+# batch size for model training
+BATCH_SIZE = 64
+SHUFFLE_BUFFER = 10000
+
+# fractions of the recurrent kernel set to zero and epochs of fine tuning
+# with the pruned weights fixed at zero
+SPARSITIES = [0.5, 0.75, 0.9]
+# pruned blocks of BLOCK_SIZE x BLOCK_SIZE weights (1: single weights), see
+# ZombieSparseLSTM in zombie_lstm.py
+BLOCK_SIZE = 1
+FINETUNE_EPOCHS = 10
+# number of LSTM cells of the distilled students and their epochs
+STUDENT_CELLS = [8, 16]
+STUDENT_EPOCHS = 100
+# weight of the true labels in the targets of the students, the rest are
+# the teacher outputs softened with the temperature
+ALPHA = 0.5
+TEMPERATURE = 2.0
+
+
+# function to load the scaled windows of all datasets with the parameters
+# of a model, split into train and test part of every dataset
+def load_windows(bundle):
+    X_train, y_train, X_test, y_test = [], [], [], []
+
+    grps, lengths, categories = zf.get_manifest(DATA_PATH)
+    for dataset, cat in zip(grps, categories):
+        lux, index = zf.get_windowed_series(DATA_PATH, dataset, "lux",
+                                            bundle.feature_width,
+                                            bundle.step_size, mode=WINDOWING)
+        lux_scaled = zf.scale(lux, bundle.val_min, bundle.val_max)
+
+        X = zf.select_windows(lux_scaled, index,
+                              feature_width=bundle.feature_width,
+                              label_width=0,
+                              step_size=bundle.step_size)
+        y = np.full((len(X)), cat, dtype=int)
+
+        (X_tr, y_tr), (X_te, y_te) = zf.train_test_split(X, y, RATIO)
+        X_train.append(X_tr)
+        y_train.append(y_tr)
+        X_test.append(X_te)
+        y_test.append(y_te)
+
+    return (np.concatenate(X_train), np.concatenate(y_train),
+            np.concatenate(X_test), np.concatenate(y_test))
+
+
+# constraint which keeps the pruned weights of a kernel at zero
+class PruningMask(tf.keras.constraints.Constraint):
+    def __init__(self, mask):
+        self.mask = tf.constant(mask, dtype=tf.float32)
+
+    def __call__(self, w):
+        return w * self.mask
+
+
+# helper function to define the model of 03_train_category.py
+def build_model(num_cells, feature_width, num_category,
+                recurrent_constraint=None):
+    model = tf.keras.models.Sequential()
+    model.add(tf.keras.Input(batch_shape=(BATCH_SIZE, feature_width, 1)))
+    model.add(LSTM(num_cells, recurrent_constraint=recurrent_constraint))
+    model.add(Dense(num_category, activation="softmax"))
+
+    model.compile(optimizer="adam",
+                  loss="categorical_crossentropy",
+                  metrics=["accuracy"])
+    return model
+
+
+# helper function to batch the training windows and targets
+def training_dataset(X, targets):
+    train = zf.create_tf_dataset(X.astype("float32"),
+                                 targets.astype("float32"))
+    train = train.shuffle(SHUFFLE_BUFFER)
+    return train.batch(BATCH_SIZE, drop_remainder=True).prefetch(
+        tf.data.AUTOTUNE)
+
+
+# function to prune the recurrent kernel of a model and to fine tune the
+# remaining weights, returns the weights of the pruned model
+def prune(bundle, sparsity, X_train, y_train):
+    kernel, mask = prune_matrix(bundle.lstm_recurrent_kernel, sparsity,
+                                BLOCK_SIZE)
+    weights = bundle.weights()
+    weights[1] = kernel
+
+    if FINETUNE_EPOCHS:
+        model = build_model(bundle.num_cells, bundle.feature_width,
+                            bundle.num_category, PruningMask(mask))
+        model.set_weights(weights)
+        model.fit(training_dataset(X_train, np.eye(bundle.num_category)[
+            y_train]), epochs=FINETUNE_EPOCHS, verbose=0)
+        weights = model.get_weights()
+        weights[1] = weights[1] * mask
+
+    return weights
+
+
+# function to train a model with fewer cells on the true labels and the
+# softened outputs of the teacher, returns the weights of the student
+def distill(teacher, num_cells, X_train, y_train):
+    logits = teacher.to_zombie_lstm(activation="exact").predict_batch(X_train)
+    soft = np.exp((logits - logits.max(axis=1, keepdims=True)) / TEMPERATURE)
+    soft /= soft.sum(axis=1, keepdims=True)
+    targets = ALPHA * np.eye(teacher.num_category)[y_train] + (1 - ALPHA) * soft
+
+    model = build_model(num_cells, teacher.feature_width, teacher.num_category)
+    model.fit(training_dataset(X_train, targets), epochs=STUDENT_EPOCHS,
+              verbose=0)
+    return model.get_weights()
+
+
+# function to save the weights of a variant as a model file, which can be
+# loaded by zombie_registry.py and exported by 05_extract_category.py
+def save_variant(weights, model_path, teacher):
+    num_cells = weights[1].shape[0]
+    model = build_model(num_cells, teacher.feature_width, teacher.num_category)
+    model.set_weights(weights)
+    zf.save_model(model, model_path, teacher.val_min, teacher.val_max,
+                  teacher.feature_width, teacher.step_size)
+
+
+# function to evaluate a variant on the held-out windows with the custom lstm
+# implementation (exact activation and lookup table of the firmware)
+def evaluate(name, weights, teacher, X_test, y_test, teacher_category):
+    model = ZombieLSTM(*weights, teacher.val_min, teacher.val_max,
+                       teacher.feature_width, teacher.step_size,
+                       activation="exact")
+    exact = np.argmax(model.predict_batch(X_test), axis=1)
+    model.set_activation("interp")
+    interp = np.argmax(model.predict_batch(X_test), axis=1)
+
+    return {"variant": name,
+            "cells": model.units,
+            "recurrent_nonzero": int(np.count_nonzero(model.U)),
+            "macs_dense": int(operation_counts(model)["macs"]),
+            "macs_sparse": int(operation_counts(model, sparse=True)["macs"]),
+            "accuracy": float(np.mean(exact == y_test)),
+            "accuracy_interp": float(np.mean(interp == y_test)),
+            "teacher_agreement": float(np.mean(interp == teacher_category))}
+
+
+if __name__ == "__main__":
+    teacher = zr.load_model(TEACHER_PATH)
+    base_name = os.path.splitext(os.path.basename(TEACHER_PATH))[0]
+    X_train, y_train, X_test, y_test = load_windows(teacher)
+    print(f"Teacher: {base_name} | {len(X_train)} train windows | "
+          f"{len(X_test)} test windows")
+
+    teacher_category = np.argmax(teacher.to_zombie_lstm().predict_batch(
+        X_test), axis=1)
+    results = [evaluate(base_name, teacher.weights(), teacher, X_test, y_test,
+                        teacher_category)]
+    print(results[-1])
+
+    # magnitude pruning of the recurrent kernel
+    # (the zeros are stored in the dense kernel of the model file, see
+    # ZombieSparseLSTM for the compressed kernels)
+    for sparsity in SPARSITIES:
+        name = f"{base_name}_prune{int(round(100 * sparsity))}"
+        weights = prune(teacher, sparsity, X_train, y_train)
+        save_variant(weights, os.path.join(MODEL_DIR, name + ".h5"), teacher)
+        results.append(evaluate(name, weights, teacher, X_test, y_test,
+                                teacher_category))
+        print(results[-1])
+
+    # distillation into students with fewer cells
+    for num_cells in STUDENT_CELLS:
+        name = f"{base_name}_student{num_cells}"
+        weights = distill(teacher, num_cells, X_train, y_train)
+        save_variant(weights, os.path.join(MODEL_DIR, name + ".h5"), teacher)
+        results.append(evaluate(name, weights, teacher, X_test, y_test,
+                                teacher_category))
+        print(results[-1])
+
+    table = pd.DataFrame(results)
+    table["macs_saving"] = 1 - table["macs_sparse"] / table["macs_sparse"][0]
+    table.to_csv(RESULTS_PATH, index=False)
+    print(table.to_string(index=False))
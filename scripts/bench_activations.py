@@ -0,0 +1,148 @@
+################################################################################
+# File:     bench_activations.py
+# Created:  18.10.2026
+#
+# Description: Benchmark the lookup table activations of ZombieLSTM (table
+#              size, range and lookup method) against the Keras model in terms
+#              of prediction agreement and estimated microcontroller operations
+#
+################################################################################
+
+
+import os
+import itertools
+import h5py
+import numpy as np
+import pandas as pd
+import tensorflow as tf
+from tensorflow.keras.layers import LSTM, Dense
+
+import zombie_functions as zf
+from zombie_profile import ZombieProfiler
+
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.abspath(os.path.join(THIS_DIR, "../data"))
+MODEL_DIR = os.path.abspath(os.path.join(THIS_DIR, "../models"))
+
+# define path of stored data
+DATA_PATH = os.path.join(DATA_DIR, "all_data.h5")
+
+# define model to load
+MODEL_PATH = os.path.join(MODEL_DIR, "lstm32_12h_step6_v3.h5")
+
+# table with the results of all activation configurations
+RESULTS_PATH = os.path.join(MODEL_DIR, "activation_benchmark.csv")
+
+# swept lookup table sizes, ranges and lookup methods
+TABLE_POINTS = [6, 11, 16, 26, 51, 101]
+TABLE_MAX = [2.0, 2.5, 3.0, 4.0]
+METHODS = ["interp", "uniform", "nearest"]
+
+# estimated microcontroller operations (compare, add, mul, div, load, cast)
+# per tanh evaluation, the linear search of "interp" is counted separately
+OPS_SIGN = 2             # sign and absolute value
+OPS_INTERP = 6           # interpolation between two table entries
+OPS_SCAN_ITERATION = 2   # two comparisons per iteration of the linear search
+OPS_INDEX = 3            # range check, scaling and cast to integer
+OPS_SIGMOID = 3          # x / 2, 1 + tanh and division by 2
+OPS_EXACT_TANH = 40      # assumption for tanhf of the C library
+
+
+# helper function to estimate the microcontroller operations of one lstm_step
+def step_operations(model, scan_iterations_per_call):
+    units = model.units
+    input_size = model.Wi.shape[0]
+
+    # multiply accumulate operations of the four gates
+    macs = 4 * units * (input_size + units)
+    # bias and pointwise operations of the state update
+    pointwise = 4 * units + 4 * units
+
+    # 3 sigmoid and 2 tanh evaluations per unit
+    calls = 5 * units
+    if model.activation == "exact":
+        per_call = OPS_EXACT_TANH
+    elif model.activation == "interp":
+        per_call = (OPS_SIGN + OPS_INTERP +
+                    OPS_SCAN_ITERATION * scan_iterations_per_call)
+    elif model.activation == "uniform":
+        per_call = OPS_SIGN + OPS_INDEX + OPS_INTERP
+    else:
+        per_call = OPS_SIGN + OPS_INDEX + 1
+    activation_ops = calls * per_call + 3 * units * OPS_SIGMOID
+
+    return macs, pointwise + activation_ops
+
+
+# load custom lstm implementation
+custom_model = zf.get_zombie_lstm(MODEL_PATH)
+FEATURE_WIDTH = custom_model.feature_width
+STEP_SIZE = custom_model.step_size
+# counts the tanh lookups and the iterations of their linear search
+profiler = ZombieProfiler(custom_model)
+
+# load keras model and copy the weights into a model without fixed batch size
+model = tf.keras.models.load_model(MODEL_PATH)
+weights = model.get_weights()
+
+model = tf.keras.models.Sequential()
+model.add(LSTM(custom_model.units, input_shape=(FEATURE_WIDTH, 1)))
+model.add(Dense(len(custom_model.bd), activation="softmax"))
+model.set_weights(weights)
+
+# list available datasets
+with h5py.File(DATA_PATH, "r") as infile:
+    grps = list(infile.keys())
+
+# windows and keras predictions of all datasets
+windows = {}
+keras_prediction = {}
+for dataset in grps:
+    lux = zf.get_dataset(DATA_PATH, dataset, "lux")
+    lux_scaled = zf.scale(lux, custom_model.val_min, custom_model.val_max)
+
+    X = zf.timeseries_windowing(lux_scaled,
+                                feature_width=FEATURE_WIDTH,
+                                label_width=0,
+                                step_size=STEP_SIZE)
+    windows[dataset] = X
+    prediction = model.predict(np.expand_dims(X, axis=2), batch_size=1024,
+                               verbose=0)
+    keras_prediction[dataset] = np.argmax(prediction, axis=1)
+
+
+configurations = [("exact", None, None)]
+configurations += list(itertools.product(METHODS, TABLE_POINTS, TABLE_MAX))
+
+results = []
+for method, points, table_max in configurations:
+    if method == "exact":
+        custom_model.set_activation("exact")
+    else:
+        custom_model.set_activation(method, points, table_max)
+    profiler.reset()
+
+    result = {"method": method, "points": points, "max": table_max}
+    for dataset in grps:
+        with profiler:
+            prediction = custom_model.predict_batch(windows[dataset])
+        agreement = np.mean(np.argmax(prediction, axis=1) ==
+                            keras_prediction[dataset])
+        result[dataset] = agreement
+
+    totals = profiler.totals()
+    scan = totals["search_steps"] / max(totals["lookups"], 1)
+    macs, ops = step_operations(custom_model, scan)
+    result.update({"mean_agreement": np.mean([result[d] for d in grps]),
+                   "min_agreement": np.min([result[d] for d in grps]),
+                   "macs_per_step": macs, "ops_per_step": ops})
+    results.append(result)
+
+    print("{:8s} {:>5s} {:>5s}  agreement mean {:.4f} min {:.4f}  "
+          "MACs {:5d}  other ops {:7.0f}".format(
+              method, str(points or "-"), str(table_max or "-"),
+              result["mean_agreement"], result["min_agreement"], macs, ops))
+
+table = pd.DataFrame(results)
+table.to_csv(RESULTS_PATH, index=False)
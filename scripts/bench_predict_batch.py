@@ -0,0 +1,96 @@
+################################################################################
+# File:     bench_predict_batch.py
+# Created:  18.10.2026
+#
+# Description: Compare the batched ZombieLSTM prediction with the per window
+#              prediction on all datasets (runtime and agreement)
+#
+################################################################################
+
+
+import os
+import time
+import h5py
+import numpy as np
+
+import zombie_functions as zf
+
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.abspath(os.path.join(THIS_DIR, "../data"))
+MODEL_DIR = os.path.abspath(os.path.join(THIS_DIR, "../models"))
+
+# define path of stored data
+DATA_PATH = os.path.join(DATA_DIR, "all_data.h5")
+
+# define model to load
+MODEL_PATH = os.path.join(MODEL_DIR, "lstm32_12h_step6_v3.h5")
+
+# skip the per window prediction (only time the batched prediction)
+BATCH_ONLY = False
+# maximum difference of the outputs of both paths (see predict_batch)
+TOLERANCE = 1e-12
+
+
+# load custom lstm implementation
+custom_model = zf.get_zombie_lstm(MODEL_PATH)
+LUX_MAX = custom_model.val_max
+LUX_MIN = custom_model.val_min
+FEATURE_WIDTH = custom_model.feature_width
+STEP_SIZE = custom_model.step_size
+
+# list available datasets
+with h5py.File(DATA_PATH, "r") as infile:
+    grps = list(infile.keys())
+
+
+print("{:28s} {:>8s} {:>10s} {:>10s} {:>10s} {:>8s} {:>6s}".format(
+    "dataset", "windows", "loop [s]", "batch [s]", "max diff", "argmax", "cat"))
+
+time_loop = 0
+time_batch = 0
+max_diff_all = 0
+for dataset in grps:
+    lux, cat = zf.get_dataset(DATA_PATH, dataset, "lux", "category")
+    lux_scaled = zf.scale(lux, LUX_MIN, LUX_MAX)
+
+    X = zf.timeseries_windowing(lux_scaled,
+                                feature_width=FEATURE_WIDTH,
+                                label_width=0,
+                                step_size=STEP_SIZE)
+
+    start = time.perf_counter()
+    pred_batch = custom_model.predict_batch(X)
+    duration_batch = time.perf_counter() - start
+    time_batch += duration_batch
+
+    # fraction of windows predicted as the category of the dataset
+    accuracy = np.mean(np.argmax(pred_batch, axis=1) == cat[0])
+
+    if BATCH_ONLY:
+        print("{:28s} {:8d} {:>10s} {:10.4f} {:>10s} {:>8s} {:6.3f}".format(
+            dataset, len(X), "-", duration_batch, "-", "-", accuracy))
+        continue
+
+    start = time.perf_counter()
+    pred_loop = np.array([custom_model.predict(x) for x in X])
+    pred_loop = pred_loop.reshape(pred_batch.shape)
+    duration_loop = time.perf_counter() - start
+    time_loop += duration_loop
+
+    # both paths agree up to the summation order of the matrix products
+    max_diff = np.abs(pred_loop - pred_batch).max(initial=0)
+    max_diff_all = max(max_diff_all, max_diff)
+    argmax = np.mean(np.argmax(pred_loop, axis=1) ==
+                     np.argmax(pred_batch, axis=1))
+
+    print("{:28s} {:8d} {:10.4f} {:10.4f} {:10.2e} {:8.3f} {:6.3f}".format(
+        dataset, len(X), duration_loop, duration_batch, max_diff, argmax,
+        accuracy))
+
+print("\nTotal time per window loop: {:.3f} s".format(time_loop))
+print("Total time batched:         {:.3f} s".format(time_batch))
+if not BATCH_ONLY:
+    print("Maximum difference {:.2e} ({} the tolerance of {:.0e})".format(
+        max_diff_all, "within" if max_diff_all <= TOLERANCE else "ABOVE",
+        TOLERANCE))
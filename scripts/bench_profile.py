@@ -0,0 +1,101 @@
+################################################################################
+# File:     bench_profile.py
+# Created:  18.10.2026
+#
+# Description: Profile the custom LSTM implementation gate by gate on the
+#              windows of all datasets (single window and batched path) and
+#              estimate the cost of every gate on the microcontroller
+#
+################################################################################
+
+
+import os
+import time
+import numpy as np
+
+import zombie_functions as zf
+import zombie_firmware as zfw
+from zombie_profile import ZombieProfiler
+
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.abspath(os.path.join(THIS_DIR, "../data"))
+MODEL_DIR = os.path.abspath(os.path.join(THIS_DIR, "../models"))
+
+# define path of stored data
+DATA_PATH = os.path.join(DATA_DIR, "all_data.h5")
+
+# define model to load
+MODEL_PATH = os.path.join(MODEL_DIR, "lstm32_12h_step6_v3.h5")
+
+# windows per dataset predicted one by one (ZombieLSTM.predict)
+NUM_WINDOWS = 500
+
+# export the profile as PROFILE_PATH.json and PROFILE_PATH.csv
+# (empty string: no export)
+PROFILE_PATH = ""
+
+
+# load custom lstm implementation
+custom_model = zf.get_zombie_lstm(MODEL_PATH)
+FEATURE_WIDTH = custom_model.feature_width
+STEP_SIZE = custom_model.step_size
+
+# windows of all datasets, which do not cross sensor outages
+grps, lengths, categories = zf.get_manifest(DATA_PATH)
+windows = []
+for dataset in grps:
+    lux, index = zf.get_windowed_series(DATA_PATH, dataset, "lux",
+                                        FEATURE_WIDTH, STEP_SIZE)
+    lux_scaled = zf.scale(lux, custom_model.val_min, custom_model.val_max)
+    windows.append(zf.select_windows(lux_scaled, index, FEATURE_WIDTH, 0,
+                                     STEP_SIZE))
+X = np.concatenate(windows)
+X_single = np.concatenate([w[:NUM_WINDOWS] for w in windows])
+
+
+# helper function to run both prediction paths
+def replay(model):
+    start = time.perf_counter()
+    single = np.array([model.predict(x) for x in X_single]).reshape(
+        len(X_single), -1)
+    batch = model.predict_batch(X)
+    return single, batch, time.perf_counter() - start
+
+
+# reference without profiler, profiled run and run after disabling it
+reference = replay(custom_model)
+profiler = ZombieProfiler(custom_model)
+with profiler:
+    profiled = replay(custom_model)
+disabled = replay(custom_model)
+
+for result in (profiled, disabled):
+    assert np.array_equal(result[0], reference[0])
+    assert np.array_equal(result[1], reference[1])
+
+print(f"Windows: {len(X_single)} single, {len(X)} batched | "
+      f"Feature width: {FEATURE_WIDTH} | Units: {custom_model.units}")
+print(f"Replay: {reference[2]:.3f} s without profiler, {profiled[2]:.3f} s "
+      f"profiled, {disabled[2]:.3f} s after disabling\n")
+
+# flat profile with the estimated cycles on the microcontroller
+total_ns = profiler.totals()["time_ns"]
+print("{:14s} {:6s} {:>8s} {:>10s} {:>10s} {:>6s} {:>12s} {:>12s} {:>10s} "
+      "{:>10s} {:>12s}".format("section", "gate", "calls", "rows", "time [ms]",
+                               "share", "MACs", "FLOPs", "lookups", "search",
+                               "MCU cycles"))
+for row in profiler.rows():
+    cycles = (zfw.CYCLES_PER_MAC * row["macs"] +
+              zfw.CYCLES_PER_ACTIVATION * row["lookups"] +
+              zfw.CYCLES_PER_LOOKUP_STEP * row["search_steps"])
+    print("{:14s} {:6s} {:8d} {:10d} {:10.1f} {:5.1f}% {:12d} {:12d} {:10d} "
+          "{:10d} {:12d}".format(row["section"], row["gate"], row["calls"],
+                                 row["rows"], row["time_ns"] / 1e6,
+                                 100 * row["time_ns"] / total_ns, row["macs"],
+                                 row["flops"], row["lookups"],
+                                 row["search_steps"], cycles))
+
+if PROFILE_PATH:
+    profiler.to_json(PROFILE_PATH + ".json")
+    profiler.to_csv(PROFILE_PATH + ".csv")
@@ -0,0 +1,95 @@
+################################################################################
+# File:     bench_quantized.py
+# Created:  18.10.2026
+#
+# Description: Compare quantized ZombieLSTM models (int8/int16 weights, per
+#              tensor or per channel scales) with the float model on all
+#              datasets and export the quantized header files
+#
+################################################################################
+
+
+import os
+import h5py
+import numpy as np
+
+import zombie_functions as zf
+from zombie_lstm import ZombieQuantLSTM
+
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.abspath(os.path.join(THIS_DIR, "../data"))
+MODEL_DIR = os.path.abspath(os.path.join(THIS_DIR, "../models"))
+
+# define path of stored data
+DATA_PATH = os.path.join(DATA_DIR, "all_data.h5")
+
+# define model to load
+MODEL_PATH = os.path.join(MODEL_DIR, "lstm32_12h_step6_v3.h5")
+
+# quantization configurations as (bits, per_channel)
+CONFIGURATIONS = [(8, False), (8, True), (16, False), (16, True)]
+
+# export the header files of the quantized models (empty string: no export)
+EXPORT_DIR = ""
+
+
+# load custom lstm implementation
+custom_model = zf.get_zombie_lstm(MODEL_PATH)
+FEATURE_WIDTH = custom_model.feature_width
+STEP_SIZE = custom_model.step_size
+
+# list available datasets
+with h5py.File(DATA_PATH, "r") as infile:
+    grps = list(infile.keys())
+
+# windows and float predictions of all datasets
+windows = {}
+float_prediction = {}
+for dataset in grps:
+    lux = zf.get_dataset(DATA_PATH, dataset, "lux")
+    lux_scaled = zf.scale(lux, custom_model.val_min, custom_model.val_max)
+
+    X = zf.timeseries_windowing(lux_scaled,
+                                feature_width=FEATURE_WIDTH,
+                                label_width=0,
+                                step_size=STEP_SIZE)
+    windows[dataset] = X
+    float_prediction[dataset] = custom_model.predict_batch(X)
+
+# size of the float weights in flash
+float_bytes = 4 * (custom_model.W.size + custom_model.U.size +
+                   custom_model.b.size + custom_model.Wd.size +
+                   custom_model.bd.size)
+print(f"Float model: {float_bytes} bytes of weights\n")
+
+for bits, per_channel in CONFIGURATIONS:
+    quant_model = ZombieQuantLSTM(custom_model, bits, per_channel)
+    scales = "per channel" if per_channel else "per tensor"
+    print("int{} weights, {} scales: {} bytes of weights ({:.1f}%)".format(
+        bits, scales, quant_model.weight_bytes(),
+        100 * quant_model.weight_bytes() / float_bytes))
+
+    print("  {:28s} {:>8s} {:>10s} {:>10s}".format(
+        "dataset", "windows", "max diff", "argmax"))
+    agree = 0
+    total = 0
+    for dataset in grps:
+        prediction = quant_model.predict_batch(windows[dataset])
+        reference = float_prediction[dataset]
+
+        max_diff = np.abs(prediction - reference).max(initial=0)
+        same = np.sum(np.argmax(prediction, axis=1) ==
+                      np.argmax(reference, axis=1))
+        agree += same
+        total += len(reference)
+
+        print("  {:28s} {:8d} {:10.2e} {:10.4f}".format(
+            dataset, len(reference), max_diff, same / max(len(reference), 1)))
+    print("  {:28s} {:8d} {:>10s} {:10.4f}\n".format(
+        "all", total, "", agree / max(total, 1)))
+
+    if EXPORT_DIR:
+        suffix = "channel" if per_channel else "tensor"
+        quant_model.export_model(os.path.join(
+            EXPORT_DIR, f"network_int{bits}_{suffix}.h"))
@@ -0,0 +1,110 @@
+################################################################################
+# File:     bench_sparse.py
+# Created:  18.10.2026
+#
+# Description: Compare the sparse recurrent kernels (ZombieSparseLSTM) with
+#              the dense reference for several sparsity levels and block
+#              sizes in terms of inference cost and output agreement
+#
+################################################################################
+
+
+import os
+import time
+import tempfile
+import numpy as np
+
+import zombie_functions as zf
+from zombie_lstm import ZombieLSTM, ZombieSparseLSTM, prune_matrix, \
+    verify_header
+from zombie_firmware import CYCLES_PER_MAC
+
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.abspath(os.path.join(THIS_DIR, "../data"))
+MODEL_DIR = os.path.abspath(os.path.join(THIS_DIR, "../models"))
+
+# define path of stored data
+DATA_PATH = os.path.join(DATA_DIR, "all_data.h5")
+
+# define model to load
+MODEL_PATH = os.path.join(MODEL_DIR, "lstm32_12h_step6_v3.h5")
+
+# fractions of the recurrent kernel set to zero and sizes of the blocks
+SPARSITIES = [0, 0.5, 0.75, 0.9, 0.95]
+BLOCK_SIZES = [1, 4]
+# additional cycles per stored block of the sparse loop in the firmware
+# (loads of the pointer and the index, rough estimate)
+CYCLES_PER_BLOCK = 4
+
+
+# load custom lstm implementation
+custom_model = zf.get_zombie_lstm(MODEL_PATH)
+FEATURE_WIDTH = custom_model.feature_width
+STEP_SIZE = custom_model.step_size
+
+# windows of all datasets, which do not cross sensor outages
+grps, lengths, categories = zf.get_manifest(DATA_PATH)
+windows = []
+for dataset in grps:
+    lux, index = zf.get_windowed_series(DATA_PATH, dataset, "lux",
+                                        FEATURE_WIDTH, STEP_SIZE)
+    lux_scaled = zf.scale(lux, custom_model.val_min, custom_model.val_max)
+    windows.append(zf.select_windows(lux_scaled, index, FEATURE_WIDTH, 0,
+                                     STEP_SIZE))
+X = np.concatenate(windows)
+original = np.argmax(custom_model.predict_batch(X), axis=1)
+
+
+# helper function to measure the fastest of three batched predictions
+def timed_prediction(model):
+    durations = []
+    for _ in range(3):
+        start = time.perf_counter()
+        prediction = model.predict_batch(X)
+        durations.append(time.perf_counter() - start)
+    return prediction, min(durations)
+
+
+print(f"Windows: {len(X)} | Feature width: {FEATURE_WIDTH} | "
+      f"Units: {custom_model.units}\n")
+print("{:>6s} {:>8s} {:>8s} {:>8s} {:>9s} {:>10s} {:>9s} {:>9s} {:>10s} "
+      "{:>8s} {:>8s} {:>7s}".format(
+          "block", "sparsity", "stored", "MACs", "kcycles", "bytes",
+          "dense [s]", "sparse [s]", "max diff", "agree", "original",
+          "header"))
+
+for block_size in BLOCK_SIZES:
+    for sparsity in SPARSITIES:
+        U, mask = prune_matrix(custom_model.U, sparsity, block_size)
+        dense = ZombieLSTM(custom_model.W, U, custom_model.b,
+                           custom_model.Wd, custom_model.bd,
+                           custom_model.val_min, custom_model.val_max,
+                           FEATURE_WIDTH, STEP_SIZE)
+        sparse = ZombieSparseLSTM(dense, block_size)
+
+        dense_prediction, dense_time = timed_prediction(dense)
+        sparse_prediction, sparse_time = timed_prediction(sparse)
+        category = np.argmax(sparse_prediction, axis=1)
+
+        # multiply accumulate operations and cycles of one prediction
+        macs = FEATURE_WIDTH * (dense.W.size + sparse.stored_weights() +
+                                dense.Wd.size)
+        blocks = FEATURE_WIDTH * len(sparse.sparse_U[1])
+        cycles = CYCLES_PER_MAC * macs + CYCLES_PER_BLOCK * blocks
+
+        # the exported header has to reproduce the pruned model
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            header_path = os.path.join(tmp_dir, "network.h")
+            sparse.export_model(header_path)
+            problems = verify_header(sparse, header_path, X[:1000])
+
+        print("{:6d} {:8.2f} {:8d} {:8d} {:9.1f} {:10d} {:9.3f} {:9.3f} "
+              "{:10.2e} {:8.4f} {:8.4f} {:>7s}".format(
+                  block_size, 1 - mask.mean(), sparse.stored_weights(), macs,
+                  cycles / 1e3, sparse.weight_bytes(), dense_time,
+                  sparse_time,
+                  np.abs(sparse_prediction - dense_prediction).max(),
+                  np.mean(category == np.argmax(dense_prediction, axis=1)),
+                  np.mean(category == original),
+                  "ok" if not problems else "FAILED"))
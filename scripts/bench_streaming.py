@@ -0,0 +1,93 @@
+################################################################################
+# File:     bench_streaming.py
+# Created:  18.10.2026
+#
+# Description: Compare streaming inference (ZombieStream) with the full
+#              recomputation of every window in terms of LSTM steps and
+#              deviation of the predictions on all datasets
+#
+################################################################################
+
+
+import os
+import h5py
+import numpy as np
+
+import zombie_functions as zf
+from zombie_lstm import ZombieStream
+
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.abspath(os.path.join(THIS_DIR, "../data"))
+MODEL_DIR = os.path.abspath(os.path.join(THIS_DIR, "../models"))
+
+# define path of stored data
+DATA_PATH = os.path.join(DATA_DIR, "all_data.h5")
+
+# define model to load
+MODEL_PATH = os.path.join(MODEL_DIR, "lstm32_12h_step6_v3.h5")
+
+# streaming configurations as (horizon, period) in steps of one phase
+# None means the feature width of the model (exact recomputation)
+CONFIGURATIONS = [(None, 1), (None, 2), (None, 4), (None, 8),
+                  (16, 4), (12, 6), (8, 8)]
+
+
+# load custom lstm implementation
+custom_model = zf.get_zombie_lstm(MODEL_PATH)
+FEATURE_WIDTH = custom_model.feature_width
+STEP_SIZE = custom_model.step_size
+
+# list available datasets
+with h5py.File(DATA_PATH, "r") as infile:
+    grps = list(infile.keys())
+
+# full recomputation of all windows as reference
+reference = {}
+for dataset in grps:
+    lux = zf.get_dataset(DATA_PATH, dataset, "lux")
+    lux_scaled = zf.scale(lux, custom_model.val_min, custom_model.val_max)
+
+    X = zf.timeseries_windowing(lux_scaled,
+                                feature_width=FEATURE_WIDTH,
+                                label_width=0,
+                                step_size=STEP_SIZE)
+    reference[dataset] = (lux_scaled, custom_model.predict_batch(X))
+
+print(f"Feature width: {FEATURE_WIDTH} | Step size: {STEP_SIZE}\n")
+# lstm steps per wakeup include the warm up phase at the series start,
+# a full recomputation always needs feature_width steps per wakeup
+print("{:>8s} {:>7s} {:>14s} {:>8s} {:>10s} {:>10s}".format(
+    "horizon", "period", "steps/wakeup", "saving", "max diff", "argmax"))
+
+for horizon, period in CONFIGURATIONS:
+    steps = 0
+    samples = 0
+    max_diff = 0
+    agree = 0
+    windows = 0
+
+    for dataset in grps:
+        lux_scaled, pred_full = reference[dataset]
+
+        stream = ZombieStream(custom_model, horizon, period)
+        pred_stream = stream.predict_series(lux_scaled)
+
+        # window i of the reference ends at sample i + (feature_width-1)*step
+        end = (FEATURE_WIDTH - 1) * STEP_SIZE
+        pred_stream = pred_stream[end:end + len(pred_full)]
+        steps += stream.lstm_steps
+        samples += len(lux_scaled)
+
+        valid = ~np.isnan(pred_stream[:, 0])
+        if valid.any():
+            diff = np.abs(pred_stream[valid] - pred_full[valid])
+            max_diff = max(max_diff, diff.max())
+        agree += np.sum(np.argmax(pred_stream[valid], axis=1) ==
+                        np.argmax(pred_full[valid], axis=1))
+        windows += len(pred_full)
+
+    print("{:>8s} {:7d} {:14.2f} {:7.1f}% {:10.2e} {:10.4f}".format(
+        str(horizon or FEATURE_WIDTH), period, steps / samples,
+        100 * (1 - steps / samples / FEATURE_WIDTH), max_diff,
+        agree / windows))
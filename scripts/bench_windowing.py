@@ -0,0 +1,116 @@
+################################################################################
+# File:     bench_windowing.py
+# Created:  18.10.2026
+#
+# Description: Benchmark wall time and peak memory of the strided timeseries
+#              windowing against the former list comprehension implementation
+#
+################################################################################
+
+
+import os
+import time
+import resource
+import multiprocessing as mp
+import numpy as np
+
+import zombie_functions as zf
+
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.abspath(os.path.join(THIS_DIR, "../data"))
+
+# define path of stored data and dataset used for the benchmark
+DATA_PATH = os.path.join(DATA_DIR, "all_data.h5")
+DATASET = "2021-11-13_90mindark"
+# number of times the series is repeated to emulate longer recordings
+REPEAT = 100
+
+# limits for scaling
+LUX_MAX = 2000
+LUX_MIN = 0
+# width and step size for data windowing
+WINDOW_WIDTH_IN_HOURS = 12
+STEP_SIZE = 6
+FEATURE_WIDTH = int(WINDOW_WIDTH_IN_HOURS * 60 / 5 / STEP_SIZE)
+# batch size for the chunked windowing
+BATCH_SIZE = 4096
+
+
+# former implementation of zf.timeseries_windowing (copies every window)
+def legacy_timeseries_windowing(data, feature_width=12, label_width=1,
+                                step_size=1):
+
+    width = (feature_width + label_width) * step_size
+
+    windows = np.array(
+        [data[i:i + width:step_size] for i in range(0, len(data) - width)])
+
+    if label_width:
+        X = windows[:, :feature_width]
+        y = windows[:, feature_width:]
+        return X, y
+    else:
+        return windows
+
+
+# helper function to consume the chunked windowing like a training loop would
+def batched_timeseries_windowing(data, feature_width=12, label_width=1,
+                                 step_size=1):
+    total = 0.0
+    for X, y in zf.timeseries_windowing_batches(data, feature_width,
+                                                label_width, step_size,
+                                                BATCH_SIZE):
+        total += X.sum() + y.sum()
+    return total
+
+
+METHODS = {"legacy": legacy_timeseries_windowing,
+           "strided": zf.timeseries_windowing,
+           "batched": batched_timeseries_windowing}
+
+
+# helper function to run a single method (executed in a fresh process)
+def run_method(name, queue):
+    lux = zf.get_dataset(DATA_PATH, DATASET, "lux")
+    lux_scaled = zf.scale(np.tile(lux, REPEAT), LUX_MIN, LUX_MAX)
+
+    # peak resident set size in kB before windowing (linux reports kB)
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    start = time.perf_counter()
+    result = METHODS[name](lux_scaled,
+                           feature_width=FEATURE_WIDTH,
+                           label_width=1,
+                           step_size=STEP_SIZE)
+    duration = time.perf_counter() - start
+
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    del result
+
+    queue.put((len(lux_scaled), duration, rss_after - rss_before))
+
+
+if __name__ == "__main__":
+    # spawn a new interpreter per method so peak memory is not shared
+    ctx = mp.get_context("spawn")
+
+    print(f"Dataset: {DATASET} x {REPEAT}")
+    print(f"Feature width: {FEATURE_WIDTH} | Step size: {STEP_SIZE}\n")
+    print("{:10s} {:>12s} {:>12s} {:>16s}".format(
+        "method", "samples", "time [s]", "peak RSS [MiB]"))
+
+    for name in METHODS:
+        queue = ctx.Queue()
+        proc = ctx.Process(target=run_method, args=(name, queue))
+        proc.start()
+        proc.join()
+
+        if proc.exitcode != 0:
+            print("{:10s} failed with exit code {}".format(name, proc.exitcode))
+            continue
+
+        samples, duration, rss = queue.get()
+
+        print("{:10s} {:12d} {:12.4f} {:16.1f}".format(
+            name, samples, duration, rss / 1024))
@@ -0,0 +1,62 @@
+import os
+import sys
+import importlib.util
+import h5py
+import numpy as np
+
+import zombie_functions as zf
+
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# the script name starts with a digit, so it is loaded from its path
+# (registered as module, so the worker processes can find its functions)
+spec = importlib.util.spec_from_file_location(
+    "create_dataset", os.path.join(THIS_DIR, "02_create_dataset.py"))
+create_dataset = importlib.util.module_from_spec(spec)
+sys.modules["create_dataset"] = create_dataset
+spec.loader.exec_module(create_dataset)
+
+
+# helper function to write a source file like the exported recordings
+def write_source(path, num_samples=50):
+    with h5py.File(path, "w") as file:
+        grp = file.create_group("test123")
+        grp["timestamp"] = np.arange(num_samples, dtype="int64") * 300 * 10**9
+        grp["timestamp"].attrs["start"] = "2021-01-01T00:00:00Z"
+        grp["voltage"] = np.full(num_samples, 4.0, dtype="float32")
+        grp["cell_current"] = np.zeros(num_samples, dtype="float32")
+        grp["lux"] = np.linspace(0, 1000, num_samples, dtype="float32")
+        grp["count"] = np.arange(num_samples, dtype="int32")
+        grp["wifi_count"] = np.zeros(num_samples, dtype="int32")
+
+
+def build(data_dir, output_path):
+    create_dataset.build_dataset(str(data_dir), str(output_path),
+                                 cache_dir=None, num_workers=1)
+
+
+def test_rebuild_removes_deleted_recordings(tmp_path):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    output_path = tmp_path / "all_data.h5"
+    write_source(data_dir / "2021-01-01_const.h5")
+    write_source(data_dir / "2021-01-02_window.h5")
+
+    build(data_dir, output_path)
+    grps, lengths, categories = zf.get_manifest(str(output_path))
+    assert grps == ["2021-01-01_const", "2021-01-02_window"]
+    assert list(categories) == [1, 2]
+
+    # deleted and renamed source files
+    os.remove(data_dir / "2021-01-01_const.h5")
+    os.rename(data_dir / "2021-01-02_window.h5",
+              data_dir / "2021-01-03_90mindark.h5")
+    build(data_dir, output_path)
+
+    with h5py.File(output_path, "r") as file:
+        assert sorted(file.keys()) == ["2021-01-03_90mindark"]
+    grps, lengths, categories = zf.get_manifest(str(output_path))
+    assert grps == ["2021-01-03_90mindark"]
+    assert list(lengths) == [50]
+    assert list(categories) == [0]
@@ -0,0 +1,266 @@
+################################################################################
+# File:     zombie_firmware.py
+# Created:  18.10.2026
+#
+# Description: Host-side simulator of the LSTM inference of the firmware
+#              (lstm_category.h), which replays the recorded lux series
+#              through the ring buffer of lstm_prediction and counts the
+#              operations of every wakeup
+#
+################################################################################
+
+
+import os
+import numpy as np
+
+import zombie_functions as zf
+import zombie_registry as zr
+from zombie_lstm import float32_model
+
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.abspath(os.path.join(THIS_DIR, "../data"))
+MODEL_DIR = os.path.abspath(os.path.join(THIS_DIR, "../models"))
+
+# define path of stored data
+# (or the directory of the memory-mapped store from zombie_store.py)
+DATA_PATH = os.path.join(DATA_DIR, "all_data.h5")
+
+# model variants to compare as (model file, activation method)
+MODEL_VARIANTS = [("lstm32_12h_step6_v3.h5", "interp"),
+                  ("lstm32_12h_step6_v3.h5", "uniform")]
+
+# sleep time between two wakeups in seconds (config.h)
+SLEEP_SECONDS = 300
+# a workload is started above these capacitor voltages (config.h, main.ino)
+# keys are the predicted categories, -1 is used for all other outputs
+WORKLOAD_VOLTAGE = 3.9
+WORKLOAD_THRESHOLDS = {0: WORKLOAD_VOLTAGE + 0.3,
+                       1: WORKLOAD_VOLTAGE,
+                       2: WORKLOAD_VOLTAGE + 0.3,
+                       -1: WORKLOAD_VOLTAGE + 0.3}
+
+# cost model of the microcontroller (rough estimates for the ESP32 running
+# the float implementation, to be calibrated with measurements)
+CPU_FREQUENCY = 240e6
+ACTIVE_POWER = 0.1
+# cycles of one multiply accumulate (load, load, madd, loop overhead)
+CYCLES_PER_MAC = 6
+# cycles of one call of lstm_tanh_interp besides the table search
+CYCLES_PER_ACTIVATION = 40
+# cycles of one iteration of the linear table search
+CYCLES_PER_LOOKUP_STEP = 8
+
+# number of predicting wakeups per batch of the vectorized simulation
+BATCH_SIZE = 65536
+# wakeups of the first series replayed step by step as reference
+VERIFY_WAKEUPS = 1000
+
+# lstm_output is kept from the previous dense layer if no output is positive
+KEEP = -2
+
+
+# function to compute the ring buffer slots read by lstm_prediction
+# wakeup k (measure_ctr = k + 1) writes slot k % width and reads the slots
+# loop_start, loop_start + step_size, ... with loop_start = (k + step_size)
+# % width, slot p holds the newest sample j <= k with j % width == p
+# returns the wakeups with a prediction and the sample indices of their
+# inputs (shape (wakeups, feature_width)), wakeups with measure_ctr - 1 <
+# width return -1 without running the network
+def firmware_windows(num_samples, feature_width, step_size):
+    width = feature_width * step_size
+    wakeup = np.arange(width, num_samples, dtype="int64")
+
+    current_position = wakeup % width
+    loop_start = (current_position + step_size) % width
+    slots = (loop_start[:, None] + np.arange(0, width, step_size)) % width
+    return wakeup, wakeup[:, None] - (wakeup[:, None] - slots) % width
+
+
+# function to count the operations of one prediction of the firmware
+# lstm_dense_layer runs after every lstm step, the tanh table is used for
+# 3 sigmoids and 2 tanh per unit and step
+# sparse: only the non-zero weights are multiplied (pruned models)
+def operation_counts(model, sparse=False):
+    count = np.count_nonzero if sparse else np.size
+    lstm_macs = count(model.W) + count(model.U)
+    dense_macs = count(model.Wd)
+    return {"macs": model.feature_width * (lstm_macs + dense_macs),
+            "activations": model.feature_width * 5 * model.units}
+
+
+# helper function to select the category like lstm_dense_layer
+# (first output above the running maximum, which starts at 0)
+def _dense_category(model, ht, output):
+    dense = np.dot(ht, model.Wd) + model.bd
+    return np.where(dense.max(axis=1) > 0, np.argmax(dense, axis=1), output)
+
+
+# helper function to carry lstm_output over wakeups without a positive
+# output (the first wakeup of every series is -1)
+def _forward_fill(output):
+    index = np.where(output != KEEP, np.arange(len(output)), 0)
+    return output[np.maximum.accumulate(index)]
+
+
+# function to replay several series through the firmware in one run
+# series: list of scaled lux series, every series starts with measure_ctr = 1
+# (first boot or reset of the RTC memory)
+# returns a dict of arrays with one entry per wakeup of all series:
+# output (lstm_output after the wakeup), macs, activations and lookup_steps
+def simulate(model, series, batch_size=BATCH_SIZE):
+    lengths = [len(x) for x in series]
+    offsets = np.concatenate([[0], np.cumsum(lengths)]).astype("int64")
+    data = np.concatenate([np.asarray(x) for x in series] + [np.zeros(0)])
+
+    # inputs of all predicting wakeups of all series
+    wakeups = []
+    inputs = []
+    for offset, length in zip(offsets, lengths):
+        wakeup, index = firmware_windows(length, model.feature_width,
+                                         model.step_size)
+        wakeups.append(offset + wakeup)
+        inputs.append(offset + index)
+    wakeups = np.concatenate(wakeups + [np.zeros(0, dtype="int64")])
+    inputs = np.concatenate(inputs + [np.zeros((0, model.feature_width),
+                                               dtype="int64")])
+
+    output = np.full(len(data), -1, dtype="int64")
+    steps = np.zeros(len(data), dtype="int64")
+
+    for start in range(0, len(wakeups), batch_size):
+        X = data[inputs[start:start + batch_size]].astype(model.W.dtype)
+        ct = np.zeros((len(X), model.units), dtype=model.W.dtype)
+        ht = np.zeros((len(X), model.units), dtype=model.W.dtype)
+        category = np.full(len(X), KEEP, dtype="int64")
+        search = np.zeros(len(X), dtype="int64")
+
+        for t in range(model.feature_width):
+            z = model._preactivation(X[:, t:t + 1], ht)
+            # sigmoid(x) = (1 + tanh(x / 2)) / 2 for the gates i, f and o
+            # of the fused pre-activations [i|f|c|o]
+            u = model.units
+            search += model.search_steps(np.hstack(
+                [z[:, :2 * u] / 2, z[:, 2 * u:3 * u], z[:, 3 * u:] / 2])
+            ).sum(axis=1)
+            ct, ht = model._update_state(z, ct)
+            search += model.search_steps(ct).sum(axis=1)
+            category = _dense_category(model, ht, category)
+
+        output[wakeups[start:start + batch_size]] = category
+        steps[wakeups[start:start + batch_size]] = search
+
+    counts = operation_counts(model)
+    predicted = output != -1
+    return {"offsets": offsets,
+            "output": _forward_fill(output),
+            "macs": np.where(predicted, counts["macs"], 0),
+            "activations": np.where(predicted, counts["activations"], 0),
+            "lookup_steps": steps}
+
+
+# function to replay one series wakeup by wakeup with the ring buffer and
+# the counter of the firmware (reference for simulate)
+def simulate_loop(model, series):
+    width = model.feature_width * model.step_size
+    lstm_input = np.zeros(width)
+    lstm_output = 0
+    outputs = []
+
+    for measure_ctr, lux_scaled in enumerate(series, start=1):
+        current_position = (measure_ctr - 1) % width
+        lstm_input[current_position] = lux_scaled
+
+        if measure_ctr - 1 < width:
+            lstm_output = -1
+        else:
+            model.ct = np.zeros(model.units)
+            model.ht = np.zeros(model.units)
+            loop_start = (current_position + model.step_size) % width
+            for i in range(0, width, model.step_size):
+                dense = np.ravel(model.contiguous_prediction(
+                    lstm_input[(loop_start + i) % width]))
+                max_val = 0
+                for j, value in enumerate(dense):
+                    if max_val < value:
+                        max_val = value
+                        lstm_output = j
+        outputs.append(lstm_output)
+
+    return np.array(outputs, dtype="int64")
+
+
+# function to estimate the inference time (s) and energy (J) of wakeups
+def inference_cost(macs, activations, steps):
+    cycles = (CYCLES_PER_MAC * np.asarray(macs) +
+              CYCLES_PER_ACTIVATION * np.asarray(activations) +
+              CYCLES_PER_LOOKUP_STEP * np.asarray(steps))
+    duration = cycles / CPU_FREQUENCY
+    return duration, duration * ACTIVE_POWER
+
+
+# function to count the wakeups which start the workload of main.ino
+# (the recorded voltage is measured before the workload of the wakeup)
+def workload_runs(output, voltage):
+    threshold = np.full(len(output), WORKLOAD_THRESHOLDS[-1])
+    for category, value in WORKLOAD_THRESHOLDS.items():
+        threshold[output == category] = value
+    return int(np.sum(np.asarray(voltage) > threshold))
+
+
+if __name__ == "__main__":
+    # load the segments of all recordings, the firmware starts again with
+    # measure_ctr = 1 after every segment (counter reset or sensor outage)
+    grps, lengths, categories = zf.get_manifest(DATA_PATH)
+    lux = {}
+    voltage = {}
+    for dataset in grps:
+        segments = zf.get_segments(DATA_PATH, dataset)
+        lux[dataset] = zf.split_segments(
+            zf.get_dataset(DATA_PATH, dataset, "lux"), segments)
+        voltage[dataset] = np.concatenate(zf.split_segments(
+            zf.get_dataset(DATA_PATH, dataset, "voltage"), segments) +
+            [np.zeros(0)])
+    num_series = [len(lux[dataset]) for dataset in grps]
+
+    for model_file, activation in MODEL_VARIANTS:
+        bundle = zr.load_model(os.path.join(MODEL_DIR, model_file))
+        # float32 weights like the microcontroller (the activations and the
+        # states are still computed in float64)
+        model = float32_model(bundle.to_zombie_lstm(activation=activation))
+
+        # all segments of all recordings in one batch
+        series = [zf.scale(x, model.val_min, model.val_max)
+                  for dataset in grps for x in lux[dataset]]
+        result = simulate(model, series)
+
+        print(f"\n{model_file} | {activation} | {model.units} units | "
+              f"width {model.feature_width} | step {model.step_size} | "
+              f"{operation_counts(model)['macs']} MACs per prediction")
+
+        if VERIFY_WAKEUPS and series:
+            reference = simulate_loop(model, series[0][:VERIFY_WAKEUPS])
+            agree = np.mean(reference == result["output"][:len(reference)])
+            print(f"agreement with the step by step replay: {agree:.4f}")
+
+        print(f"{'dataset':28s} {'wakeups':>8s} {'predict':>8s} "
+              f"{'correct':>8s} {'MMACs':>8s} {'k act':>8s} {'k search':>8s} "
+              f"{'time [s]':>9s} {'energy [J]':>10s} {'duty ppm':>8s} "
+              f"{'workload':>8s}")
+        series_offsets = np.cumsum([0] + num_series)
+        for i, dataset in enumerate(grps):
+            start = result["offsets"][series_offsets[i]]
+            stop = result["offsets"][series_offsets[i + 1]]
+            output = result["output"][start:stop]
+            steps = result["lookup_steps"][start:stop]
+            macs = result["macs"][start:stop].sum()
+            activations = result["activations"][start:stop].sum()
+            predictions = np.count_nonzero(result["macs"][start:stop])
+            duration, energy = inference_cost(macs, activations, steps.sum())
+
+            print(f"{dataset:28s} {len(output):8d} {predictions:8d} "
+                  f"{np.sum(output == categories[i]):8d} {macs / 1e6:8.1f} "
+                  f"{activations / 1e3:8.1f} {steps.sum() / 1e3:8.1f} "
+                  f"{duration:9.2f} {energy:10.3f} "
+                  f"{1e6 * duration / max(len(output) * SLEEP_SECONDS, 1):8.1f} "
+                  f"{workload_runs(output, voltage[dataset]):8d}")
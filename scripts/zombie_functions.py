@@ -10,13 +10,46 @@
 ################################################################################
 
 
+import os
 import h5py
+import warnings
 import numpy as np
-import tensorflow as tf
+
+import zombie_quality as zq
+import zombie_registry as zr
+from zombie_store import ZombieStore
+
+# tensorflow is only imported by the functions creating tensorflow datasets,
+# so prediction and export do not need it
+
+
+# nominal time between two measurements (seconds)
+SAMPLE_PERIOD = zq.SAMPLE_PERIOD
+# allowed relative deviation of the real duration of a window from its
+# nominal duration (feature width * step size * sample period)
+WINDOW_TOLERANCE = 0.1
+
+# opened memory-mapped stores (see zombie_store.py)
+_stores = {}
+# computed valid-window indices (see get_window_index)
+_window_indices = {}
+
+
+# helper function to open a memory-mapped store only once
+def _get_store(store_dir):
+    store_dir = os.path.abspath(store_dir)
+    if store_dir not in _stores:
+        _stores[store_dir] = ZombieStore(store_dir)
+    return _stores[store_dir]
 
 
 # function to read feature and label data from hdf5 file
+# (or from a memory-mapped store if file_path is a directory)
 def get_dataset(file_path, dataset, feature_key, label_key=None):
+    if os.path.isdir(file_path):
+        return _get_store(file_path).get_dataset(dataset, feature_key,
+                                                 label_key)
+
     with h5py.File(file_path, "r") as infile:
         features = infile.get(f"/{dataset}/{feature_key}")[()]
         if label_key:
@@ -28,13 +61,99 @@ def get_dataset(file_path, dataset, feature_key, label_key=None):
         return features
 
 
-# function to create timeseries windows
-def timeseries_windowing(data, feature_width=12, label_width=1, step_size=1):
+# function to read the names, lengths and categories of all datasets
+# (stored as file attributes by 02_create_dataset.py)
+def get_manifest(file_path):
+    if os.path.isdir(file_path):
+        store = _get_store(file_path)
+        return store.names, store.lengths, store.categories
+
+    with h5py.File(file_path, "r") as infile:
+        if "manifest_names" in infile.attrs:
+            names = [str(name) for name in infile.attrs["manifest_names"]]
+            lengths = infile.attrs["manifest_lengths"]
+            categories = infile.attrs["manifest_categories"]
+        else:
+            # files without manifest need to be scanned
+            names = list(infile.keys())
+            lengths = np.array([len(infile[name]["lux"]) for name in names])
+            categories = np.array([infile[name]["category"][0]
+                                   for name in names])
+
+    return names, lengths, categories
+
+
+# function to read the clean segments of a dataset ([start, stop) indices
+# stored by 02_create_dataset.py, see zombie_quality.py)
+# datasets without segments consist of a single segment
+def get_segments(file_path, dataset):
+    if os.path.isdir(file_path):
+        return _get_store(file_path).get_segments(dataset)
+
+    with h5py.File(file_path, "r") as infile:
+        grp = infile.get(f"/{dataset}")
+        if "segments" in grp:
+            return grp["segments"][()].reshape(-1, 2)
+        length = len(grp["lux"])
+
+    return np.array([[0, length]] if length else [],
+                    dtype="int64").reshape(-1, 2)
+
+
+# function to split a series into its clean segments (views, no copies)
+def split_segments(data, segments):
+    return [data[start:stop] for start, stop in segments]
+
+
+# function to save a trained keras model with the parameters for scaling and
+# windowing, which are read again by zombie_registry.py
+def save_model(model, model_path, val_min, val_max, feature_width, step_size):
+    # save tensorflow model weights
+    model.save(model_path)
+    # add parameters for scaling and windowing
+    with h5py.File(model_path, "a") as file:
+        scaling = file.require_group("scaling_params")
+        scaling.require_dataset("val_max", shape=(1,), dtype="uint16")
+        scaling.require_dataset("val_min", shape=(1,), dtype="uint16")
+        windowing = file.require_group("window_params")
+        windowing.require_dataset("step_size", shape=(1,), dtype="uint16")
+        windowing.require_dataset("feature_width", shape=(1,), dtype="uint16")
+
+        scaling["val_max"][0] = val_max
+        scaling["val_min"][0] = val_min
+        windowing["step_size"][0] = step_size
+        windowing["feature_width"][0] = feature_width
+
+
+# function to load a trained model into the custom lstm implementation
+# (the model file is parsed once by the model registry)
+def get_zombie_lstm(model_path, **kwargs):
+    return zr.load_model(model_path).to_zombie_lstm(**kwargs)
+
+
+# helper function to create a read-only strided view of all windows
+# window i consists of data[i:i + width:step_size] for i < len(data) - width
+def _window_view(data, feature_width, label_width, step_size,
+                 start=0, stop=None):
+    data = np.asarray(data)
 
     width = (feature_width + label_width) * step_size
+    num_windows = max(len(data) - width, 0)
+    stop = num_windows if stop is None else min(stop, num_windows)
+    start = min(start, stop)
+
+    shape = (stop - start, feature_width + label_width) + data.shape[1:]
+    strides = (data.strides[0], data.strides[0] * step_size) + data.strides[1:]
 
-    windows = np.array(
-        [data[i:i + width:step_size] for i in range(0, len(data) - width)])
+    return np.lib.stride_tricks.as_strided(data[start:], shape=shape,
+                                           strides=strides, writeable=False)
+
+
+# function to create timeseries windows
+# the windows are a read-only view into data, no values are copied
+def timeseries_windowing(data, feature_width=12, label_width=1, step_size=1):
+
+    windows = _window_view(data, feature_width, label_width, step_size)
 
     if label_width:
         X = windows[:, :feature_width]
@@ -44,6 +163,144 @@ def timeseries_windowing(data, feature_width=12, label_width=1, step_size=1):
         return windows
 
 
+# function to create timeseries windows in batches of fixed size
+# yields the same windows as timeseries_windowing, the last batch may be smaller
+def timeseries_windowing_batches(data, feature_width=12, label_width=1,
+                                 step_size=1, batch_size=1024):
+
+    width = (feature_width + label_width) * step_size
+    num_windows = max(len(data) - width, 0)
+
+    for start in range(0, num_windows, batch_size):
+        windows = _window_view(data, feature_width, label_width, step_size,
+                               start, start + batch_size)
+
+        if label_width:
+            yield windows[:, :feature_width], windows[:, feature_width:]
+        else:
+            yield windows
+
+
+# function to find the windows which cover the nominal time span
+# returns the start indices i of all valid windows data[i:i + width:step_size]
+# (same numbering as timeseries_windowing), a window is rejected if the time
+# between its first and its last sample deviates by more than the tolerance
+# from the nominal duration (outage of the sensor) or if it is not inside a
+# single clean segment (counter reset, duplicated records), the resolution
+# of the timestamps is inferred if it is not given
+def valid_window_index(timestamp, feature_width, step_size, label_width=0,
+                       segments=None, sample_period=SAMPLE_PERIOD,
+                       tolerance=WINDOW_TOLERANCE, resolution=None):
+    timestamp = np.asarray(timestamp, dtype="int64")
+    if resolution is None:
+        resolution = zq.timestamp_resolution(timestamp, sample_period)
+
+    width = (feature_width + label_width) * step_size
+    start = np.arange(max(len(timestamp) - width, 0), dtype="int64")
+    last = start + width - step_size
+
+    nominal = (width - step_size) * sample_period * resolution
+    span = timestamp[last] - timestamp[start]
+    valid = np.abs(span - nominal) <= tolerance * nominal
+
+    if segments is not None:
+        # segment of the first sample has to contain the last sample, too
+        segments = np.asarray(segments, dtype="int64").reshape(-1, 2)
+        seg = np.searchsorted(segments[:, 0], start, side="right") - 1
+        valid &= (seg >= 0) & (last < segments[np.maximum(seg, 0), 1])
+
+    return start[valid]
+
+
+# function to resample the segments of a series onto a regular time grid
+# (linear interpolation inside the segments, nothing is filled in between)
+# returns the grid timestamps, the resampled values and the new segments
+def resample(timestamp, values, segments=None, sample_period=SAMPLE_PERIOD,
+             resolution=None):
+    timestamp = np.asarray(timestamp, dtype="int64")
+    if resolution is None:
+        resolution = zq.timestamp_resolution(timestamp, sample_period)
+    values = np.asarray(values)
+    if segments is None:
+        segments = [[0, len(timestamp)]] if len(timestamp) else []
+
+    period = sample_period * resolution
+    grid_parts, value_parts, lengths = [], [], []
+    for start, stop in segments:
+        t = timestamp[start:stop]
+        # relative times keep the precision of the interpolation
+        grid = np.arange(0, t[-1] - t[0] + 1, period, dtype="int64")
+        value_parts.append(np.interp(grid, t - t[0], values[start:stop])
+                           .astype(values.dtype))
+        grid_parts.append(grid + t[0])
+        lengths.append(len(grid))
+
+    stops = np.cumsum(lengths, dtype="int64")
+    new_segments = np.stack([stops - lengths, stops], axis=1) \
+        if lengths else np.zeros((0, 2), dtype="int64")
+    return (np.concatenate(grid_parts + [np.zeros(0, dtype="int64")]),
+            np.concatenate(value_parts + [values[:0]]), new_segments)
+
+
+# function to get the valid-window index of a dataset (see valid_window_index)
+# the index is computed once per process from the timestamps and the clean
+# segments, so training and evaluation use the same windows
+def get_window_index(file_path, dataset, feature_width, step_size,
+                     label_width=0):
+    key = (os.path.abspath(file_path), os.path.getmtime(file_path), dataset,
+           feature_width, step_size, label_width)
+    if key not in _window_indices:
+        timestamp = get_dataset(file_path, dataset, "timestamp")
+        segments = get_segments(file_path, dataset)
+        _window_indices[key] = valid_window_index(
+            timestamp, feature_width, step_size, label_width, segments)
+    return _window_indices[key]
+
+
+# function to read a feature of a dataset and the start indices of its
+# windows, mode is "reject" (windows crossing outages are left out),
+# "resample" (the clean segments are resampled onto the regular time grid
+# of SAMPLE_PERIOD first) or "none" (all windows, time is ignored)
+def get_windowed_series(file_path, dataset, feature_key, feature_width,
+                        step_size, label_width=0, mode="reject"):
+    values = get_dataset(file_path, dataset, feature_key)
+
+    if mode == "resample":
+        timestamp, values, segments = resample(
+            get_dataset(file_path, dataset, "timestamp"), values,
+            get_segments(file_path, dataset))
+        index = valid_window_index(timestamp, feature_width, step_size,
+                                   label_width, segments)
+    elif mode == "reject":
+        index = get_window_index(file_path, dataset, feature_width,
+                                 step_size, label_width)
+    elif mode == "none":
+        width = (feature_width + label_width) * step_size
+        index = np.arange(max(len(values) - width, 0), dtype="int64")
+    else:
+        raise ValueError(f"Unknown windowing mode {mode!r}")
+
+    # a series longer than a window without any valid window points to
+    # broken timestamps rather than to outages
+    width = (feature_width + label_width) * step_size
+    if len(values) > width and not len(index):
+        warnings.warn(f"No valid window in {dataset} of {file_path} "
+                      f"({len(values)} samples, mode {mode!r})")
+
+    return values, index
+
+
+# function to select windows by their start indices (copies the windows)
+def select_windows(data, index, feature_width=12, label_width=1,
+                   step_size=1):
+    windows = _window_view(data, feature_width, label_width, step_size)[index]
+
+    if label_width:
+        return windows[:, :feature_width], windows[:, feature_width:]
+    else:
+        return windows
+
+
 # function to scale data
 def scale(data, min_value, max_value):
     return (data - min_value) / (max_value - min_value)
@@ -66,6 +323,8 @@ def train_test_split(X, y, ratio=0.8):
 
 # function to create tensorflow dataset
 def create_tf_dataset(X, y):
+    import tensorflow as tf
+
     if isinstance(X, list):
         X = np.concatenate(X)
         y = np.concatenate(y)
@@ -76,3 +335,69 @@ def create_tf_dataset(X, y):
     # print("y shape:", y.shape)
 
     return tf.data.Dataset.from_tensor_slices((X, y))
+
+
+# function to create a tensorflow dataset which builds the windows lazily
+# from the raw series of all recordings (same windows and train test split
+# as timeseries_windowing and train_test_split), part is "train", "test" or
+# "all" and the recordings are interleaved in parallel
+# with window_index (one array of start indices per series, e.g. from
+# get_window_index) only these windows are used and split
+def create_windowed_tf_dataset(series, categories, num_category,
+                               feature_width, step_size,
+                               part="all", ratio=1.0, window_index=None):
+    import tensorflow as tf
+
+    # only the raw series are kept in memory
+    lengths = np.array([len(s) for s in series], dtype="int64")
+    offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]]).astype("int64")
+    flat = tf.constant(np.concatenate(series).astype("float32"))
+
+    use_index = window_index is not None
+    if use_index:
+        index_lengths = np.array([len(i) for i in window_index],
+                                 dtype="int64")
+        index_offsets = tf.constant(np.concatenate(
+            [[0], np.cumsum(index_lengths)[:-1]]).astype("int64"))
+        index_lengths = tf.constant(index_lengths)
+        flat_index = tf.constant(np.concatenate(
+            [np.asarray(i, dtype="int64") for i in window_index] +
+            [np.zeros(0, dtype="int64")]))
+
+    lengths = tf.constant(lengths)
+    offsets = tf.constant(offsets)
+    categories = tf.constant(np.asarray(categories, dtype="int64"))
+
+    width = feature_width * step_size
+    sample_index = tf.range(feature_width, dtype=tf.int64) * step_size
+
+    def recording_windows(i):
+        offset = offsets[i]
+        if use_index:
+            num_windows = index_lengths[i]
+        else:
+            num_windows = tf.maximum(lengths[i] - width, 0)
+        n_split = tf.cast(tf.cast(num_windows, tf.float64) * ratio, tf.int64)
+
+        if part == "train":
+            start, stop = tf.constant(0, tf.int64), n_split
+        elif part == "test":
+            start, stop = n_split, num_windows
+        else:
+            start, stop = tf.constant(0, tf.int64), num_windows
+
+        label = tf.one_hot(categories[i], num_category)
+
+        def window(j):
+            X = tf.gather(flat, offset + j + sample_index)
+            return tf.expand_dims(X, axis=1), label
+
+        if use_index:
+            starts = flat_index[index_offsets[i] + start:
+                                index_offsets[i] + stop]
+            return tf.data.Dataset.from_tensor_slices(starts).map(window)
+        return tf.data.Dataset.range(start, stop).map(window)
+
+    return tf.data.Dataset.range(len(series)).interleave(
+        recording_windows, cycle_length=max(len(series), 1),
+        num_parallel_calls=tf.data.AUTOTUNE, deterministic=False)
@@ -9,14 +9,131 @@
 ################################################################################
 
 
+import re
+import functools
 import numpy as np
 
 
+# memory layouts of the weight matrices in the exported header
+# "rows":       [input][units] like the keras kernels
+# "transposed": [units][input], the weights of one unit are contiguous
+# "flat":       one dimensional arrays in the order of "rows"
+WEIGHT_LAYOUTS = ("rows", "transposed", "flat")
+
+
+# helper function to write values as exact C float literals of their float32
+# values ("decimal": %.9g, "hex": C99 hex floats)
+def float_literals(values, float_format="decimal"):
+    values = np.asarray(values, dtype=np.float32).ravel().tolist()
+    if float_format == "hex":
+        return [value.hex() + "f" for value in values]
+    texts = ["%.9g" % value for value in values]
+    # "3" is no valid float literal
+    return [text + "f" if "." in text or "e" in text else text + ".0f"
+            for text in texts]
+
+
+# helper function to arrange a matrix in the given weight layout
+def apply_layout(array, layout="rows"):
+    if array.ndim == 1 or layout == "rows":
+        return array
+    if layout == "transposed":
+        return array.T
+    if layout == "flat":
+        return array.ravel()
+    raise ValueError(f"Unknown weight layout {layout!r}")
+
+
+# helper function to restore a matrix of the given shape from a weight layout
+# (contiguous like the original matrix, so the results of np.dot are equal)
+def undo_layout(values, shape, layout="rows"):
+    if layout == "transposed" and len(shape) == 2:
+        return np.ascontiguousarray(np.reshape(values, shape[::-1]).T)
+    return np.reshape(values, shape)
+
+# storage of the recurrent kernels in the exported header
+# "dense": like the other weight matrices (see WEIGHT_LAYOUTS)
+# "csr":   compressed sparse rows of the transposed kernels (pruned models)
+# "block": compressed rows of blocks of the transposed kernels
+RECURRENT_LAYOUTS = ("dense", "csr", "block")
+
+
+# function to set the weights with the smallest magnitude to zero, either
+# single weights or blocks of block_size x block_size weights (L1 norm)
+# returns the pruned matrix and the mask of the kept weights
+def prune_matrix(matrix, sparsity, block_size=1):
+    rows, cols = matrix.shape
+    if rows % block_size or cols % block_size:
+        raise ValueError(f"Shape {matrix.shape} is not a multiple of the "
+                         f"block size {block_size}")
+    norms = np.abs(matrix).reshape(rows // block_size, block_size,
+                                   cols // block_size, block_size).sum(
+                                       axis=(1, 3))
+    num_pruned = int(round(sparsity * norms.size))
+    keep = np.ones(norms.size, dtype=matrix.dtype)
+    keep[np.argsort(norms, axis=None, kind="stable")[:num_pruned]] = 0
+    mask = np.kron(keep.reshape(norms.shape),
+                   np.ones((block_size, block_size), dtype=matrix.dtype))
+    return matrix * mask, mask
+
+
+# function to compress a matrix into block compressed sparse rows
+# (block_size 1: compressed sparse rows), only blocks with a non-zero
+# weight are stored, row by row
+# returns the pointers to the first block of every block row (block rows +
+# 1 entries), the block column of every block and the blocks (shape
+# (blocks, block_size, block_size))
+def block_csr(matrix, block_size=1):
+    rows, cols = matrix.shape
+    if rows % block_size or cols % block_size:
+        raise ValueError(f"Shape {matrix.shape} is not a multiple of the "
+                         f"block size {block_size}")
+    blocks = matrix.reshape(rows // block_size, block_size,
+                            cols // block_size, block_size).swapaxes(1, 2)
+    nonzero = np.any(blocks != 0, axis=(2, 3))
+    ptr = np.concatenate([[0], np.cumsum(nonzero.sum(axis=1))])
+    block_row, block_col = np.nonzero(nonzero)
+    return ptr.astype(np.int64), block_col.astype(np.int64), \
+        np.ascontiguousarray(blocks[block_row, block_col])
+
+
+# function to expand a block compressed matrix to the dense matrix
+def block_csr_dense(ptr, idx, blocks, shape):
+    block_size = blocks.shape[1]
+    dense = np.zeros((shape[0] // block_size, shape[1] // block_size,
+                      block_size, block_size), dtype=blocks.dtype)
+    block_row = np.repeat(np.arange(len(ptr) - 1), np.diff(ptr))
+    dense[block_row, idx] = blocks
+    return dense.swapaxes(1, 2).reshape(shape)
+
+
+# function to multiply the rows of x with a block compressed matrix
+# returns x @ matrix.T (shape (len(x), rows)), only the stored blocks are
+# multiplied
+def block_csr_product(x, ptr, idx, blocks):
+    block_size = blocks.shape[1]
+    cols = (idx[:, None] * block_size + np.arange(block_size)).ravel()
+    xb = x[:, cols].reshape(len(x), len(idx), block_size)
+    products = np.einsum("nbk,bok->nbo", xb, blocks)
+
+    # sum of the blocks of every block row (rows without blocks are 0)
+    products = np.concatenate(
+        [products, np.zeros((len(x), 1, block_size), products.dtype)], axis=1)
+    sums = np.add.reduceat(products, ptr[:-1], axis=1)
+    sums[:, ptr[:-1] == ptr[1:]] = 0
+    return sums.reshape(len(x), -1)
+
+
 class ZombieLSTM:
     def __init__(self, lstm_kernel, lstm_recurrent_kernel, lstm_bias,
                  dense_kernel, dense_bias,
                  val_min, val_max,
-                 feature_width, step_size):
+                 feature_width, step_size,
+                 activation="interp", tanh_points=26, tanh_max=2.5):
+        # store fused matrices [i|f|c|o] for batched predictions
+        self.W = lstm_kernel
+        self.U = lstm_recurrent_kernel
+        self.b = lstm_bias
         # split kernel matrix
         self.Wi, self.Wf, self.Wc, self.Wo = np.hsplit(lstm_kernel, 4)
         # split recurrent kernel matrix
@@ -32,101 +149,34 @@ class ZombieLSTM:
         self.ct = np.zeros(self.units)
         self.ht = np.zeros(self.units)
         # initialize tanh lookup table
-        self.tanh_x = np.linspace(0, 2.5, 26)
-        self.tanh_y = np.tanh(self.tanh_x)
+        self.set_activation(activation, tanh_points, tanh_max)
         # initialize normalization and feature parameters
         self.val_max = val_max
         self.val_min = val_min
         self.feature_width = feature_width
         self.step_size = step_size
 
-    def export_model(self, filename):
+    # tensors of the exported header (C name and attribute), the matrices
+    # are written in the selected weight layout
+    EXPORT_TENSORS = [("lstm_wi", "Wi"), ("lstm_wf", "Wf"),
+                      ("lstm_wc", "Wc"), ("lstm_wo", "Wo"),
+                      ("lstm_ui", "Ui"), ("lstm_uf", "Uf"),
+                      ("lstm_uc", "Uc"), ("lstm_uo", "Uo"),
+                      ("lstm_bi", "bi"), ("lstm_bf", "bf"),
+                      ("lstm_bc", "bc"), ("lstm_bo", "bo"),
+                      ("dense_kernel", "Wd"), ("dense_bias", "bd")]
+
+    def export_model(self, filename, float_format="decimal", layout="rows"):
+        # float_format: "decimal" (%.9g) or "hex" (C99 hex floats), both are
+        # exact for float32 values
+        # layout: weight layout of the matrices (see WEIGHT_LAYOUTS)
+        literals = functools.partial(float_literals, float_format=float_format)
         with open(filename, "w") as file:
             file.write("#ifndef NETWORK_H\n#define NETWORK_H\n\n")
+            file.write("#define weight_layout {}\n\n".format(
+                WEIGHT_LAYOUTS.index(layout)))
 
-            file.write("const float lstm_wi[{:d}][{:d}] = {{\n{{".format(
-                self.Wi.shape[0], self.Wi.shape[1]))
-            np.savetxt(file, self.Wi, fmt="%8.5f", delimiter=",", newline="},\n{")
-            file.seek(file.tell() - 3)
-            file.write("\n};\n\n")
-
-            file.write("const float lstm_wf[{:d}][{:d}] = {{\n{{".format(
-                self.Wf.shape[0], self.Wf.shape[1]))
-            np.savetxt(file, self.Wf, fmt="%8.5f", delimiter=",", newline="},\n{")
-            file.seek(file.tell() - 3)
-            file.write("\n};\n\n")
-
-            file.write("const float lstm_wc[{:d}][{:d}] = {{\n{{".format(
-                self.Wc.shape[0], self.Wc.shape[1]))
-            np.savetxt(file, self.Wc, fmt="%8.5f", delimiter=",", newline="},\n{")
-            file.seek(file.tell() - 3)
-            file.write("\n};\n\n")
-
-            file.write("const float lstm_wo[{:d}][{:d}] = {{\n{{".format(
-                self.Wo.shape[0], self.Wo.shape[1]))
-            np.savetxt(file, self.Wo, fmt="%8.5f", delimiter=",", newline="},\n{")
-            file.seek(file.tell() - 3)
-            file.write("\n};\n\n")
-
-            file.write("const float lstm_ui[{:d}][{:d}] = {{\n{{".format(
-                self.Ui.shape[0], self.Ui.shape[1]))
-            np.savetxt(file, self.Ui, fmt="%8.5f", delimiter=",", newline="},\n{")
-            file.seek(file.tell() - 3)
-            file.write("\n};\n\n")
-
-            file.write("const float lstm_uf[{:d}][{:d}] = {{\n{{".format(
-                self.Uf.shape[0], self.Uf.shape[1]))
-            np.savetxt(file, self.Uf, fmt="%8.5f", delimiter=",", newline="},\n{")
-            file.seek(file.tell() - 3)
-            file.write("\n};\n\n")
-
-            file.write("const float lstm_uc[{:d}][{:d}] = {{\n{{".format(
-                self.Uc.shape[0], self.Uc.shape[1]))
-            np.savetxt(file, self.Uc, fmt="%8.5f", delimiter=",", newline="},\n{")
-            file.seek(file.tell() - 3)
-            file.write("\n};\n\n")
-
-            file.write("const float lstm_uo[{:d}][{:d}] = {{\n{{".format(
-                self.Uo.shape[0], self.Uo.shape[1]))
-            np.savetxt(file, self.Uo, fmt="%8.5f", delimiter=",", newline="},\n{")
-            file.seek(file.tell() - 3)
-            file.write("\n};\n\n")
-
-            file.write("const float lstm_bi[{:d}] = {{\n".format(
-                self.bi.shape[0]))
-            np.savetxt(file, self.bi, fmt="%8.5f", newline=",")
-            file.seek(file.tell() - 2)
-            file.write("\n};\n\n")
-
-            file.write("const float lstm_bf[{:d}] = {{\n".format(
-                self.bf.shape[0]))
-            np.savetxt(file, self.bf, fmt="%8.5f", newline=",")
-            file.seek(file.tell() - 2)
-            file.write("\n};\n\n")
-
-            file.write("const float lstm_bc[{:d}] = {{\n".format(
-                self.bc.shape[0]))
-            np.savetxt(file, self.bc, fmt="%8.5f", newline=",")
-            file.seek(file.tell() - 2)
-            file.write("\n};\n\n")
-
-            file.write("const float lstm_bo[{:d}] = {{\n".format(
-                self.bo.shape[0]))
-            np.savetxt(file, self.bo, fmt="%8.5f", newline=",")
-            file.seek(file.tell() - 2)
-            file.write("\n};\n\n")
-
-            file.write("const float dense_kernel[{:d}][{:d}] = {{\n{{".format(
-                self.Wd.shape[0], self.Wd.shape[1]))
-            np.savetxt(file, self.Wd, fmt="%8.5f", delimiter=",", newline="},\n{")
-            file.seek(file.tell() - 3)
-            file.write("\n};\n\n")
-
-            file.write("const float dense_bias[{:d}] = {{\n".format(
-                self.bd.shape[0]))
-            np.savetxt(file, self.bd, fmt="%8.5f", newline=",")
-            file.seek(file.tell() - 2)
-            file.write("\n};\n\n")
+            self._write_arrays(file, literals, layout)
 
             file.write("#define input_size {}\n".format(self.Wi.shape[0]))
             file.write("#define lstm_units {}\n".format(self.units))
@@ -139,23 +189,64 @@ class ZombieLSTM:
 
             file.write("\ntypedef struct { float x; float y; } tanh_t;\n\n")
             file.write("tanh_t tanh_lookup[{:d}] = {{\n".format(len(self.tanh_x)))
-            for i in range(len(self.tanh_x)):
-                file.write("{{{:8.5f}, {:8.5f}}},\n".format(
-                    self.tanh_x[i], self.tanh_y[i]))
-            file.seek(file.tell() - 2)
+            file.write(",\n".join("{{{}, {}}}".format(x, y) for x, y in zip(
+                literals(self.tanh_x), literals(self.tanh_y))))
             file.write("\n};\n\n")
 
             file.write("#endif // NETWORK_H")
 
+    def _write_arrays(self, file, literals, layout):
+        for name, attr in self.EXPORT_TENSORS:
+            _write_c_array(file, "float", name,
+                           apply_layout(getattr(self, attr), layout),
+                           literals)
+
+    def set_activation(self, activation="interp", tanh_points=26, tanh_max=2.5):
+        # activation methods for tanh (and sigmoid):
+        # "exact":   exact tanh function
+        # "interp":  lookup table with linear search and linear interpolation
+        # "uniform": lookup table with direct index and linear interpolation
+        # "nearest": lookup table with direct index (no interpolation)
+        if activation not in ("exact", "interp", "uniform", "nearest"):
+            raise ValueError(f"Unknown activation {activation!r}")
+        self.activation = activation
+        self.tanh_x = np.linspace(0, tanh_max, tanh_points)
+        self.tanh_y = np.tanh(self.tanh_x)
+
     def _sigmoid(self, x):
         return (1 + self._tanh(x / 2)) / 2
 
     def _tanh(self, x):
-        # # use exact tanh function
-        # return np.tanh(x)
+        if self.activation == "exact":
+            # use exact tanh function
+            return np.tanh(x)
+
+        if self.activation == "interp":
+            # use lookup table and linear interpolation
+            return np.interp(np.abs(x), self.tanh_x, self.tanh_y, right=1) * np.sign(x)
 
-        # use lookup table and linear interpolation
-        return np.interp(np.abs(x), self.tanh_x, self.tanh_y, right=1) * np.sign(x)
+        # index into the equally spaced lookup table
+        abs_x = np.abs(x)
+        pos = np.minimum(abs_x, self.tanh_x[-1]) / self.tanh_x[1]
+        if self.activation == "uniform":
+            i = np.minimum(pos.astype(int), len(self.tanh_x) - 2)
+            dy = self.tanh_y[i + 1] - self.tanh_y[i]
+            y = self.tanh_y[i] + dy * (pos - i)
+        else:
+            i = np.minimum(np.rint(pos).astype(int), len(self.tanh_x) - 1)
+            y = self.tanh_y[i]
+        return np.where(abs_x > self.tanh_x[-1], 1, y) * np.sign(x)
+
+    def search_steps(self, x):
+        # iterations of the linear table search of lstm_tanh_interp in the
+        # firmware for every value (values above the table return early),
+        # the other activation methods do not search the table
+        if self.activation != "interp":
+            return np.zeros(np.shape(x), dtype="int64")
+        abs_x = np.abs(x)
+        steps = np.minimum(np.searchsorted(self.tanh_x, abs_x, side="right"),
+                           len(self.tanh_x) - 1)
+        return np.where(abs_x > self.tanh_x[-1], 0, steps)
 
     def _lstm_step(self, xt):
         # forget gate
@@ -174,6 +265,27 @@ class ZombieLSTM:
     def _dense_layer(self):
         return np.dot(self.ht, self.Wd) + self.bd
 
+    def _preactivation(self, xt, ht):
+        # all gates of all sequences with a single matrix multiplication
+        return np.dot(xt, self.W) + np.dot(ht, self.U) + self.b
+
+    def _lstm_step_batch(self, xt, ct, ht):
+        return self._update_state(self._preactivation(xt, ht), ct)
+
+    def _update_state(self, z, ct):
+        zi, zf, zc, zo = np.hsplit(z, 4)
+
+        # input, forget and output gate, candidate values
+        it = self._sigmoid(zi)
+        ft = self._sigmoid(zf)
+        ot = self._sigmoid(zo)
+        cc = self._tanh(zc)
+
+        # update cell state and hidden state (pointwise multiplication)
+        ct = ft * ct + it * cc
+        ht = ot * self._tanh(ct)
+        return ct, ht
+
     def predict(self, x_vector):
         self.ct = np.zeros(self.units)
         self.ht = np.zeros(self.units)
@@ -181,6 +293,408 @@ class ZombieLSTM:
             self._lstm_step(x)
         return self._dense_layer()
 
+    def predict_batch(self, X):
+        # X has shape (windows, timesteps) or (windows, timesteps, input_size)
+        # the state of the model (self.ct, self.ht) is not modified
+        # the outputs agree with predict to 1e-12, not bit for bit (the matrix
+        # products of all gates and windows sum in a different order)
+        X = np.asarray(X)
+        X = X.reshape(X.shape[0], X.shape[1], -1)
+
+        ct = np.zeros((len(X), self.units))
+        ht = np.zeros((len(X), self.units))
+        for t in range(X.shape[1]):
+            ct, ht = self._lstm_step_batch(X[:, t], ct, ht)
+        return np.dot(ht, self.Wd) + self.bd
+
     def contiguous_prediction(self, xt):
         self._lstm_step(xt)
         return self._dense_layer()
+
+
+# Streaming inference with one set of LSTM states per stride phase
+# Samples n, n + step_size, n + 2 * step_size, ... belong to the same phase.
+# For every phase a new state is started every `period` samples of the phase
+# and dropped after `horizon` samples, the prediction is taken from the oldest
+# state. With horizon=feature_width and period=1 the predictions equal a full
+# recomputation of every window, larger periods trade accuracy for fewer LSTM
+# steps (ceil(horizon / period) states per sample instead of feature_width).
+class ZombieStream:
+    def __init__(self, model, horizon=None, period=1):
+        self.model = model
+        self.horizon = model.feature_width if horizon is None else horizon
+        self.period = period
+        if self.period > self.horizon:
+            raise ValueError("period must not be larger than horizon")
+        self.reset()
+
+    def reset(self):
+        units = self.model.units
+        self.n = 0
+        self.lstm_steps = 0
+        self.ct = [np.zeros((0, units)) for _ in range(self.model.step_size)]
+        self.ht = [np.zeros((0, units)) for _ in range(self.model.step_size)]
+        self.age = [np.zeros(0, dtype=int) for _ in range(self.model.step_size)]
+
+    def update(self, xt):
+        # returns the dense layer output or None while the states warm up
+        phase = self.n % self.model.step_size
+        phase_n = self.n // self.model.step_size
+        self.n += 1
+
+        ct, ht, age = self.ct[phase], self.ht[phase], self.age[phase]
+
+        # start a new state (newest states are appended at the end)
+        if phase_n % self.period == 0:
+            ct = np.vstack([ct, np.zeros(self.model.units)])
+            ht = np.vstack([ht, np.zeros(self.model.units)])
+            age = np.append(age, 0)
+
+        # advance all states of this phase with the new sample
+        xt = np.full((len(age), 1), xt)
+        ct, ht = self.model._lstm_step_batch(xt, ct, ht)
+        age = age + 1
+        self.lstm_steps += len(age)
+
+        output = None
+        if age[0] > self.horizon - self.period:
+            output = np.dot(ht[0], self.model.Wd) + self.model.bd
+
+        # drop states which reached the horizon
+        keep = age < self.horizon
+        self.ct[phase], self.ht[phase], self.age[phase] = \
+            ct[keep], ht[keep], age[keep]
+
+        return output
+
+    def predict_series(self, data):
+        # returns the outputs for every sample (nan while warming up)
+        outputs = np.full((len(data), len(self.model.bd)), np.nan)
+        for i, xt in enumerate(data):
+            output = self.update(xt)
+            if output is not None:
+                outputs[i] = output
+        return outputs
+
+
+# function for symmetric quantization of a weight matrix to signed integers
+# with one scale per tensor or one scale per output channel (column)
+def quantize_tensor(tensor, bits=8, per_channel=False):
+    qmax = 2 ** (bits - 1) - 1
+    if per_channel:
+        max_abs = np.abs(tensor).max(axis=0)
+    else:
+        max_abs = np.full(tensor.shape[-1], np.abs(tensor).max())
+    scale = np.where(max_abs > 0, max_abs / qmax, 1.0)
+    qtensor = np.clip(np.rint(tensor / scale), -qmax, qmax)
+    return qtensor.astype(f"int{bits}"), scale
+
+
+# helper function to write a 1d or 2d array as C definition
+# (fmt is a format string or a function formatting a row, e.g. float_literals)
+def _write_c_array(file, ctype, name, array, fmt):
+    if not callable(fmt):
+        fmt = functools.partial(map, fmt.__mod__)
+    if array.ndim == 1:
+        file.write("const {} {}[{:d}] = {{\n".format(ctype, name, len(array)))
+        file.write(",".join(fmt(array)))
+    else:
+        file.write("const {} {}[{:d}][{:d}] = {{\n".format(
+            ctype, name, array.shape[0], array.shape[1]))
+        file.write(",\n".join(
+            "{" + ",".join(fmt(row)) + "}" for row in array))
+    file.write("\n};\n\n")
+
+
+# patterns of the parts of a header written by export_model
+_DEFINE = re.compile(r"#define[ \t]+(\w+)[ \t]+(\S+)")
+_ARRAY = re.compile(r"(?:const\s+)?\w+\s+(\w+)((?:\[\d+\])+)\s*=\s*\{(.*?)\};",
+                    re.S)
+_NUMBER = re.compile(r"[-+]?0x[0-9a-fA-F.]+p[-+]?\d+|"
+                     r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?")
+
+
+# helper function to parse the defines and arrays of a C header
+# returns the defines (strings) and the arrays (flat float64 arrays)
+def parse_header(filename):
+    with open(filename, "r") as file:
+        text = file.read()
+
+    defines = dict(_DEFINE.findall(text))
+    arrays = {}
+    for name, _, body in _ARRAY.findall(text):
+        arrays[name] = np.array([float.fromhex(v) if "x" in v else float(v)
+                                 for v in _NUMBER.findall(body)])
+    return defines, arrays
+
+
+# function to load a header written by ZombieLSTM.export_model or
+# ZombieSparseLSTM.export_model (as dense model)
+# (headers of older versions with rounded values are read as well)
+def read_header(filename, activation="interp"):
+    defines, arrays = parse_header(filename)
+    layout = WEIGHT_LAYOUTS[int(defines.get("weight_layout", 0))]
+    input_size = int(defines["input_size"])
+    units = int(defines["lstm_units"])
+    output_size = int(defines["output_size"])
+
+    def tensor(name, shape):
+        return undo_layout(arrays[name].astype(np.float32), shape, layout)
+
+    def sparse_tensor(name, shape, block_size):
+        ptr = arrays[name + "_ptr"].astype(np.int64)
+        idx = arrays[name + "_idx"][:ptr[-1]].astype(np.int64)
+        blocks = arrays[name + "_val"][:ptr[-1] * block_size**2]
+        blocks = blocks.astype(np.float32).reshape(-1, block_size, block_size)
+        return block_csr_dense(ptr, idx, blocks, shape[::-1]).T
+
+    W = np.hstack([tensor(f"lstm_w{g}", (input_size, units)) for g in "ifco"])
+    if RECURRENT_LAYOUTS[int(defines.get("recurrent_layout", 0))] == "dense":
+        U = np.hstack([tensor(f"lstm_u{g}", (units, units)) for g in "ifco"])
+    else:
+        block_size = int(defines["recurrent_block_size"])
+        U = np.hstack([sparse_tensor(f"lstm_u{g}", (units, units), block_size)
+                       for g in "ifco"])
+    b = np.concatenate([tensor(f"lstm_b{g}", (units,)) for g in "ifco"])
+    Wd = tensor("dense_kernel", (units, output_size))
+    bd = tensor("dense_bias", (output_size,))
+
+    model = ZombieLSTM(W, U, b, Wd, bd,
+                       int(defines["val_min"]), int(defines["val_max"]),
+                       int(defines["feature_width"]),
+                       int(defines["step_size"]), activation)
+    tanh = arrays["tanh_lookup"].astype(np.float32).reshape(-1, 2)
+    model.tanh_x, model.tanh_y = tanh[:, 0], tanh[:, 1]
+    return model
+
+
+# helper function to get the model as it runs on the microcontroller
+# (all tensors and the lookup table rounded to float32)
+def float32_model(model):
+    weights = [np.asarray(w, dtype=np.float32)
+               for w in (model.W, model.U, model.b, model.Wd, model.bd)]
+    rounded = ZombieLSTM(*weights, model.val_min, model.val_max,
+                         model.feature_width, model.step_size,
+                         model.activation)
+    rounded.tanh_x = np.asarray(model.tanh_x, dtype=np.float32)
+    rounded.tanh_y = np.asarray(model.tanh_y, dtype=np.float32)
+    return rounded
+
+
+# function to check that an exported header reproduces the model
+# the header is parsed again and compared with the float32 model, the
+# predictions of the windows X have to be bit-identical
+# returns a list of the differences (empty if the header is correct)
+def verify_header(model, filename, X):
+    reference = float32_model(model)
+    parsed = read_header(filename, model.activation)
+
+    problems = []
+    for name, attr in ZombieLSTM.EXPORT_TENSORS + [("tanh_x", "tanh_x"),
+                                                   ("tanh_y", "tanh_y")]:
+        if not np.array_equal(getattr(reference, attr), getattr(parsed, attr)):
+            problems.append(f"tensor {name} differs")
+    for attr in ("val_min", "val_max", "feature_width", "step_size"):
+        if getattr(reference, attr) != getattr(parsed, attr):
+            problems.append(f"parameter {attr} differs")
+
+    if len(X) and not problems:
+        expected = reference.predict_batch(X)
+        predicted = parsed.predict_batch(X)
+        if not np.array_equal(expected, predicted):
+            num = np.sum(np.any(expected != predicted, axis=1))
+            problems.append(f"{num} of {len(X)} predictions differ")
+    return problems
+
+
+# Quantized LSTM with int8/int16 weights (fixed-point reference)
+# The kernels are stored as integers with float scales per tensor (gate) or
+# per channel (unit). The hidden state is quantized with the same number of
+# bits (it is bounded by [-1, 1]), the multiply accumulate operations use
+# integer arithmetic and the result is rescaled once per unit. Cell state,
+# activations and the dense layer stay in float. The exported header defines
+# lstm_quant_bits, which selects the same fixed-point path in lstm_category.h.
+class ZombieQuantLSTM(ZombieLSTM):
+    def __init__(self, model, bits=8, per_channel=False):
+        super().__init__(model.W, model.U, model.b, model.Wd, model.bd,
+                         model.val_min, model.val_max,
+                         model.feature_width, model.step_size)
+        self.tanh_x = model.tanh_x
+        self.tanh_y = model.tanh_y
+        self.activation = model.activation
+
+        self.bits = bits
+        self.per_channel = per_channel
+        self.qmax = 2 ** (bits - 1) - 1
+        self.h_scale = 1 / self.qmax
+        # accumulator of the integer multiply accumulate like lstm_acc_t of
+        # the firmware (int32 for 8 bits, int64 for 16 bits)
+        self.acc_dtype = np.int32 if bits <= 8 else np.int64
+        if self.qmax ** 2 * self.units > np.iinfo(self.acc_dtype).max:
+            raise ValueError(f"{self.units} units overflow the {bits} bit "
+                             f"accumulator")
+
+        # quantize the kernels of every gate separately
+        qW, qU, sW, sU = [], [], [], []
+        for W, U in zip((self.Wi, self.Wf, self.Wc, self.Wo),
+                        (self.Ui, self.Uf, self.Uc, self.Uo)):
+            q, s = quantize_tensor(W, bits, per_channel)
+            qW.append(q)
+            sW.append(s)
+            q, s = quantize_tensor(U, bits, per_channel)
+            qU.append(q)
+            sU.append(s)
+        self.qWi, self.qWf, self.qWc, self.qWo = qW
+        self.qUi, self.qUf, self.qUc, self.qUo = qU
+        self.sWi, self.sWf, self.sWc, self.sWo = sW
+        self.sUi, self.sUf, self.sUc, self.sUo = sU
+
+        # fused matrices [i|f|c|o] for the computation
+        self.qW = np.hstack(qW).astype(self.acc_dtype)
+        self.qU = np.hstack(qU).astype(self.acc_dtype)
+        self.sW = np.concatenate(sW)
+        self.sU = np.concatenate(sU)
+
+    def _quantize_state(self, ht):
+        return np.clip(np.rint(ht / self.h_scale),
+                       -self.qmax, self.qmax).astype(self.acc_dtype)
+
+    def _preactivation(self, xt, ht):
+        # integer multiply accumulate, rescaled once per unit
+        acc = np.dot(self._quantize_state(ht), self.qU)
+        return (np.dot(xt, self.qW) * self.sW +
+                acc * (self.h_scale * self.sU) + self.b)
+
+    def _lstm_step(self, xt):
+        xt = np.reshape(xt, (1, -1))
+        ct, ht = self._lstm_step_batch(xt, self.ct.reshape(1, -1),
+                                       self.ht.reshape(1, -1))
+        self.ct = ct[0]
+        self.ht = ht[0]
+
+    def weight_bytes(self):
+        # size of the weights in flash (integer kernels and float scales)
+        scales = self.sW.size + self.sU.size if self.per_channel else 8
+        return ((self.qW.size + self.qU.size) * self.bits // 8 +
+                (scales + self.b.size + self.Wd.size + self.bd.size) * 4)
+
+    def export_model(self, filename):
+        ctype = f"int{self.bits}_t"
+        with open(filename, "w") as file:
+            file.write("#ifndef NETWORK_H\n#define NETWORK_H\n\n")
+            file.write("#define lstm_quant_bits {}\n".format(self.bits))
+            file.write("#define lstm_quant_per_channel {}\n\n".format(
+                int(self.per_channel)))
+
+            for gate in "ifco":
+                _write_c_array(file, ctype, f"lstm_w{gate}",
+                               getattr(self, f"qW{gate}"), "%d")
+            for gate in "ifco":
+                _write_c_array(file, ctype, f"lstm_u{gate}",
+                               getattr(self, f"qU{gate}"), "%d")
+
+            # one scale per tensor or one scale per unit
+            for gate in "ifco":
+                for kernel in "WU":
+                    scale = getattr(self, f"s{kernel}{gate}")
+                    if not self.per_channel:
+                        scale = scale[:1]
+                    _write_c_array(file, "float",
+                                   f"lstm_{kernel.lower()}{gate}_scale",
+                                   scale, float_literals)
+
+            for gate in "ifco":
+                _write_c_array(file, "float", f"lstm_b{gate}",
+                               getattr(self, f"b{gate}"), float_literals)
+            _write_c_array(file, "float", "dense_kernel", self.Wd,
+                           float_literals)
+            _write_c_array(file, "float", "dense_bias", self.bd,
+                           float_literals)
+
+            file.write("#define lstm_h_scale {:.9g}f\n\n".format(self.h_scale))
+
+            file.write("#define input_size {}\n".format(self.Wi.shape[0]))
+            file.write("#define lstm_units {}\n".format(self.units))
+            file.write("#define output_size {}\n\n".format(self.Wd.shape[1]))
+
+            file.write("#define val_max {}\n".format(self.val_max))
+            file.write("#define val_min {}\n".format(self.val_min))
+            file.write("#define step_size {}\n".format(self.step_size))
+            file.write("#define feature_width {}\n".format(self.feature_width))
+
+            file.write("\ntypedef struct { float x; float y; } tanh_t;\n\n")
+            file.write("tanh_t tanh_lookup[{:d}] = {{\n".format(len(self.tanh_x)))
+            file.write(",\n".join("{{{}, {}}}".format(x, y) for x, y in zip(
+                float_literals(self.tanh_x), float_literals(self.tanh_y))))
+            file.write("\n};\n\n")
+
+            file.write("#endif // NETWORK_H")
+
+
+# LSTM with sparse recurrent kernels (pruned models)
+# The transposed recurrent kernels are stored in compressed sparse rows
+# (block_size 1) or in compressed rows of block_size x block_size blocks, so
+# row i holds the weights of unit i. Only the stored weights are multiplied,
+# the input kernel, the activations and the dense layer are unchanged.
+class ZombieSparseLSTM(ZombieLSTM):
+    # the recurrent kernels are written in the compressed layout
+    EXPORT_TENSORS = [(name, attr) for name, attr in ZombieLSTM.EXPORT_TENSORS
+                      if not name.startswith("lstm_u")]
+
+    def __init__(self, model, block_size=1):
+        super().__init__(model.W, model.U, model.b, model.Wd, model.bd,
+                         model.val_min, model.val_max,
+                         model.feature_width, model.step_size)
+        self.tanh_x = model.tanh_x
+        self.tanh_y = model.tanh_y
+        self.activation = model.activation
+
+        self.block_size = block_size
+        self.recurrent_layout = "csr" if block_size == 1 else "block"
+        # fused rows [i|f|c|o] for the computation and rows of every gate
+        # for the export
+        self.sparse_U = block_csr(self.U.T, block_size)
+        self.sparse_Ui, self.sparse_Uf, self.sparse_Uc, self.sparse_Uo = [
+            block_csr(U.T, block_size)
+            for U in (self.Ui, self.Uf, self.Uc, self.Uo)]
+
+    def stored_weights(self):
+        # recurrent weights which are stored and multiplied (including the
+        # zeros inside of stored blocks)
+        return self.sparse_U[2].size
+
+    def weight_bytes(self):
+        # size of the weights in flash (float values, uint16 indices)
+        dense = self.W.size + self.b.size + self.Wd.size + self.bd.size
+        sparse = [getattr(self, f"sparse_U{gate}") for gate in "ifco"]
+        return ((dense + sum(blocks.size for _, _, blocks in sparse)) * 4 +
+                sum(ptr.size + idx.size for ptr, idx, _ in sparse) * 2)
+
+    def _preactivation(self, xt, ht):
+        return (np.dot(xt, self.W) + block_csr_product(ht, *self.sparse_U) +
+                self.b)
+
+    def _lstm_step(self, xt):
+        xt = np.reshape(xt, (1, -1))
+        ct, ht = self._lstm_step_batch(xt, self.ct.reshape(1, -1),
+                                       self.ht.reshape(1, -1))
+        self.ct = ct[0]
+        self.ht = ht[0]
+
+    def _write_arrays(self, file, literals, layout):
+        super()._write_arrays(file, literals, layout)
+
+        file.write("#define recurrent_layout {}\n".format(
+            RECURRENT_LAYOUTS.index(self.recurrent_layout)))
+        file.write("#define recurrent_block_size {}\n\n".format(
+            self.block_size))
+        for gate in "ifco":
+            ptr, idx, blocks = getattr(self, f"sparse_U{gate}")
+            values = blocks.ravel()
+            # C arrays must not be empty (fully pruned kernel)
+            if not len(idx):
+                idx, values = np.zeros(1, dtype=np.int64), np.zeros(1)
+            _write_c_array(file, "uint16_t", f"lstm_u{gate}_ptr", ptr, "%d")
+            _write_c_array(file, "uint16_t", f"lstm_u{gate}_idx", idx, "%d")
+            _write_c_array(file, "float", f"lstm_u{gate}_val", values,
+                           literals)
@@ -0,0 +1,215 @@
+################################################################################
+# File:     zombie_profile.py
+# Created:  18.10.2026
+#
+# Description: Opt-in profiler of the custom LSTM implementation, which
+#              records the wall time, the MAC and FLOP counts and the
+#              lookup table accesses of every gate and exports them as a
+#              flat profile (JSON or CSV)
+#
+################################################################################
+
+
+import csv
+import json
+import time
+import numpy as np
+
+from zombie_lstm import ZombieLSTM, ZombieSparseLSTM
+
+
+# methods of the model which are replaced while the profiler is enabled
+HOOKS = ["_lstm_step", "_preactivation", "_update_state", "_dense_layer"]
+# columns of the flat profile
+COLUMNS = ["section", "gate", "calls", "rows", "time_ns", "macs", "flops",
+           "lookups", "search_steps"]
+
+
+# Profiler of one ZombieLSTM (or ZombieQuantLSTM) instance
+# While enabled, the hot path methods of the instance are shadowed by
+# instance attributes which compute the same values gate by gate and record
+# their cost, disabling removes the attributes again. The class is never
+# modified, so a disabled profiler costs nothing.
+# sections: "step" (_lstm_step, one sample), "preactivation" and "update"
+# (_lstm_step_batch, several samples) and "dense" (_dense_layer, the dense
+# layer of predict_batch is not a hook)
+# gates: "i", "f", "c", "o", "state" (cell and hidden state update), "ifco"
+# (fused pre-activation of all gates) and "output"
+# flops count multiplications and additions (one MAC counts as 2, the MACs
+# of a ZombieSparseLSTM count its stored recurrent weights only), lookups
+# count the evaluations of the tanh table (none for the exact activation) and
+# search_steps the iterations of its linear search in the firmware
+class ZombieProfiler:
+    def __init__(self, model, trace=False):
+        self.model = model
+        self.trace = trace
+        self.enabled = False
+        self.reset()
+
+    def reset(self):
+        # aggregated values per (section, gate) and optional per call records
+        self.stats = {}
+        self.records = []
+        self.num_calls = 0
+
+    def enable(self):
+        if not self.enabled:
+            for name in HOOKS:
+                # models with their own single step (ZombieQuantLSTM) are
+                # profiled through the batched methods it calls
+                if (name == "_lstm_step" and
+                        type(self.model)._lstm_step is not ZombieLSTM._lstm_step):
+                    continue
+                setattr(self.model, name, getattr(self, name))
+            self.enabled = True
+        return self
+
+    def disable(self):
+        if self.enabled:
+            for name in HOOKS:
+                self.model.__dict__.pop(name, None)
+            self.enabled = False
+
+    def __enter__(self):
+        return self.enable()
+
+    def __exit__(self, *exc_info):
+        self.disable()
+
+    def _record(self, section, gate, time_ns, rows, macs, flops, lookups=0,
+                search_steps=0):
+        values = [1, rows, time_ns, macs, flops, lookups, int(search_steps)]
+        stats = self.stats.setdefault((section, gate), [0] * len(values))
+        for i, value in enumerate(values):
+            stats[i] += value
+        if self.trace:
+            self.records.append([self.num_calls, section, gate] + values[1:])
+
+    # evaluations of the tanh table for the activation of the values
+    def _lookups(self, z):
+        return 0 if self.model.activation == "exact" else np.size(z)
+
+    # cost of the activation of a gate (sigmoid(x) = (1 + tanh(x / 2)) / 2)
+    def _activation_cost(self, gate, z):
+        if gate == "c":
+            return 0, self.model.search_steps(z).sum()
+        return 3 * z.size, self.model.search_steps(z / 2).sum()
+
+    def _lstm_step(self, xt):
+        model = self.model
+        self.num_calls += 1
+        input_size = np.size(xt)
+        units = model.units
+        gates = {}
+
+        # same order of operations as ZombieLSTM._lstm_step
+        for gate in ("f", "i", "o", "c"):
+            W = getattr(model, "W" + gate)
+            U = getattr(model, "U" + gate)
+            b = getattr(model, "b" + gate)
+            activation = model._tanh if gate == "c" else model._sigmoid
+
+            start = time.perf_counter_ns()
+            z = np.dot(xt, W) + np.dot(model.ht, U) + b
+            gates[gate] = activation(z)
+            duration = time.perf_counter_ns() - start
+
+            macs = (input_size + units) * units
+            flops, steps = self._activation_cost(gate, z)
+            self._record("step", gate, duration, 1, macs,
+                         2 * macs + 2 * units + flops, self._lookups(z), steps)
+
+        start = time.perf_counter_ns()
+        model.ct = gates["f"] * model.ct + gates["i"] * gates["c"]
+        model.ht = gates["o"] * model._tanh(model.ct)
+        duration = time.perf_counter_ns() - start
+        self._record("step", "state", duration, 1, 0, 4 * units,
+                     self._lookups(model.ct),
+                     model.search_steps(model.ct).sum())
+
+    def _preactivation(self, xt, ht):
+        model = self.model
+        self.num_calls += 1
+        start = time.perf_counter_ns()
+        z = type(model)._preactivation(model, xt, ht)
+        duration = time.perf_counter_ns() - start
+
+        # only the stored recurrent weights of a sparse model are multiplied
+        if isinstance(model, ZombieSparseLSTM):
+            recurrent = model.stored_weights()
+        else:
+            recurrent = model.U.size
+        rows = len(z)
+        macs = rows * (np.shape(xt)[-1] * 4 * model.units + recurrent)
+        self._record("preactivation", "ifco", duration, rows, macs,
+                     2 * macs + 2 * z.size)
+        return z
+
+    def _update_state(self, z, ct):
+        model = self.model
+        zi, zf, zc, zo = np.hsplit(z, 4)
+        values = {}
+
+        # same order of operations as ZombieLSTM._update_state
+        for gate, zg in (("i", zi), ("f", zf), ("o", zo), ("c", zc)):
+            activation = model._tanh if gate == "c" else model._sigmoid
+            start = time.perf_counter_ns()
+            values[gate] = activation(zg)
+            duration = time.perf_counter_ns() - start
+
+            flops, steps = self._activation_cost(gate, zg)
+            self._record("update", gate, duration, len(z), 0, flops,
+                         self._lookups(zg), steps)
+
+        start = time.perf_counter_ns()
+        ct = values["f"] * ct + values["i"] * values["c"]
+        ht = values["o"] * model._tanh(ct)
+        duration = time.perf_counter_ns() - start
+        self._record("update", "state", duration, len(z), 0, 4 * ct.size,
+                     self._lookups(ct), model.search_steps(ct).sum())
+        return ct, ht
+
+    def _dense_layer(self):
+        model = self.model
+        start = time.perf_counter_ns()
+        output = type(model)._dense_layer(model)
+        duration = time.perf_counter_ns() - start
+
+        macs = model.units * len(model.bd)
+        self._record("dense", "output", duration, 1, macs,
+                     2 * macs + len(model.bd))
+        return output
+
+    def rows(self):
+        # flat profile, one row per section and gate
+        return [dict(zip(COLUMNS, [section, gate] + values))
+                for (section, gate), values in self.stats.items()]
+
+    def totals(self):
+        totals = dict.fromkeys(COLUMNS[2:], 0)
+        for row in self.rows():
+            for key in totals:
+                totals[key] += row[key]
+        return totals
+
+    def to_json(self, filename):
+        profile = {"units": self.model.units,
+                   "activation": self.model.activation,
+                   "profile": self.rows()}
+        if self.trace:
+            profile["calls"] = [dict(zip(["call"] + COLUMNS[:2] + COLUMNS[3:],
+                                         record)) for record in self.records]
+        with open(filename, "w") as file:
+            json.dump(profile, file, indent=1)
+
+    def to_csv(self, filename, calls=False):
+        # aggregated profile or the records of every call (trace=True)
+        with open(filename, "w", newline="") as file:
+            writer = csv.writer(file)
+            if calls:
+                writer.writerow(["call"] + COLUMNS[:2] + COLUMNS[3:])
+                writer.writerows(self.records)
+            else:
+                writer.writerow(COLUMNS)
+                writer.writerows([row[key] for key in COLUMNS]
+                                 for row in self.rows())
@@ -0,0 +1,171 @@
+################################################################################
+# File:     zombie_quality.py
+# Created:  18.10.2026
+#
+# Description: Sanity check of the recorded timeseries, which splits every
+#              recording into clean segments without counter resets,
+#              timestamp gaps or duplicated records
+#
+################################################################################
+
+
+import os
+import re
+import h5py
+import numpy as np
+
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.abspath(os.path.join(THIS_DIR, "../data"))
+# directory of the cached segment index of every recording file
+CACHE_DIR = os.path.join(DATA_DIR, "quality_cache")
+
+# the sensors measure every 5 minutes (seconds)
+SAMPLE_PERIOD = 5 * 60
+# ticks per second of the timestamps, the recordings of InfluxQuery.py are
+# stored in nanoseconds, but pd.to_datetime(...).astype(int) gives
+# microseconds on pandas >= 2 (all_data.h5), so the resolution is inferred
+# from the series (TIMESTAMP_RESOLUTION is used for too short series)
+TIMESTAMP_RESOLUTION = 10**9
+TIMESTAMP_RESOLUTIONS = [10**9, 10**6, 10**3, 1]
+# larger steps between two measurements (seconds) split the series
+MAX_GAP = 15 * 60
+# shorter segments are dropped
+MIN_SEGMENT_LENGTH = 2
+
+# kinds of problems between two consecutive records
+PROBLEMS = ["reset", "gap", "backwards", "duplicate"]
+
+
+# function to infer the ticks per second of a timestamp series
+# the resolution whose sample period is closest to the median step is used
+def timestamp_resolution(timestamp, sample_period=SAMPLE_PERIOD):
+    dt = np.diff(np.asarray(timestamp, dtype="int64"))
+    dt = dt[dt > 0]
+    if not len(dt):
+        return TIMESTAMP_RESOLUTION
+    ticks = np.median(dt) / sample_period
+    return min(TIMESTAMP_RESOLUTIONS, key=lambda r: abs(np.log(ticks / r)))
+
+
+# function to find the problems between consecutive records in one pass
+# returns a boolean mask of length n - 1 for every kind of problem, entry i
+# belongs to the step from record i to record i + 1
+# reset:     a counter decreases (sensor restarted)
+# gap:       the timestamps are more than max_gap seconds apart
+# backwards: the timestamp does not increase (and the record is no duplicate)
+# duplicate: record i + 1 repeats record i (same timestamp and count)
+def find_problems(timestamp, count=None, wifi_count=None, max_gap=MAX_GAP,
+                  resolution=None):
+    timestamp = np.asarray(timestamp, dtype="int64")
+    dt = np.diff(timestamp)
+    if resolution is None:
+        resolution = timestamp_resolution(timestamp)
+
+    reset = np.zeros(len(dt), dtype=bool)
+    same_count = np.ones(len(dt), dtype=bool)
+    for counter in (count, wifi_count):
+        if counter is not None:
+            diff = np.diff(np.asarray(counter, dtype="int64"))
+            reset |= diff < 0
+    if count is not None:
+        same_count = np.diff(np.asarray(count, dtype="int64")) == 0
+
+    duplicate = (dt == 0) & same_count
+    return {"reset": reset,
+            "gap": dt > max_gap * resolution,
+            "backwards": (dt <= 0) & ~duplicate,
+            "duplicate": duplicate}
+
+
+# function to split a series into clean segments
+# returns an array of [start, stop) indices, duplicated records are left out
+# and a segment never spans a reset, gap or backwards step
+def find_segments(timestamp, count=None, wifi_count=None, max_gap=MAX_GAP,
+                  min_length=MIN_SEGMENT_LENGTH, problems=None):
+    if problems is None:
+        problems = find_problems(timestamp, count, wifi_count, max_gap)
+    num_records = len(timestamp)
+    if num_records == 0:
+        return np.zeros((0, 2), dtype="int64")
+
+    # records which are kept (all but the repetitions of their predecessor)
+    duplicate = problems["duplicate"]
+    keep = np.concatenate([[True], ~duplicate])
+    # steps between records which can not be part of the same segment
+    split = problems["reset"] | problems["gap"] | problems["backwards"]
+    split |= duplicate | ~keep[:-1]
+
+    starts = np.flatnonzero(np.concatenate([[True], split]) & keep)
+    stops = np.flatnonzero(np.concatenate([split, [True]]) & keep) + 1
+    segments = np.stack([starts, stops], axis=1).astype("int64")
+    return segments[stops - starts >= min_length]
+
+
+# helper function to count the problems of a series
+def count_problems(problems):
+    return {kind: int(problems[kind].sum()) for kind in PROBLEMS}
+
+
+# helper function to read the series needed for the check from a recording
+# (there is only one group in the recording files)
+def read_series(path, group=None):
+    with h5py.File(path, "r") as infile:
+        grp = infile[group or list(infile.keys())[0]]
+        return tuple(grp[key][()] if key in grp else None
+                     for key in ("timestamp", "count", "wifi_count"))
+
+
+# function to get the segments of a recording file
+# the segment index is cached per file and only computed again if the file
+# or the parameters of the check changed
+# returns the segments and the number of problems of each kind
+def load_segments(path, max_gap=MAX_GAP, min_length=MIN_SEGMENT_LENGTH,
+                  cache_dir=CACHE_DIR):
+    name = os.path.splitext(os.path.basename(path))[0]
+    cache_path = os.path.join(cache_dir, name + ".npz") if cache_dir else None
+    stat = os.stat(path)
+    key = np.array([stat.st_mtime_ns, stat.st_size, max_gap, min_length],
+                   dtype="int64")
+
+    if cache_path and os.path.exists(cache_path):
+        with np.load(cache_path) as cache:
+            if np.array_equal(cache["key"], key):
+                return cache["segments"], dict(zip(PROBLEMS,
+                                                   cache["problems"].tolist()))
+
+    timestamp, count, wifi_count = read_series(path)
+    problems = find_problems(timestamp, count, wifi_count, max_gap)
+    segments = find_segments(timestamp, min_length=min_length,
+                             problems=problems)
+    num_problems = count_problems(problems)
+
+    if cache_path:
+        # written to a temporary file first, so parallel readers never see
+        # an incomplete cache file
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(cache_path + ".tmp", "wb") as outfile:
+            np.savez(outfile, key=key, segments=segments,
+                     problems=np.array([num_problems[kind]
+                                        for kind in PROBLEMS]))
+        os.replace(cache_path + ".tmp", cache_path)
+
+    return segments, num_problems
+
+
+if __name__ == "__main__":
+    # check all recordings in the data directory
+    pattern = re.compile(r"\d{4}-\d{2}-\d{2}_\w+.h5")
+    hdf5_files = sorted(f for f in os.listdir(DATA_DIR) if pattern.match(f))
+
+    print(f"{'recording':28s} {'records':>8s} {'kept':>8s} {'segments':>8s} "
+          + " ".join(f"{kind:>9s}" for kind in PROBLEMS))
+    for f in hdf5_files:
+        path = os.path.join(DATA_DIR, f)
+        segments, problems = load_segments(path)
+        with h5py.File(path, "r") as infile:
+            num_records = len(infile[list(infile.keys())[0]]["timestamp"])
+        kept = int((segments[:, 1] - segments[:, 0]).sum())
+        print(f"{os.path.splitext(f)[0]:28s} {num_records:8d} {kept:8d} "
+              f"{len(segments):8d} "
+              + " ".join(f"{problems[kind]:9d}" for kind in PROBLEMS))
@@ -0,0 +1,167 @@
+################################################################################
+# File:     zombie_registry.py
+# Created:  18.10.2026
+#
+# Description: Registry of trained models, which parses a model file once
+#              into an immutable bundle of weights and parameters (without
+#              TensorFlow) and keeps it for later calls
+#
+################################################################################
+
+
+import os
+import hashlib
+import h5py
+from collections import namedtuple
+
+from zombie_lstm import ZombieLSTM
+
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_DIR = os.path.abspath(os.path.join(THIS_DIR, "../models"))
+
+# content hashes of the model files, keyed by path, mtime and size
+_hashes = {}
+# parsed models, keyed by path and content hash
+_bundles = {}
+
+
+# weights and parameters of a trained model (read-only arrays)
+class ModelBundle(namedtuple("ModelBundle", [
+        "path", "sha256",
+        "lstm_kernel", "lstm_recurrent_kernel", "lstm_bias",
+        "dense_kernel", "dense_bias",
+        "val_min", "val_max", "feature_width", "step_size"])):
+    __slots__ = ()
+
+    @property
+    def num_cells(self):
+        return self.lstm_recurrent_kernel.shape[0]
+
+    @property
+    def num_category(self):
+        return self.dense_kernel.shape[1]
+
+    @property
+    def input_size(self):
+        return self.lstm_kernel.shape[0]
+
+    # weights in the order of the keras model (model.get_weights())
+    def weights(self):
+        return [self.lstm_kernel, self.lstm_recurrent_kernel, self.lstm_bias,
+                self.dense_kernel, self.dense_bias]
+
+    # custom lstm implementation with the weights of the model
+    def to_zombie_lstm(self, **kwargs):
+        return ZombieLSTM(*self.weights(), self.val_min, self.val_max,
+                          self.feature_width, self.step_size, **kwargs)
+
+    # keras model with the weights of the model for another batch size
+    # (tensorflow is only imported here)
+    def to_keras(self, batch_size=1):
+        import tensorflow as tf
+        from tensorflow.keras.layers import LSTM, Dense
+
+        model = tf.keras.models.Sequential()
+        model.add(tf.keras.Input(batch_shape=(
+            batch_size, self.feature_width, self.input_size)))
+        model.add(LSTM(self.num_cells))
+        model.add(Dense(self.num_category, activation="softmax"))
+        model.set_weights(self.weights())
+        return model
+
+
+# helper function to compute the hash of a model file
+def file_hash(path):
+    sha = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+# helper function to decode names stored as bytes or strings
+def _decode(name):
+    return name.decode() if isinstance(name, bytes) else str(name)
+
+
+# helper function to read the weights of the layers of a keras model file
+# the weights are found by the layer and weight names stored by keras, so
+# the dataset paths may differ between keras versions
+# ("lstm/lstm/lstm_cell/kernel:0" or "lstm/sequential/lstm/lstm_cell/kernel")
+def _read_layer_weights(grp):
+    layers = []
+    for layer_name in grp.attrs["layer_names"]:
+        layer_name = _decode(layer_name)
+        layer = grp[layer_name]
+        weights = {}
+        for weight_name in layer.attrs["weight_names"]:
+            weight_name = _decode(weight_name)
+            # "sequential/lstm/lstm_cell/kernel:0" -> "kernel"
+            key = weight_name.split("/")[-1].split(":")[0]
+            weights[key] = layer[weight_name][()]
+        if weights:
+            layers.append((layer_name, weights))
+    return layers
+
+
+# function to parse a model file created by 03_train_category.py
+def read_model(model_path, sha256=None):
+    with h5py.File(model_path, "r") as infile:
+        scaling = infile["scaling_params"]
+        windowing = infile["window_params"]
+        val_max = int(scaling["val_max"][0])
+        val_min = int(scaling["val_min"][0])
+        feature_width = int(windowing["feature_width"][0])
+        step_size = int(windowing["step_size"][0])
+
+        layers = _read_layer_weights(infile["model_weights"])
+
+    # first layer with a recurrent kernel and the dense layer after it
+    lstm = next(i for i, (_, w) in enumerate(layers)
+                if "recurrent_kernel" in w)
+    dense = layers[lstm + 1][1]
+    lstm = layers[lstm][1]
+
+    arrays = [lstm["kernel"], lstm["recurrent_kernel"], lstm["bias"],
+              dense["kernel"], dense["bias"]]
+    for array in arrays:
+        array.flags.writeable = False
+
+    return ModelBundle(os.path.abspath(model_path), sha256, *arrays,
+                       val_min, val_max, feature_width, step_size)
+
+
+# function to get the bundle of a model file
+# the file is only hashed again if its mtime or size changed and only parsed
+# again if its content changed, all callers share the same bundle
+def load_model(model_path):
+    path = os.path.abspath(model_path)
+    stat = os.stat(path)
+
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    if key not in _hashes:
+        _hashes[key] = file_hash(path)
+    sha256 = _hashes[key]
+
+    if (path, sha256) not in _bundles:
+        _bundles[(path, sha256)] = read_model(path, sha256)
+    return _bundles[(path, sha256)]
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    # list the models of the model directory (or the given files)
+    paths = sys.argv[1:] or sorted(
+        os.path.join(MODEL_DIR, f) for f in os.listdir(MODEL_DIR)
+        if f.endswith(".h5"))
+
+    for path in paths:
+        start = time.perf_counter()
+        bundle = load_model(path)
+        duration = time.perf_counter() - start
+        print(f"{os.path.basename(path):28s} {bundle.sha256[:12]} "
+              f"cells {bundle.num_cells:3d} width {bundle.feature_width:3d} "
+              f"step {bundle.step_size:2d} ({1000 * duration:.1f} ms)")
@@ -0,0 +1,191 @@
+################################################################################
+# File:     zombie_store.py
+# Created:  18.10.2026
+#
+# Description: Contiguous, memory-mapped storage of the recorded timeseries
+#              with one .npy file per feature and an index of all recordings
+#
+################################################################################
+
+
+import os
+import h5py
+import numpy as np
+
+import zombie_quality as zq
+
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.abspath(os.path.join(THIS_DIR, "../data"))
+
+# define path of the converted hdf5 file and of the store
+DATA_PATH = os.path.join(DATA_DIR, "all_data.h5")
+STORE_DIR = os.path.join(DATA_DIR, "all_data_store")
+
+# features stored in the store, timestamps keep their integer type
+FEATURES = ["timestamp", "voltage", "cell_current", "lux"]
+INDEX_FILENAME = "index.npz"
+
+# definition of categories (derived from the names of the recording files)
+category_dictionary = {"90mindark": 0, "const": 1, "window": 2}
+
+
+# helper function to find the category from the filename
+# (-1 if the name contains no category, stored as 255)
+def find_category(filename):
+    category = -1
+    for cat_name, cat_id in category_dictionary.items():
+        if cat_name in filename:
+            category = cat_id
+    return category
+
+
+# helper function to list all recordings of the given hdf5 files
+# groups with a category dataset (all_data.h5) keep their group name,
+# groups of single recording files are named like the file and get the
+# category of the file name (like 02_create_dataset.py)
+def _list_recordings(file_paths):
+    recordings = []
+    for path in file_paths:
+        with h5py.File(path, "r") as infile:
+            for key, grp in infile.items():
+                if "category" in grp:
+                    name = key
+                    category = grp["category"][0]
+                else:
+                    name = os.path.splitext(os.path.basename(path))[0]
+                    category = find_category(name)
+                recordings.append((name, path, key, len(grp["lux"]), category))
+    return recordings
+
+
+# helper function to read the clean segments of a recording
+# (single recording files are checked by zombie_quality.load_segments)
+def _read_segments(path, key, length):
+    with h5py.File(path, "r") as infile:
+        if "segments" in infile[key]:
+            return infile[key]["segments"][()].reshape(-1, 2)
+    return zq.load_segments(path)[0].reshape(-1, 2)
+
+
+# function to convert hdf5 files into a store
+def convert_hdf5(file_paths, store_dir=STORE_DIR, features=FEATURES):
+    if isinstance(file_paths, str):
+        file_paths = [file_paths]
+    os.makedirs(store_dir, exist_ok=True)
+
+    recordings = _list_recordings(file_paths)
+    lengths = np.array([rec[3] for rec in recordings], dtype="int64")
+    offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]]).astype("int64")
+    total = int(lengths.sum())
+
+    for feature in features:
+        dtype = "int64" if feature == "timestamp" else "float32"
+        out = np.lib.format.open_memmap(
+            os.path.join(store_dir, feature + ".npy"), mode="w+",
+            dtype=dtype, shape=(total,))
+
+        # copy one recording at a time into its slice
+        for (name, path, key, length, _), offset in zip(recordings, offsets):
+            if length == 0:
+                continue
+            with h5py.File(path, "r") as infile:
+                infile[key][feature].read_direct(
+                    out, dest_sel=np.s_[offset:offset + length])
+        out.flush()
+        del out
+
+    segments = [_read_segments(path, key, length)
+                for _, path, key, length, _ in recordings]
+
+    np.savez(os.path.join(store_dir, INDEX_FILENAME),
+             names=np.array([rec[0] for rec in recordings]),
+             offsets=offsets,
+             lengths=lengths,
+             categories=np.array([rec[4] for rec in recordings])
+             .astype("uint8"),
+             features=np.array(features),
+             segments=np.concatenate(segments + [np.zeros((0, 2))])
+             .astype("int64"),
+             segment_counts=np.array([len(seg) for seg in segments],
+                                     dtype="int64"))
+
+
+# function to convert hdf5 files into a store, if the store is older than
+# one of the files or does not contain exactly their recordings
+# returns whether the store was converted
+def update_store(file_paths, store_dir=STORE_DIR, features=FEATURES):
+    index_path = os.path.join(store_dir, INDEX_FILENAME)
+    if os.path.exists(index_path):
+        index_mtime = os.path.getmtime(index_path)
+        names = sorted(rec[0] for rec in _list_recordings(file_paths))
+        with np.load(index_path) as index:
+            if sorted(str(name) for name in index["names"]) == names and \
+                    set(features) <= set(str(f) for f in index["features"]) \
+                    and all(os.path.getmtime(path) <= index_mtime
+                            for path in file_paths):
+                return False
+
+    convert_hdf5(file_paths, store_dir, features)
+    return True
+
+
+class ZombieStore:
+    def __init__(self, store_dir=STORE_DIR):
+        self.store_dir = store_dir
+        with np.load(os.path.join(store_dir, INDEX_FILENAME)) as index:
+            self.names = [str(name) for name in index["names"]]
+            self.offsets = index["offsets"]
+            self.lengths = index["lengths"]
+            self.categories = index["categories"]
+            self.features = [str(feature) for feature in index["features"]]
+            # segments of all recordings (stores of older versions have none)
+            if "segments" in index:
+                counts = index["segment_counts"]
+                self.segments = np.split(index["segments"],
+                                         np.cumsum(counts)[:-1])
+            else:
+                self.segments = [np.array([[0, n]] if n else [],
+                                          dtype="int64").reshape(-1, 2)
+                                 for n in self.lengths]
+        # lookup table from recording name to index
+        self._position = {name: i for i, name in enumerate(self.names)}
+        # memory maps are opened on first access
+        self._memmaps = {}
+
+    def _memmap(self, feature):
+        if feature not in self._memmaps:
+            self._memmaps[feature] = np.load(
+                os.path.join(self.store_dir, feature + ".npy"), mmap_mode="r")
+        return self._memmaps[feature]
+
+    def get(self, name, feature):
+        # zero-copy slice of the memory map
+        i = self._position[name]
+        start = self.offsets[i]
+        return self._memmap(feature)[start:start + self.lengths[i]]
+
+    def get_segments(self, name):
+        # [start, stop) indices of the clean segments of a recording
+        return self.segments[self._position[name]]
+
+    def get_dataset(self, dataset, feature_key, label_key=None):
+        # same return values as zombie_functions.get_dataset
+        features = self.get(dataset, feature_key)
+        if label_key == "category":
+            i = self._position[dataset]
+            return features, self.categories[i:i + 1]
+        elif label_key:
+            return features, self.get(dataset, label_key)
+        else:
+            return features
+
+
+if __name__ == "__main__":
+    # convert the combined hdf5 file created by 02_create_dataset.py
+    convert_hdf5(DATA_PATH, STORE_DIR)
+
+    store = ZombieStore(STORE_DIR)
+    print(f"Stored {len(store.names)} recordings in {STORE_DIR}")
+    for name, length in zip(store.names, store.lengths):
+        print(f"{name:28s} {length:8d}")